@@ -0,0 +1,178 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from deduplicacao import ler_sem_duplicatas, uma_por_grupo
+
+CAMINHO_OUTROS_ESTUDOS = 'data/outros_estudos.feather'
+
+# Colunas dos ensaios clínicos usadas nos gráficos das condições
+COLUNAS_ENSAIOS = ['escala pedro', 'revista', 'tipo estudo', 'ano', 'titulo',
+                   'decada', 'periodo', 'qualidade']
+
+TIPOS_ESTUDO = ['CLINICAL TRIAL', 'SYSTEMATIC REVIEW', 'PRACTICE GUIDELINE']
+
+# Ensaios com nota até 6 na escala PEDro são considerados de baixa qualidade
+NOTA_CORTE_QUALIDADE = 6
+QUALIDADE_BAIXA = 'Baixa qualidade (≤ 6 escala PEDro)'
+QUALIDADE_ALTA = 'Alta qualidade (> 6 escala PEDro)'
+
+
+class Filtro(NamedTuple):
+    """
+    Recorte aplicado aos dados antes da agregação. Campos com valor None
+    não filtram. Por ser imutável, também serve de chave de cache.
+    """
+    ano_min: int = None
+    ano_max: int = None
+    regioes: tuple = None
+
+
+@lru_cache(maxsize=1)
+def tabela_ensaios(geracao: int = 0) -> pd.DataFrame:
+    """
+    Lê a tabela de ensaios clínicos de todas as condições (base e
+    incrementos, ver `armazem_artigos`), sem os registros repetidos dentro
+    de cada condição (ver `deduplicacao`).
+
+    Args:
+        geracao (int, optional): Geração dos dados. Usada apenas como
+            chave do cache: uma geração nova força a releitura.
+
+    Returns:
+        pd.DataFrame: Um ensaio clínico por linha, com as colunas
+        `condicao` e `grupo` (o mesmo ensaio listado em várias condições
+        tem uma linha em cada uma, com o mesmo grupo).
+    """
+    return ler_sem_duplicatas(COLUNAS_ENSAIOS + ['regiao', 'condicao'])
+
+
+@lru_cache(maxsize=1)
+def tabela_outros_estudos() -> pd.DataFrame:
+    """
+    Lê as contagens anuais de revisões sistemáticas e diretrizes de
+    prática clínica, que não fazem parte da tabela de ensaios clínicos.
+
+    Returns:
+        pd.DataFrame: Colunas condicao, ano, tipo estudo e quantidade.
+    """
+    return pd.read_feather(CAMINHO_OUTROS_ESTUDOS)
+
+
+def _mascara(tabela: pd.DataFrame, condicao: str, filtro: Filtro) -> np.ndarray:
+    mascara = np.ones(len(tabela), dtype=bool)
+    if condicao is not None:
+        mascara &= (tabela['condicao'] == condicao).to_numpy()
+    if filtro.ano_min is not None:
+        mascara &= (tabela['ano'] >= filtro.ano_min).to_numpy()
+    if filtro.ano_max is not None:
+        mascara &= (tabela['ano'] <= filtro.ano_max).to_numpy()
+    if filtro.regioes is not None and 'regiao' in tabela:
+        mascara &= tabela['regiao'].isin(filtro.regioes).to_numpy()
+    if condicao is None and 'grupo' in tabela:
+        # Várias condições juntas: cada ensaio conta uma vez
+        mascara = uma_por_grupo(mascara, tabela['grupo'].to_numpy())
+    return mascara
+
+
+@lru_cache(maxsize=64)
+def ensaios(condicao: str = None, filtro: Filtro = Filtro(),
+            geracao: int = 0) -> pd.DataFrame:
+    """
+    Seleciona os ensaios clínicos de uma condição (entrada de `histograma`).
+
+    Args:
+        condicao (str, optional): Chave da condição. Se None, usa todas.
+        filtro (Filtro, optional): Recorte de anos e regiões.
+        geracao (int, optional): Geração dos dados (ver `tabela_ensaios`).
+
+    Returns:
+        pd.DataFrame: Os ensaios selecionados, com a coluna `qualidade`
+        calculada a partir da escala PEDro.
+    """
+    tabela = tabela_ensaios(geracao)
+    selecao = tabela.loc[_mascara(tabela, condicao, filtro), COLUNAS_ENSAIOS]
+    selecao = selecao.reset_index(drop=True)
+    selecao['qualidade'] = np.where(
+        selecao['escala pedro'] > NOTA_CORTE_QUALIDADE,
+        QUALIDADE_ALTA, QUALIDADE_BAIXA
+    )
+    return selecao
+
+
+@lru_cache(maxsize=64)
+def contagem_anual(condicao: str = None, filtro: Filtro = Filtro(),
+                   geracao: int = 0) -> pd.DataFrame:
+    """
+    Conta os estudos por ano e tipo de estudo (entrada de
+    `graf_linha_tempo`).
+
+    Args:
+        condicao (str, optional): Chave da condição. Se None, usa todas.
+        filtro (Filtro, optional): Recorte de anos e regiões. O filtro de
+            regiões vale apenas para os ensaios clínicos.
+        geracao (int, optional): Geração dos dados (ver `tabela_ensaios`).
+
+    Returns:
+        pd.DataFrame: Colunas ano, tipo estudo e quantidade.
+    """
+    ensaios_ano = ensaios(condicao, filtro, geracao).groupby('ano').size()
+    ensaios_ano = pd.DataFrame({'ano': ensaios_ano.index,
+                                'tipo estudo': TIPOS_ESTUDO[0],
+                                'quantidade': ensaios_ano.to_numpy()})
+
+    outros = tabela_outros_estudos()
+    outros = outros.loc[_mascara(outros, condicao, filtro)]
+    outros = outros.groupby(['ano', 'tipo estudo'], as_index=False)['quantidade'].sum()
+
+    contagem = pd.concat([ensaios_ano, outros], ignore_index=True)
+    ordem_tipo = contagem['tipo estudo'].map(TIPOS_ESTUDO.index)
+    contagem = contagem.iloc[np.lexsort((ordem_tipo, contagem['ano']))]
+    return contagem.reset_index(drop=True)
+
+
+@lru_cache(maxsize=64)
+def qualidade_decada(condicao: str = None, filtro: Filtro = Filtro(),
+                     geracao: int = 0) -> pd.DataFrame:
+    """
+    Conta os ensaios clínicos por década e qualidade metodológica (entrada
+    de `bar_quali`).
+
+    Args:
+        condicao (str, optional): Chave da condição. Se None, usa todas.
+        filtro (Filtro, optional): Recorte de anos e regiões.
+        geracao (int, optional): Geração dos dados (ver `tabela_ensaios`).
+
+    Returns:
+        pd.DataFrame: Colunas decada, qualidade e quantidade.
+    """
+    selecao = ensaios(condicao, filtro, geracao)
+    qualidade = pd.Categorical(selecao['qualidade'],
+                               categories=[QUALIDADE_BAIXA, QUALIDADE_ALTA])
+    contagem = selecao.groupby([selecao['decada'], qualidade], observed=True).size()
+    contagem = contagem.reset_index(name='quantidade')
+    contagem.columns = ['decada', 'qualidade', 'quantidade']
+    contagem['qualidade'] = contagem['qualidade'].astype(str)
+    return contagem
+
+
+@lru_cache(maxsize=64)
+def resumo_decada(condicao: str = None, filtro: Filtro = Filtro(),
+                  geracao: int = 0) -> pd.DataFrame:
+    """
+    Calcula a quantidade de ensaios clínicos e a mediana da escala PEDro
+    por década (entrada de `linha_quali_quant`).
+
+    Args:
+        condicao (str, optional): Chave da condição. Se None, usa todas.
+        filtro (Filtro, optional): Recorte de anos e regiões.
+        geracao (int, optional): Geração dos dados (ver `tabela_ensaios`).
+
+    Returns:
+        pd.DataFrame: Colunas decada, escala pedro e quantidade.
+    """
+    grupos = ensaios(condicao, filtro, geracao).groupby('decada')['escala pedro']
+    return pd.DataFrame({'escala pedro': grupos.median(),
+                         'quantidade': grupos.size()}).reset_index()
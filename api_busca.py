@@ -0,0 +1,377 @@
+import argparse
+import json
+import math
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error, parse, request
+
+import numpy as np
+import pandas as pd
+
+from armazem_artigos import ArmazemArtigos, geracao_atual
+from artefatos_busca import DadosBusca, carregar_ou_construir
+from cache_consultas import CacheConsultas, ChaveConsulta
+from configuracoes import (
+    API_ENDERECO, API_PORTA, COMPONENTES_DESATIVADOS, MAX_CONSULTAS_EM_CACHE,
+    MODELO_SPACY, TTL_CONSULTAS_S
+)
+from funcoes import limpar_titulo, limpar_titulos
+from indice_busca import (
+    COLUNAS_METADADOS, FiltrosBusca, buscar_similares, buscar_similares_lote
+)
+from lematizador import carregar_processador
+
+# Limites de uma requisição
+MAX_K = 100
+MAX_TITULOS_LOTE = 1000
+
+# Intervalo (em segundos) entre as verificações de uma nova geração dos dados
+INTERVALO_GERACAO_S = 5.0
+
+
+class ErroRequisicao(ValueError):
+    """Parâmetros inválidos em uma requisição (respondida com status 400)."""
+
+
+class ServicoBusca:
+    """
+    Busca de artigos similares (modo TF-IDF) sem o Streamlit: o processador
+    das consultas (tabela de lemas ou modelo spaCy, ver `lematizador`) e os
+    artefatos da busca (ver `artefatos_busca`) são carregados uma vez e
+    compartilhados entre as requisições; os artefatos são memória mapeada,
+    então vários processos da API na mesma máquina usam uma única cópia.
+    Uma nova geração dos dados (ver `armazem_artigos`) é carregada na
+    primeira requisição após a mudança; as requisições em andamento
+    terminam com os dados anteriores.
+    """
+
+    def __init__(self, processador, max_cache: int = MAX_CONSULTAS_EM_CACHE):
+        self.processador = processador
+        self.cache = CacheConsultas(max_itens=max_cache, ttl_segundos=TTL_CONSULTAS_S)
+        self.dados = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+        self.atualizar(forcar=True)
+
+    def atualizar(self, forcar: bool = False) -> DadosBusca:
+        """
+        Carrega os dados se houver uma nova geração (verificada no máximo a
+        cada INTERVALO_GERACAO_S segundos).
+
+        Args:
+            forcar (bool, optional): Verifica a geração imediatamente.
+
+        Returns:
+            DadosBusca: Os dados atuais.
+        """
+        agora = time.monotonic()
+        if not forcar and agora - self._verificado_em < INTERVALO_GERACAO_S:
+            return self.dados
+        with self._lock:
+            self._verificado_em = agora
+            geracao = geracao_atual()
+            if self.dados is None or self.dados.geracao != geracao:
+                # Uma única atribuição: as requisições veem os dados antigos
+                # ou os novos, nunca uma mistura
+                self.dados = carregar_ou_construir(ArmazemArtigos())
+        return self.dados
+
+    def _artigos(self, dados: DadosBusca, resultado) -> list:
+        linhas = [linha for linha, _ in resultado]
+        tabela = dados.metadados.linhas(linhas, COLUNAS_METADADOS)
+        artigos = []
+        for (linha, similaridade), valores in zip(resultado, tabela.itertuples(index=False)):
+            titulo, regiao, tipo_estudo, ano, escala = valores
+            artigos.append({
+                'linha': int(linha), 'titulo': titulo, 'regiao': regiao,
+                'tipo_estudo': tipo_estudo, 'ano': int(ano),
+                'escala_pedro': None if pd.isna(escala) else int(escala),
+                'similaridade': round(float(similaridade), 6),
+            })
+        return artigos
+
+    def buscar(self, titulo: str, k: int = 5, filtros: FiltrosBusca = FiltrosBusca()) -> dict:
+        """
+        Busca os k artigos mais similares a um título.
+
+        Args:
+            titulo (str): Título ou termos de interesse, em inglês.
+            k (int, optional): Quantidade de artigos. O padrão é 5.
+            filtros (FiltrosBusca, optional): Os filtros da busca.
+
+        Returns:
+            dict: geracao, titulo_limpo e artigos (em ordem decrescente de
+            similaridade).
+        """
+        dados = self.atualizar()
+        titulo_limpo = self.cache.normalizar(
+            titulo, lambda texto: limpar_titulo(self.processador, texto))
+        chave = ChaveConsulta(titulo_limpo, 'tfidf', k, filtros)
+        resultado = self.cache.obter(chave, dados.geracao)
+        if resultado is None:
+            resultado = buscar_similares(dados.indice, titulo_limpo, k, dados.mascaras, filtros)
+            self.cache.guardar(chave, resultado, dados.geracao)
+        return {'geracao': dados.geracao, 'titulo_limpo': titulo_limpo,
+                'artigos': self._artigos(dados, resultado)}
+
+    def buscar_lote(self, titulos: list, k: int = 5,
+                    filtros: FiltrosBusca = FiltrosBusca()) -> dict:
+        """
+        Busca os k artigos mais similares a cada título de uma lista, em
+        uma única passada sobre o corpus (ver `buscar_similares_lote`).
+
+        Args:
+            titulos (list): Os títulos de referência.
+            k (int, optional): Quantidade de artigos por título.
+            filtros (FiltrosBusca, optional): Os filtros da busca.
+
+        Returns:
+            dict: geracao e resultados (uma lista de artigos por título,
+            na ordem recebida).
+        """
+        dados = self.atualizar()
+        resultados = buscar_similares_lote(dados.indice, limpar_titulos(self.processador, titulos),
+                                           k, dados.mascaras, filtros)
+        return {'geracao': dados.geracao,
+                'resultados': [self._artigos(dados, resultado) for resultado in resultados]}
+
+
+def _inteiro(valor, nome: str, minimo: int = None, maximo: int = None) -> int:
+    if valor is None:
+        return None
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ErroRequisicao(f'{nome} deve ser um número inteiro') from None
+    if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+        raise ErroRequisicao(f'{nome} deve estar entre {minimo} e {maximo}')
+    return numero
+
+
+def _lista(valor) -> tuple:
+    if valor is None or valor == []:
+        return None
+    return tuple(valor) if isinstance(valor, list) else (valor,)
+
+
+def ler_parametros(parametros: dict) -> tuple:
+    """
+    Lê a quantidade de artigos e os filtros de uma requisição (query string
+    ou corpo JSON).
+
+    Args:
+        parametros (dict): k, regiao, tipo_estudo, ano_min, ano_max e
+            escala_min (regiao e tipo_estudo aceitam listas).
+
+    Returns:
+        tuple: k e FiltrosBusca.
+
+    Raises:
+        ErroRequisicao: Se algum parâmetro for inválido.
+    """
+    k = _inteiro(parametros.get('k', 5), 'k', 1, MAX_K)
+    filtros = FiltrosBusca(
+        regioes=_lista(parametros.get('regiao')),
+        tipos_estudo=_lista(parametros.get('tipo_estudo')),
+        ano_min=_inteiro(parametros.get('ano_min'), 'ano_min'),
+        ano_max=_inteiro(parametros.get('ano_max'), 'ano_max'),
+        escala_min=_inteiro(parametros.get('escala_min'), 'escala_min', 0, 10),
+    )
+    return k, filtros
+
+
+class ManipuladorBusca(BaseHTTPRequestHandler):
+    """
+    Rotas da API:
+
+        GET  /saude                      estado do serviço
+        GET  /busca?q=...&k=5&regiao=... busca de um título
+        POST /busca       {"titulo": ..., "k": 5, ...}
+        POST /busca/lote  {"titulos": [...], "k": 5, ...}
+    """
+
+    servico: ServicoBusca = None
+    registrar: bool = False
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, formato, *args):
+        if self.registrar:
+            super().log_message(formato, *args)
+
+    def _responder(self, status: int, conteudo: dict):
+        corpo = json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _executar(self, funcao):
+        try:
+            self._responder(200, funcao())
+        except ErroRequisicao as erro:
+            self._responder(400, {'erro': str(erro)})
+        except Exception as erro:  # noqa: BLE001 - a resposta informa a falha
+            self._responder(500, {'erro': f'{type(erro).__name__}: {erro}'})
+
+    def do_GET(self):
+        url = parse.urlsplit(self.path)
+        consulta = parse.parse_qs(url.query)
+        parametros = {nome: valores if nome in ('regiao', 'tipo_estudo') else valores[-1]
+                      for nome, valores in consulta.items()}
+        if url.path == '/saude':
+            dados = self.servico.dados
+            self._responder(200, {'status': 'ok', 'geracao': dados.geracao,
+                                  'documentos': dados.indice.n_documentos,
+                                  'cache': self.servico.cache.estatisticas()})
+        elif url.path == '/busca':
+            self._executar(lambda: self._buscar(parametros, parametros.get('q')))
+        else:
+            self._responder(404, {'erro': f'rota desconhecida: {url.path}'})
+
+    def do_POST(self):
+        url = parse.urlsplit(self.path)
+        try:
+            tamanho = int(self.headers.get('Content-Length', 0))
+            parametros = json.loads(self.rfile.read(tamanho) or b'{}')
+            if not isinstance(parametros, dict):
+                raise ValueError
+        except ValueError:
+            self._responder(400, {'erro': 'o corpo deve ser um objeto JSON'})
+            return
+        if url.path == '/busca':
+            self._executar(lambda: self._buscar(parametros, parametros.get('titulo')))
+        elif url.path == '/busca/lote':
+            self._executar(lambda: self._buscar_lote(parametros))
+        else:
+            self._responder(404, {'erro': f'rota desconhecida: {url.path}'})
+
+    def _buscar(self, parametros: dict, titulo) -> dict:
+        if not isinstance(titulo, str) or not titulo.strip():
+            raise ErroRequisicao('informe o título (q na URL ou "titulo" no JSON)')
+        k, filtros = ler_parametros(parametros)
+        return self.servico.buscar(titulo, k, filtros)
+
+    def _buscar_lote(self, parametros: dict) -> dict:
+        titulos = parametros.get('titulos')
+        if not isinstance(titulos, list) or not all(isinstance(t, str) for t in titulos):
+            raise ErroRequisicao('"titulos" deve ser uma lista de textos')
+        if len(titulos) > MAX_TITULOS_LOTE:
+            raise ErroRequisicao(f'no máximo {MAX_TITULOS_LOTE} títulos por requisição')
+        k, filtros = ler_parametros(parametros)
+        return self.servico.buscar_lote(titulos, k, filtros)
+
+
+def criar_servidor(endereco: str = API_ENDERECO, porta: int = API_PORTA,
+                   modelo: str = MODELO_SPACY, registrar: bool = False) -> ThreadingHTTPServer:
+    """
+    Carrega o serviço de busca e cria o servidor HTTP (uma thread por
+    conexão).
+
+    Args:
+        endereco (str, optional): Endereço de escuta.
+        porta (int, optional): Porta (0 escolhe uma porta livre).
+        modelo (str, optional): Modelo spaCy (ou da tabela de lemas).
+        registrar (bool, optional): Registra cada requisição no stderr.
+
+    Returns:
+        ThreadingHTTPServer: O servidor, ainda não iniciado.
+    """
+    @lru_cache(maxsize=1)
+    def carregar_spacy():
+        import spacy
+
+        return spacy.load(modelo, exclude=COMPONENTES_DESATIVADOS)
+
+    servico = ServicoBusca(carregar_processador(carregar_spacy, modelo))
+    manipulador = type('Manipulador', (ManipuladorBusca,),
+                       {'servico': servico, 'registrar': registrar})
+    servidor = ThreadingHTTPServer((endereco, porta), manipulador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def carga(url: str, consultas: list, requisicoes: int = 1000, concorrencia: int = 8,
+          k: int = 5) -> dict:
+    """
+    Gerador de carga: envia buscas (GET /busca) de clientes simultâneos e
+    mede a vazão e a latência.
+
+    Args:
+        url (str): Endereço do serviço (ex.: http://127.0.0.1:8502).
+        consultas (list): Títulos buscados, repetidos em ciclo.
+        requisicoes (int, optional): Total de requisições.
+        concorrencia (int, optional): Clientes simultâneos.
+        k (int, optional): Quantidade de artigos por busca.
+
+    Returns:
+        dict: requisicoes, erros, segundos, vazao_rps e as latências
+        p50_ms, p90_ms e p99_ms.
+    """
+    def enviar(i):
+        endereco = f'{url}/busca?' + parse.urlencode({'q': consultas[i % len(consultas)], 'k': k})
+        inicio = time.perf_counter()
+        try:
+            with request.urlopen(endereco, timeout=60) as resposta:
+                resposta.read()
+            ok = True
+        except (error.URLError, OSError):
+            ok = False
+        return (time.perf_counter() - inicio) * 1000, ok
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as executor:
+        medidas = list(executor.map(enviar, range(requisicoes)))
+    segundos = time.perf_counter() - inicio
+    latencias = np.array([ms for ms, ok in medidas if ok])
+    percentis = (np.percentile(latencias, [50, 90, 99]) if len(latencias)
+                 else [math.nan] * 3)
+    return {'requisicoes': requisicoes, 'erros': sum(not ok for _, ok in medidas),
+            'segundos': segundos, 'vazao_rps': len(latencias) / segundos,
+            'p50_ms': float(percentis[0]), 'p90_ms': float(percentis[1]),
+            'p99_ms': float(percentis[2])}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='API HTTP da busca de artigos similares, sem o Streamlit.'
+    )
+    subparsers = parser.add_subparsers(dest='comando')
+
+    servir = subparsers.add_parser('servir', help='Inicia o serviço (padrão)')
+    servir.add_argument('--endereco', default=API_ENDERECO)
+    servir.add_argument('--porta', type=int, default=API_PORTA)
+    servir.add_argument('--registrar', action='store_true',
+                        help='Registra cada requisição no stderr')
+
+    gerar_carga = subparsers.add_parser('carga', help='Mede a vazão e a latência do serviço')
+    gerar_carga.add_argument('--url', default=f'http://127.0.0.1:{API_PORTA}')
+    gerar_carga.add_argument('--requisicoes', type=int, default=2000)
+    gerar_carga.add_argument('--concorrencia', type=int, default=8)
+    gerar_carga.add_argument('--consultas', type=int, default=2000,
+                             help='Títulos distintos da base usados como consultas')
+    args = parser.parse_args()
+
+    if args.comando == 'carga':
+        titulos = ArmazemArtigos().ler(['titulo'])['titulo'].dropna()
+        consultas = titulos.sample(min(args.consultas, len(titulos)), random_state=0).tolist()
+        print(json.dumps(carga(args.url, consultas, args.requisicoes, args.concorrencia),
+                         indent=2))
+    else:
+        inicio = time.perf_counter()
+        servidor = criar_servidor(getattr(args, 'endereco', API_ENDERECO),
+                                  getattr(args, 'porta', API_PORTA),
+                                  registrar=getattr(args, 'registrar', False))
+        endereco, porta = servidor.server_address[:2]
+        print(f'API da busca em http://{endereco}:{porta} '
+              f'({time.perf_counter() - inicio:.1f}s para carregar)', flush=True)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
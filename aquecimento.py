@@ -0,0 +1,67 @@
+import sys
+import threading
+import time
+
+
+class Aquecimento:
+    """
+    Carregamentos executados em sequência em uma thread em segundo plano,
+    enquanto as sessões do servidor seguem exibindo as páginas. As funções
+    são os próprios carregadores em cache do webapp (`st.cache_resource`):
+    uma sessão que precise de um recurso ainda em carregamento espera o
+    mesmo cálculo em vez de repeti-lo, e os já carregados são devolvidos
+    do cache.
+
+    Um erro em um carregamento é registrado em `erros` e não interrompe os
+    seguintes; a página que usar o recurso tenta carregá-lo novamente e
+    exibe o erro normalmente.
+    """
+
+    def __init__(self, tarefas: dict):
+        """
+        Args:
+            tarefas (dict): Nome -> função sem argumentos, na ordem de
+                execução.
+        """
+        self.tarefas = tarefas
+        self.duracoes_ms = {}
+        self.erros = {}
+        self._thread = threading.Thread(target=self._executar, name='aquecimento', daemon=True)
+
+    def iniciar(self) -> 'Aquecimento':
+        """
+        Inicia a thread dos carregamentos.
+
+        Returns:
+            Aquecimento: O próprio aquecimento.
+        """
+        self._thread.start()
+        return self
+
+    @property
+    def concluido(self) -> bool:
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    def aguardar(self, timeout: float = None) -> bool:
+        """
+        Espera o fim dos carregamentos.
+
+        Args:
+            timeout (float, optional): Espera máxima, em segundos. Se None,
+                sem limite.
+
+        Returns:
+            bool: True se todos os carregamentos terminaram.
+        """
+        self._thread.join(timeout)
+        return self.concluido
+
+    def _executar(self):
+        for nome, funcao in self.tarefas.items():
+            inicio = time.perf_counter()
+            try:
+                funcao()
+            except Exception as erro:
+                self.erros[nome] = repr(erro)
+                print(f'Aquecimento: {nome} falhou: {erro!r}', file=sys.stderr)
+            self.duracoes_ms[nome] = (time.perf_counter() - inicio) * 1000
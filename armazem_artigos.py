@@ -0,0 +1,342 @@
+import argparse
+import json
+import os
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from indice_busca import CAMINHO_INDICE, IndiceTfidf
+
+CAMINHO_BASE = Path('data/df_completo.feather')
+CAMINHO_INCREMENTOS = Path('data/incrementos')
+
+# Colunas que identificam um registro: um novo registro com a mesma chave
+# substitui o anterior (ex.: nota PEDro atualizada)
+CHAVE_REGISTRO = ['condicao', 'titulo', 'revista']
+
+COLUNAS = ['escala pedro', 'revista', 'tipo estudo', 'ano', 'titulo', 'decada',
+           'periodo', 'qualidade', 'regiao', 'titulo_limpo', 'condicao']
+
+# Tipos compactos das colunas (`ler(compacto=True)`): categorias para as
+# colunas com poucos valores distintos, inteiros anuláveis pequenos e textos
+# em memória Arrow em vez de objetos Python
+TIPOS_COMPACTOS = {
+    'escala pedro': 'Int8',
+    'ano': 'Int16',
+    'decada': 'Int16',
+    'tipo estudo': 'category',
+    'periodo': 'category',
+    'qualidade': 'category',
+    'regiao': 'category',
+    'condicao': 'category',
+    'revista': 'string[pyarrow]',
+    'titulo': 'string[pyarrow]',
+    'titulo_limpo': 'string[pyarrow]',
+}
+
+REGIAO_CONDICAO = {
+    'cervicalgia': 'cervical',
+    'lombalgia': 'lombar',
+    'dor_ombro': 'ombro',
+    'oa_joelho': 'joelho',
+    'dor_tornozelo': 'tornozelo',
+    'entorse_tornozelo': 'tornozelo',
+}
+
+
+def _gravar_json_atomico(caminho: Path, dados: dict):
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+    temporario.write_text(json.dumps(dados), encoding='utf-8')
+    os.replace(temporario, caminho)
+
+
+def geracao_atual(incrementos: Path = CAMINHO_INCREMENTOS) -> int:
+    """
+    Lê a geração atual dos dados (incrementada a cada acréscimo ou
+    compactação). É uma leitura pequena, feita a cada execução do app
+    para detectar dados novos sem reiniciar o servidor.
+
+    Args:
+        incrementos (Path, optional): Diretório dos incrementos.
+
+    Returns:
+        int: A geração atual (0 se nunca houve acréscimos).
+    """
+    try:
+        with open(Path(incrementos) / 'manifesto.json', encoding='utf-8') as arquivo:
+            return json.load(arquivo)['geracao']
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def periodo(ano: int) -> str:
+    """Faixa de 5 anos no formato da coluna `periodo` (ex.: '2010-15')."""
+    inicio = ano // 5 * 5
+    return '2020-' if inicio >= 2020 else f'{inicio}-{(inicio + 5) % 100:02d}'
+
+
+def preparar_registros(registros: pd.DataFrame, condicao: str,
+                       modelo_spacy) -> pd.DataFrame:
+    """
+    Completa registros extraídos da PEDro (ver `extracao_pedro`) com as
+    colunas derivadas da base: década, período, qualidade, região,
+    título processado e condição.
+
+    Args:
+        registros (pd.DataFrame): Colunas titulo, escala pedro, revista,
+            tipo estudo e ano.
+        condicao (str): Chave da condição dos registros.
+        modelo_spacy (spacy.language.Language): Modelo usado no
+            processamento dos títulos.
+
+    Returns:
+        pd.DataFrame: Registros com as colunas de `COLUNAS`.
+    """
+    from agregacoes import NOTA_CORTE_QUALIDADE, QUALIDADE_ALTA, QUALIDADE_BAIXA
+    from funcoes import limpar_titulo
+
+    registros = registros.copy()
+    registros['escala pedro'] = pd.to_numeric(registros['escala pedro'], errors='coerce')
+    registros['ano'] = registros['ano'].astype(int)
+    registros['decada'] = registros['ano'] // 10 * 10
+    registros['periodo'] = registros['ano'].map(periodo)
+    registros['qualidade'] = np.where(
+        registros['escala pedro'] > NOTA_CORTE_QUALIDADE, QUALIDADE_ALTA, QUALIDADE_BAIXA
+    )
+    registros['regiao'] = REGIAO_CONDICAO[condicao]
+    registros['condicao'] = condicao
+    registros['titulo_limpo'] = [limpar_titulo(modelo_spacy, titulo)
+                                 for titulo in registros['titulo']]
+    return registros[COLUNAS]
+
+
+class ArmazemArtigos:
+    """
+    Base de artigos formada pelo arquivo base (df_completo.feather) e por
+    incrementos somente de acréscimo (um arquivo Arrow/feather por lote de
+    novos registros). Acrescentar registros não reescreve a base; a
+    compactação une tudo em uma nova base.
+
+    As linhas são numeradas pela posição no conjunto base + incrementos,
+    que é a mesma ordem dos documentos no índice de busca. Registros
+    substituídos por outro com a mesma chave continuam ocupando sua
+    posição, mas não são devolvidos por `ler`.
+    """
+
+    def __init__(self, base: Path = CAMINHO_BASE,
+                 incrementos: Path = CAMINHO_INCREMENTOS):
+        self.base = Path(base)
+        self.incrementos = Path(incrementos)
+
+    @property
+    def manifesto(self) -> dict:
+        try:
+            with open(self.incrementos / 'manifesto.json', encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except OSError:
+            return {'geracao': 0, 'compactado_em': 0, 'segmentos': []}
+
+    @property
+    def geracao(self) -> int:
+        return self.manifesto['geracao']
+
+    def _arquivos(self) -> list:
+        return [self.base] + [self.incrementos / segmento['arquivo']
+                              for segmento in self.manifesto['segmentos']]
+
+    def ler(self, colunas: list = None, vigentes: bool = True,
+            compacto: bool = False) -> pd.DataFrame:
+        """
+        Lê os registros vigentes.
+
+        Args:
+            colunas (list, optional): Colunas a serem lidas. Se None, todas.
+            vigentes (bool, optional): Se False, inclui também os registros
+                substituídos (uma linha por posição, como no índice de
+                busca). O padrão é True.
+            compacto (bool, optional): Se True, converte as colunas para os
+                tipos de `TIPOS_COMPACTOS`. O padrão é False.
+
+        Returns:
+            pd.DataFrame: Registros vigentes, indexados pela posição no
+            conjunto base + incrementos.
+        """
+        arquivos = self._arquivos()
+        # As colunas da chave só são necessárias para remover os substituídos
+        substituidos = vigentes and len(arquivos) > 1
+        leitura = None if colunas is None else list(dict.fromkeys(
+            colunas + (CHAVE_REGISTRO if substituidos else [])
+        ))
+        partes = [pd.read_feather(arquivo, columns=leitura) for arquivo in arquivos]
+        registros = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+        if substituidos:
+            registros = registros[~registros.duplicated(CHAVE_REGISTRO, keep='last')]
+        if colunas is not None:
+            registros = registros[colunas]
+        if compacto:
+            # Após a concatenação: categorias de partes diferentes viram object
+            registros = registros.astype({coluna: tipo for coluna, tipo in TIPOS_COMPACTOS.items()
+                                          if coluna in registros})
+        return registros
+
+    def n_linhas(self) -> int:
+        """Quantidade de linhas (posições) na base + incrementos."""
+        return pd.read_feather(self.base, columns=['ano']).shape[0] + sum(
+            segmento['linhas'] for segmento in self.manifesto['segmentos']
+        )
+
+    def adicionar(self, registros: pd.DataFrame) -> int:
+        """
+        Acrescenta registros em um novo incremento. Registros com a mesma
+        chave (condição, título e revista) de um já existente o substituem.
+
+        Args:
+            registros (pd.DataFrame): Registros com as colunas de `COLUNAS`
+                (ver `preparar_registros`).
+
+        Returns:
+            int: A nova geração dos dados.
+        """
+        faltando = set(COLUNAS) - set(registros.columns)
+        if faltando:
+            raise ValueError(f'Colunas ausentes: {sorted(faltando)}')
+
+        manifesto = self.manifesto
+        geracao = manifesto['geracao'] + 1
+        arquivo = f'{geracao:06d}.feather'
+        self.incrementos.mkdir(parents=True, exist_ok=True)
+        registros[COLUNAS].reset_index(drop=True).to_feather(self.incrementos / arquivo)
+
+        manifesto['geracao'] = geracao
+        manifesto['segmentos'].append({'arquivo': arquivo, 'linhas': len(registros)})
+        _gravar_json_atomico(self.incrementos / 'manifesto.json', manifesto)
+        return geracao
+
+    def compactar(self) -> int:
+        """
+        Reescreve a base com os registros vigentes (sem os substituídos) e
+        remove os incrementos. As posições das linhas mudam, portanto o
+        índice de busca precisa ser reconstruído (ver `atualizar_indice`).
+
+        Returns:
+            int: A nova geração dos dados.
+        """
+        manifesto = self.manifesto
+        registros = self.ler().reset_index(drop=True)
+        temporario = self.base.with_name(f'{self.base.name}.tmp')
+        registros.to_feather(temporario)
+        os.replace(temporario, self.base)
+
+        geracao = manifesto['geracao'] + 1
+        self.incrementos.mkdir(parents=True, exist_ok=True)
+        _gravar_json_atomico(self.incrementos / 'manifesto.json',
+                             {'geracao': geracao, 'compactado_em': geracao,
+                              'segmentos': []})
+        for segmento in manifesto['segmentos']:
+            (self.incrementos / segmento['arquivo']).unlink(missing_ok=True)
+        return geracao
+
+
+def atualizar_indice(armazem: ArmazemArtigos, caminho: Path = CAMINHO_INDICE,
+                     min_ngram: int = 1, max_ngram: int = 1,
+                     mapear: bool = True) -> IndiceTfidf:
+    """
+    Coloca o índice de busca na geração atual da base. Se o índice salvo
+    cobre a base e parte dos incrementos, apenas os incrementos que faltam
+    são acrescentados; caso contrário (ou depois de uma compactação da
+    base), o índice é reconstruído.
+
+    Args:
+        armazem (ArmazemArtigos): A base de artigos.
+        caminho (Path, optional): Diretório do índice.
+        min_ngram (int, optional): Tamanho mínimo do n-gram. O padrão é 1.
+        max_ngram (int, optional): Tamanho máximo do n-gram. O padrão é 1.
+        mapear (bool, optional): Abre o índice salvo como memória mapeada
+            (ver `IndiceTfidf.carregar`). O padrão é True.
+
+    Returns:
+        IndiceTfidf: O índice atualizado.
+    """
+    caminho = Path(caminho)
+    manifesto = armazem.manifesto
+    indice = None
+    try:
+        indice = IndiceTfidf.carregar(caminho, mapear)
+    except (OSError, ValueError, KeyError):
+        # Índice inexistente ou salvo em formato antigo
+        indice = None
+    if indice is not None and ((indice.min_ngram, indice.max_ngram) != (min_ngram, max_ngram)
+                               or indice.geracao < manifesto.get('compactado_em', 0)):
+        indice = None
+    if indice is not None and indice.geracao == manifesto['geracao']:
+        return indice
+
+    if indice is not None:
+        limites = np.cumsum([pd.read_feather(armazem.base, columns=['ano']).shape[0]]
+                            + [segmento['linhas'] for segmento in manifesto['segmentos']])
+        pendentes = np.flatnonzero(limites == indice.n_documentos)
+        if len(pendentes):
+            for segmento in manifesto['segmentos'][pendentes[0]:]:
+                titulos = pd.read_feather(armazem.incrementos / segmento['arquivo'],
+                                          columns=['titulo_limpo'])['titulo_limpo']
+                indice.acrescentar(list(titulos))
+            indice.geracao = manifesto['geracao']
+            try:
+                indice.salvar_incremento(caminho)
+            except OSError:
+                pass
+            return indice
+
+    titulos = []
+    for arquivo in armazem._arquivos():
+        titulos.extend(pd.read_feather(arquivo, columns=['titulo_limpo'])['titulo_limpo'])
+    indice = IndiceTfidf.construir(titulos, min_ngram, max_ngram, manifesto['geracao'])
+    try:
+        indice.salvar(caminho)
+    except OSError:
+        # Sem permissão de escrita: o índice continua válido em memória.
+        pass
+    return indice
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Acrescenta registros à base de artigos, atualiza o índice '
+                    'de busca ou compacta base e índice.'
+    )
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    adicionar = comandos.add_parser('adicionar', help='Acrescenta um CSV extraído da PEDro')
+    adicionar.add_argument('arquivo', type=Path)
+    adicionar.add_argument('--condicao', required=True, choices=list(REGIAO_CONDICAO))
+    comandos.add_parser('compactar', help='Une base e incrementos e reconstrói o índice')
+    comandos.add_parser('indice', help='Atualiza o índice de busca')
+    comandos.add_parser('memoria', help='Compara a memória da base com os tipos padrão '
+                                        'e compactos')
+    args = parser.parse_args()
+
+    armazem = ArmazemArtigos()
+    if args.comando == 'memoria':
+        from indice_busca import COLUNAS_METADADOS
+
+        leituras = {'padrão': armazem.ler(), 'compacto': armazem.ler(compacto=True),
+                    'busca (compacto)': armazem.ler(COLUNAS_METADADOS, compacto=True)}
+        for nome, registros in leituras.items():
+            print(f'{nome:<18} {registros.memory_usage(deep=True).sum() / 2**20:8.2f} MB')
+        raise SystemExit(0)
+    if args.comando == 'adicionar':
+        import spacy
+
+        from configuracoes import COMPONENTES_DESATIVADOS, MODELO_SPACY
+
+        nlp = spacy.load(MODELO_SPACY, exclude=COMPONENTES_DESATIVADOS)
+        registros = preparar_registros(pd.read_csv(args.arquivo), args.condicao, nlp)
+        geracao = armazem.adicionar(registros)
+        print(f'{len(registros)} registro(s) acrescentado(s) (geração {geracao})')
+    elif args.comando == 'compactar':
+        geracao = armazem.compactar()
+        print(f'Base compactada (geração {geracao})')
+
+    indice = atualizar_indice(armazem)
+    print(f'Índice na geração {indice.geracao}: {indice.n_documentos} documentos')
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import time
+
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from armazem_artigos import ArmazemArtigos, atualizar_indice
+from deduplicacao import Duplicatas
+from deduplicacao import carregar_ou_construir as carregar_duplicatas
+from indice_busca import CAMINHO_INDICE, COLUNAS_METADADOS, IndiceTfidf, MascarasBusca
+
+CAMINHO_METADADOS = Path('data/metadados_busca')
+
+
+class TabelaMetadados:
+    """
+    Colunas de `COLUNAS_METADADOS` de todas as posições do índice (inclusive
+    dos registros substituídos), em um arquivo Arrow sem compressão aberto
+    como memória mapeada: os títulos não são copiados para cada processo,
+    e só as linhas dos resultados de uma busca são convertidas para pandas.
+    """
+
+    ARQUIVO = 'metadados.arrow'
+
+    def __init__(self, tabela: pa.Table):
+        self.tabela = tabela
+
+    def __len__(self) -> int:
+        return self.tabela.num_rows
+
+    @classmethod
+    def salvar(cls, registros: pd.DataFrame, caminho: Path):
+        """
+        Grava os registros (um por posição do índice, na ordem do índice).
+
+        Args:
+            registros (pd.DataFrame): Colunas de `COLUNAS_METADADOS`.
+            caminho (Path): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        destino = caminho / cls.ARQUIVO
+        temporario = destino.with_name(f'{destino.name}.{os.getpid()}.tmp')
+        registros.reset_index(drop=True).to_feather(temporario, compression='uncompressed')
+        os.replace(temporario, destino)
+
+    @classmethod
+    def carregar(cls, caminho: Path, mapear: bool = True) -> 'TabelaMetadados':
+        """
+        Abre a tabela gravada com `salvar`.
+
+        Args:
+            caminho (Path): Diretório da tabela.
+            mapear (bool, optional): Se True, a tabela é memória mapeada;
+                se False, é lida para a memória do processo. O padrão é
+                True.
+
+        Returns:
+            TabelaMetadados: A tabela.
+        """
+        arquivo = str(Path(caminho) / cls.ARQUIVO)
+        fonte = pa.memory_map(arquivo) if mapear else pa.OSFile(arquivo)
+        return cls(pa.ipc.open_file(fonte).read_all())
+
+    def linhas(self, linhas, colunas: list = None) -> pd.DataFrame:
+        """
+        Converte algumas linhas para pandas.
+
+        Args:
+            linhas (list): Posições no índice.
+            colunas (list, optional): Colunas. Se None, todas.
+
+        Returns:
+            pd.DataFrame: As linhas, na ordem pedida e indexadas pela
+            posição, com os tipos de `armazem_artigos.TIPOS_COMPACTOS`.
+        """
+        linhas = np.asarray(linhas, dtype=np.int64)
+        tabela = self.tabela if colunas is None else self.tabela.select(colunas)
+        registros = tabela.take(pa.array(linhas)).to_pandas()
+        registros.index = linhas
+        return registros
+
+
+class DadosBusca(NamedTuple):
+    """Índice, máscaras e metadados da busca em uma geração dos dados."""
+    indice: IndiceTfidf
+    mascaras: MascarasBusca
+    metadados: TabelaMetadados
+    geracao: int
+
+
+def _identificacao(indice: IndiceTfidf, duplicatas: Duplicatas) -> dict:
+    return {'assinatura': indice.assinatura, 'geracao': indice.geracao,
+            'n_documentos': indice.n_documentos,
+            'duplicatas': {'assinatura': duplicatas.assinatura, 'limiar': duplicatas.limiar}}
+
+
+def salvar_metadados(indice: IndiceTfidf, registros: pd.DataFrame, vigentes: pd.DataFrame,
+                     duplicatas: Duplicatas, caminho: Path = CAMINHO_METADADOS):
+    """
+    Grava as máscaras e a tabela de metadados de uma geração do índice.
+    A identificação do índice e dos grupos de repetidos (`meta.json`) é
+    gravada por último.
+
+    Args:
+        indice (IndiceTfidf): O índice TF-IDF da geração.
+        registros (pd.DataFrame): Metadados de todas as posições do índice
+            (`ArmazemArtigos.ler(vigentes=False)`).
+        vigentes (pd.DataFrame): Metadados dos registros vigentes,
+            indexados pela posição.
+        duplicatas (Duplicatas): Grupos de registros repetidos (ver
+            `deduplicacao`): só a linha canônica de cada um fica ativa.
+        caminho (Path, optional): Diretório de destino.
+    """
+    caminho = Path(caminho)
+    MascarasBusca(vigentes, n_documentos=indice.n_documentos,
+                  duplicatas=duplicatas).salvar(caminho)
+    TabelaMetadados.salvar(registros, caminho)
+    temporario = caminho / f'meta.json.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(_identificacao(indice, duplicatas), arquivo)
+    os.replace(temporario, caminho / 'meta.json')
+
+
+def carregar_ou_construir(armazem: ArmazemArtigos = None, caminho: Path = CAMINHO_INDICE,
+                          metadados: Path = CAMINHO_METADADOS,
+                          mapear: bool = True) -> DadosBusca:
+    """
+    Abre os artefatos da busca da geração atual: o índice TF-IDF (ver
+    `armazem_artigos.atualizar_indice`), as máscaras dos filtros e a
+    tabela de metadados. Com `mapear`, todos os arrays são memória mapeada
+    e vários processos do servidor na mesma máquina compartilham uma única
+    cópia física dos artefatos. Máscaras e metadados ausentes ou de outra
+    geração do índice ou dos grupos de repetidos (ver `deduplicacao`) são
+    recalculados e gravados.
+
+    Args:
+        armazem (ArmazemArtigos, optional): A base de artigos. Se None, a
+            base padrão.
+        caminho (Path, optional): Diretório do índice.
+        metadados (Path, optional): Diretório das máscaras e da tabela de
+            metadados.
+        mapear (bool, optional): Se False, os artefatos são lidos para a
+            memória do processo. O padrão é True.
+
+    Returns:
+        DadosBusca: Os artefatos prontos para consulta.
+    """
+    armazem = armazem or ArmazemArtigos()
+    metadados = Path(metadados)
+    indice = atualizar_indice(armazem, caminho, min_ngram=1, max_ngram=1, mapear=mapear)
+    duplicatas = carregar_duplicatas(armazem)
+    try:
+        with open(metadados / 'meta.json', encoding='utf-8') as arquivo:
+            valido = json.load(arquivo) == _identificacao(indice, duplicatas)
+        if valido:
+            return DadosBusca(indice, MascarasBusca.carregar(metadados, mapear),
+                              TabelaMetadados.carregar(metadados, mapear), indice.geracao)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    registros = armazem.ler(COLUNAS_METADADOS, vigentes=False, compacto=True)
+    vigentes = armazem.ler(COLUNAS_METADADOS, compacto=True)
+    try:
+        salvar_metadados(indice, registros, vigentes, duplicatas, metadados)
+        return DadosBusca(indice, MascarasBusca.carregar(metadados, mapear),
+                          TabelaMetadados.carregar(metadados, mapear), indice.geracao)
+    except OSError:
+        # Sem permissão de escrita: os artefatos continuam válidos em memória.
+        return DadosBusca(indice, MascarasBusca(vigentes, n_documentos=indice.n_documentos,
+                                                duplicatas=duplicatas),
+                          TabelaMetadados(pa.Table.from_pandas(registros, preserve_index=False)),
+                          indice.geracao)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Grava os artefatos da busca (índice, máscaras e metadados) da geração '
+                    'atual, para que os processos do servidor apenas os abram.'
+    )
+    parser.add_argument('--indice', type=Path, default=CAMINHO_INDICE)
+    parser.add_argument('--metadados', type=Path, default=CAMINHO_METADADOS)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    dados = carregar_ou_construir(caminho=args.indice, metadados=args.metadados)
+    tamanho = sum(arquivo.stat().st_size for diretorio in (args.indice, args.metadados)
+                  for arquivo in diretorio.rglob('*') if arquivo.is_file()) / 2**20
+    print(f'Artefatos da geração {dados.geracao} ({dados.indice.n_documentos} documentos, '
+          f'{tamanho:.1f} MB) em {args.indice} e {args.metadados} '
+          f'({time.perf_counter() - inicio:.1f}s)')
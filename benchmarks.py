@@ -0,0 +1,597 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Tamanhos dos corpora sintéticos da busca
+TAMANHOS_CORPUS = (1000, 10000, 100000)
+
+# Aumento relativo de uma métrica considerado regressão, e diferença
+# absoluta mínima (em ms) para descartar o ruído de medidas muito curtas
+LIMITE_REGRESSAO = 0.25
+MINIMO_REGRESSAO_MS = 1.0
+
+
+def medir(funcao, repeticoes: int = 5, aquecimento: int = 1) -> float:
+    """
+    Mede o tempo de execução de uma função.
+
+    Args:
+        funcao (callable): Função sem argumentos.
+        repeticoes (int, optional): Execuções medidas. O padrão é 5.
+        aquecimento (int, optional): Execuções descartadas antes das
+            medidas. O padrão é 1.
+
+    Returns:
+        float: A mediana dos tempos, em milissegundos.
+    """
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tempos))
+
+
+def corpus_sintetico(n_titulos: int, semente: int = 0) -> list:
+    """
+    Gera títulos já processados (como `titulo_limpo`) sorteando palavras e
+    tamanhos com as frequências observadas na base, de forma que os
+    corpora sintéticos tenham a mesma distribuição de termos da real.
+
+    Args:
+        n_titulos (int): Quantidade de títulos.
+        semente (int, optional): Semente do sorteio.
+
+    Returns:
+        list: Os títulos gerados.
+    """
+    from armazem_artigos import ArmazemArtigos
+
+    titulos = ArmazemArtigos().ler(['titulo_limpo'])['titulo_limpo'].dropna()
+    tokens = [titulo.split() for titulo in titulos]
+    frequencias = Counter(token for titulo in tokens for token in titulo)
+    vocabulario = np.array(list(frequencias))
+    pesos = np.fromiter(frequencias.values(), dtype=float)
+    tamanhos = np.array([len(titulo) for titulo in tokens if titulo])
+
+    gerador = np.random.default_rng(semente)
+    n_palavras = gerador.choice(tamanhos, n_titulos)
+    palavras = gerador.choice(vocabulario, n_palavras.sum(), p=pesos / pesos.sum())
+    fins = np.cumsum(n_palavras)
+    return [' '.join(palavras[fim - n:fim]) for fim, n in zip(fins, n_palavras)]
+
+
+def benchmark_busca(tamanhos: tuple = TAMANHOS_CORPUS, k: int = 10,
+                    n_consultas: int = 100, n_lote: int = 500) -> dict:
+    """
+    Latência da busca TF-IDF, por consulta e em lote, em corpora
+    sintéticos de diferentes tamanhos.
+
+    Args:
+        tamanhos (tuple, optional): Quantidades de títulos dos corpora.
+        k (int, optional): Quantidade de resultados. O padrão é 10.
+        n_consultas (int, optional): Consultas individuais medidas.
+        n_lote (int, optional): Títulos da busca em lote.
+
+    Returns:
+        dict: Métricas `busca.<tamanho>.*`, em milissegundos.
+    """
+    from indice_busca import IndiceTfidf, buscar_similares, buscar_similares_lote
+
+    metricas = {}
+    consultas = corpus_sintetico(max(n_consultas, n_lote), semente=1)
+    for tamanho in tamanhos:
+        titulos = corpus_sintetico(tamanho)
+        prefixo = f'busca.{tamanho}'
+
+        inicio = time.perf_counter()
+        indice = IndiceTfidf.construir(titulos, 1, 1)
+        metricas[f'{prefixo}.construcao_ms'] = (time.perf_counter() - inicio) * 1000
+
+        buscar_similares(indice, consultas[0], k)
+        tempos = []
+        for consulta in consultas[:n_consultas]:
+            inicio = time.perf_counter()
+            buscar_similares(indice, consulta, k)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        metricas[f'{prefixo}.consulta_mediana_ms'] = float(np.median(tempos))
+        metricas[f'{prefixo}.consulta_p95_ms'] = float(np.percentile(tempos, 95))
+
+        lote = medir(lambda: buscar_similares_lote(indice, consultas[:n_lote], k), 3)
+        metricas[f'{prefixo}.lote_ms'] = lote
+        metricas[f'{prefixo}.lote_por_titulo_ms'] = lote / n_lote
+    return metricas
+
+
+def benchmark_dados() -> dict:
+    """
+    Tempo de leitura da base (feather) e, por condição, das tabelas
+    agregadas e da contagem dos termos dos títulos por década.
+
+    Returns:
+        dict: Métricas `dados.*`, em milissegundos.
+    """
+    import agregacoes
+    import termos
+
+    from armazem_artigos import ArmazemArtigos
+    from dados import CONDICOES
+
+    metricas = {'dados.base_ms': medir(lambda: ArmazemArtigos().ler())}
+    agregacoes.tabela_ensaios()
+    termos.matriz_termos()
+    funcoes_tabelas = [agregacoes.contagem_anual, agregacoes.ensaios,
+                       agregacoes.qualidade_decada, agregacoes.resumo_decada]
+
+    def tabelas(condicao):
+        for funcao in funcoes_tabelas:
+            funcao.cache_clear()
+            funcao(condicao)
+
+    def contar_termos(condicao):
+        for funcao in (termos.termos_decadas, termos.termos_frequentes,
+                       termos.termos_por_decada):
+            funcao.cache_clear()
+        termos.termos_frequentes((condicao,))
+        termos.termos_por_decada((condicao,))
+
+    for condicao in CONDICOES:
+        metricas[f'dados.{condicao}.tabelas_ms'] = medir(lambda: tabelas(condicao))
+        metricas[f'dados.{condicao}.termos_ms'] = medir(lambda: contar_termos(condicao))
+    return metricas
+
+
+def benchmark_figuras() -> dict:
+    """
+    Tempo de construção e serialização (JSON) de cada gráfico de
+    `funcoes.py`, mediana entre as condições.
+
+    Returns:
+        dict: Métricas `figuras.<grafico>_ms`, em milissegundos.
+    """
+    from agregacoes import contagem_anual, ensaios, qualidade_decada, resumo_decada
+    from dados import CONDICOES
+    from facetas import SelecaoFacetas, indice_facetas
+    from funcoes import CONSTRUTORES_FIGURAS
+    from termos import termos_frequentes, termos_por_decada
+
+    tempos = {grafico: [] for grafico in CONSTRUTORES_FIGURAS}
+    for condicao, nome in CONDICOES.items():
+        df1 = contagem_anual(condicao)
+        contagem_notas = indice_facetas().resumir(SelecaoFacetas(condicoes=(condicao,))).df2
+        entradas = {'linha_tempo': (df1,), 'histograma': (ensaios(condicao),),
+                    'histograma_contagem': (contagem_notas,),
+                    'bar_quali': (qualidade_decada(condicao),),
+                    'linha_quali_quant': (resumo_decada(condicao), df1),
+                    'termos_frequentes': (termos_frequentes((condicao,)),),
+                    'termos_decada': (termos_por_decada((condicao,)),)}
+        for grafico, construtor in CONSTRUTORES_FIGURAS.items():
+            tempos[grafico].append(medir(
+                lambda: construtor(*entradas[grafico], nome=nome).to_json(), 3
+            ))
+    return {f'figuras.{grafico}_ms': float(np.median(valores))
+            for grafico, valores in tempos.items()}
+
+
+def benchmark_facetas(fatores: tuple = (1, 10, 100)) -> dict:
+    """
+    Tempo de construção do índice de facetas e dos agregados de algumas
+    seleções, na base real repetida `fator` vezes. As métricas são
+    identificadas pelo fator, e não pelo número de linhas, para que
+    continuem comparáveis quando a base cresce.
+
+    Args:
+        fatores (tuple, optional): Quantas vezes a base é repetida.
+
+    Returns:
+        dict: Métricas `facetas.<fator>x.*`, em milissegundos.
+    """
+    import pandas as pd
+
+    from agregacoes import tabela_ensaios, tabela_outros_estudos
+    from facetas import IndiceFacetas, SelecaoFacetas
+
+    selecoes = {
+        'todos': SelecaoFacetas(),
+        'condicao': SelecaoFacetas(condicoes=('lombalgia',)),
+        'combinada': SelecaoFacetas(regioes=('ombro',), tipos_estudo=('CLINICAL TRIAL',),
+                                    ano_min=2010, nota_min=7),
+    }
+    ensaios = tabela_ensaios()
+    metricas = {}
+    for fator in fatores:
+        # Cada cópia com grupos próprios, para que não sejam repetidas umas
+        # das outras
+        n_grupos = int(ensaios['grupo'].max()) + 1
+        tabela = pd.concat([ensaios.assign(grupo=ensaios['grupo'] + i * n_grupos)
+                            for i in range(fator)], ignore_index=True)
+        prefixo = f'facetas.{fator}x'
+        inicio = time.perf_counter()
+        indice = IndiceFacetas(tabela, tabela_outros_estudos())
+        metricas[f'{prefixo}.construcao_ms'] = (time.perf_counter() - inicio) * 1000
+        for nome, selecao in selecoes.items():
+            metricas[f'{prefixo}.{nome}_ms'] = medir(lambda: indice.resumir(selecao))
+    return metricas
+
+
+def benchmark_app(script: str = 'webapp_pedro.py',
+                  consulta: str = 'exercise for chronic neck pain') -> dict:
+    """
+    Tempo de execução completa do script do webapp (AppTest do Streamlit):
+    a primeira execução, a primeira visita a cada seção e uma nova execução
+    da seção já visitada (com os caches do processo aquecidos). Na seção da
+    busca, também é medida a execução após o preenchimento da consulta.
+
+    Args:
+        script (str, optional): Script do webapp.
+        consulta (str, optional): Texto digitado na busca.
+
+    Returns:
+        dict: Métricas `app.*`, em milissegundos. Vazio se o Streamlit
+        instalado não tiver o AppTest (versões anteriores à 1.28).
+    """
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print('AppTest indisponível (requer streamlit>=1.28): app ignorado',
+              file=sys.stderr)
+        return {}
+
+    def executar(app):
+        inicio = time.perf_counter()
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        return (time.perf_counter() - inicio) * 1000
+
+    app = AppTest.from_file(script, default_timeout=600)
+    metricas = {'app.inicial_ms': executar(app)}
+    for secao in app.radio[0].options:
+        app.radio[0].set_value(secao)
+        metricas[f'app.{secao}.primeira_ms'] = executar(app)
+        if app.text_input:
+            app.text_input[0].set_value(consulta)
+            metricas[f'app.{secao}.consulta_ms'] = executar(app)
+        metricas[f'app.{secao}.rerun_ms'] = executar(app)
+    return metricas
+
+
+def _partida(script: str, consulta: str, espera: float, aquecimento: bool, inicio: float,
+             fila):
+    # Processo de `benchmark_partida`: um processo novo do servidor, com a
+    # primeira sessão abrindo a página inicial e, depois de `espera`
+    # segundos, fazendo uma busca
+    import os
+
+    os.environ['PEDRO_AQUECIMENTO'] = '1' if aquecimento else '0'
+    from streamlit.testing.v1 import AppTest
+
+    def executar(app):
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    app = AppTest.from_file(script, default_timeout=600)
+    executar(app)
+    fila.put(('primeira_pintura_ms', (time.time() - inicio) * 1000))
+    time.sleep(espera)
+    inicio_busca = time.perf_counter()
+    app.radio[0].set_value(app.radio[0].options[-1])
+    executar(app)
+    app.text_input[0].set_value(consulta)
+    executar(app)
+    fila.put(('primeira_busca_ms', (time.perf_counter() - inicio_busca) * 1000))
+
+
+def benchmark_partida(esperas: tuple = (0, 10), script: str = 'webapp_pedro.py',
+                      consulta: str = 'exercise for chronic neck pain') -> dict:
+    """
+    Partida a frio de um processo do servidor, com e sem o aquecimento da
+    busca em segundo plano (`aquecimento.py`): o tempo desde o início do
+    processo até a primeira página exibida (importações, dados da condição
+    e figuras) e o tempo da primeira busca (abrir a seção e buscar),
+    feita `espera` segundos depois da primeira página.
+
+    Args:
+        esperas (tuple, optional): Segundos entre a primeira página e a
+            primeira busca.
+        script (str, optional): Script do webapp.
+        consulta (str, optional): Texto digitado na busca.
+
+    Returns:
+        dict: Métricas `partida.<modo>.<espera>s.*`, em milissegundos.
+        Vazio se o Streamlit instalado não tiver o AppTest.
+    """
+    try:
+        from streamlit.testing.v1 import AppTest  # noqa: F401
+    except ImportError:
+        print('AppTest indisponível (requer streamlit>=1.28): partida ignorada',
+              file=sys.stderr)
+        return {}
+
+    contexto = multiprocessing.get_context('spawn')
+    metricas = {}
+    for modo, aquecimento in (('sem_aquecimento', False), ('aquecimento', True)):
+        for espera in esperas:
+            fila = contexto.Queue()
+            processo = contexto.Process(target=_partida,
+                                        args=(script, consulta, espera, aquecimento,
+                                              time.time(), fila))
+            processo.start()
+            for _ in range(2):
+                nome, valor = fila.get()
+                metricas[f'partida.{modo}.{espera}s.{nome}'] = valor
+            processo.join()
+    return metricas
+
+
+def benchmark_api(requisicoes: int = 1000, concorrencia: int = 4) -> dict:
+    """
+    Inicialização, vazão e latência da API da busca (`api_busca.py`),
+    executada em um processo separado e consultada por clientes
+    simultâneos com títulos distintos da base (sem acertos no cache).
+
+    Args:
+        requisicoes (int, optional): Total de requisições.
+        concorrencia (int, optional): Clientes simultâneos.
+
+    Returns:
+        dict: Métricas `api.*` (tempos em milissegundos e vazão em
+        requisições por segundo).
+    """
+    from api_busca import carga
+    from armazem_artigos import ArmazemArtigos
+
+    titulos = ArmazemArtigos().ler(['titulo'])['titulo'].dropna()
+    consultas = titulos.sample(min(requisicoes, len(titulos)), random_state=0).tolist()
+
+    inicio = time.perf_counter()
+    processo = subprocess.Popen([sys.executable, 'api_busca.py', 'servir', '--porta', '0'],
+                                stdout=subprocess.PIPE, text=True)
+    try:
+        linha = processo.stdout.readline()
+        inicializacao = (time.perf_counter() - inicio) * 1000
+        url = next(parte for parte in linha.split() if parte.startswith('http://'))
+        resultado = carga(url, consultas, requisicoes, concorrencia)
+    finally:
+        processo.terminate()
+        processo.wait()
+    return {'api.inicializacao_ms': inicializacao, 'api.vazao_rps': resultado['vazao_rps'],
+            'api.p50_ms': resultado['p50_ms'], 'api.p99_ms': resultado['p99_ms']}
+
+
+def _memoria_processo() -> dict:
+    """RSS, PSS e memória privada (MB) do processo, de /proc/self/smaps_rollup (Linux)."""
+    try:
+        linhas = Path('/proc/self/smaps_rollup').read_text().splitlines()[1:]
+    except OSError:
+        return {}
+    campos = {nome: int(valor.split()[0]) / 1024
+              for nome, valor in (linha.split(':', 1) for linha in linhas)}
+    return {'rss_mb': campos['Rss'], 'pss_mb': campos['Pss'],
+            'privada_mb': campos['Private_Clean'] + campos['Private_Dirty']}
+
+
+def _trabalhador(diretorio: Path, mapear: bool, consulta: str, inicio: float,
+                 fila, medir_memoria, terminar):
+    # Processo de `benchmark_trabalhadores`: abre os artefatos como um
+    # processo do servidor e faz a primeira busca
+    from armazem_artigos import ArmazemArtigos
+    from artefatos_busca import carregar_ou_construir
+    from indice_busca import buscar_similares
+
+    armazem = ArmazemArtigos(diretorio / 'base.feather', diretorio / 'incrementos')
+    dados = carregar_ou_construir(armazem, diretorio / 'indice', diretorio / 'metadados', mapear)
+    resultado = buscar_similares(dados.indice, consulta, 10, dados.mascaras)
+    dados.metadados.linhas([linha for linha, _ in resultado])
+    fila.put(('primeira_busca_ms', (time.time() - inicio) * 1000))
+    # A memória é medida com todos os processos abertos: o PSS divide as
+    # páginas compartilhadas entre eles
+    medir_memoria.wait()
+    fila.put(('memoria', _memoria_processo()))
+    terminar.wait()
+
+
+def benchmark_trabalhadores(trabalhadores: tuple = (1, 2, 4, 8), fator: int = 20,
+                            consulta: str = 'exercise for chronic neck pain') -> dict:
+    """
+    Memória e tempo até a primeira busca de vários processos do servidor
+    na mesma máquina, com os artefatos da busca (`artefatos_busca`) abertos
+    como memória mapeada ou lidos para a memória de cada processo. Usa a
+    base real repetida `fator` vezes, com os artefatos já gravados, e
+    inicia os processos ao mesmo tempo.
+
+    Args:
+        trabalhadores (tuple, optional): Quantidades de processos.
+        fator (int, optional): Quantas vezes a base é repetida.
+        consulta (str, optional): A primeira busca (já processada).
+
+    Returns:
+        dict: Métricas `trabalhadores.<modo>.<n>.*`: médias por processo do
+        tempo até a primeira busca (ms), do RSS, do PSS (a memória
+        compartilhada dividida entre os processos) e da memória privada
+        (MB), e a soma do PSS de todos os processos.
+    """
+    import pandas as pd
+
+    from armazem_artigos import ArmazemArtigos
+    from artefatos_busca import carregar_ou_construir
+
+    contexto = multiprocessing.get_context('spawn')
+    metricas = {}
+    with tempfile.TemporaryDirectory() as temporario:
+        diretorio = Path(temporario)
+        base = ArmazemArtigos().ler(vigentes=False)
+        pd.concat([base] * fator, ignore_index=True).to_feather(diretorio / 'base.feather')
+        carregar_ou_construir(ArmazemArtigos(diretorio / 'base.feather',
+                                             diretorio / 'incrementos'),
+                              diretorio / 'indice', diretorio / 'metadados')
+        for modo, mapear in (('mapeado', True), ('copia', False)):
+            for n in trabalhadores:
+                fila = contexto.Queue()
+                medir_memoria, terminar = contexto.Event(), contexto.Event()
+                inicio = time.time()
+                processos = [contexto.Process(target=_trabalhador,
+                                              args=(diretorio, mapear, consulta, inicio, fila,
+                                                    medir_memoria, terminar))
+                             for _ in range(n)]
+                for processo in processos:
+                    processo.start()
+                tempos = [fila.get()[1] for _ in processos]
+                medir_memoria.set()
+                memorias = [fila.get()[1] for _ in processos]
+                terminar.set()
+                for processo in processos:
+                    processo.join()
+
+                prefixo = f'trabalhadores.{modo}.{n}'
+                metricas[f'{prefixo}.primeira_busca_ms'] = float(np.mean(tempos))
+                for campo in memorias[0]:
+                    metricas[f'{prefixo}.{campo}'] = float(np.mean([m[campo] for m in memorias]))
+                if memorias[0]:
+                    metricas[f'{prefixo}.pss_total_mb'] = float(sum(m['pss_mb'] for m in memorias))
+    return metricas
+
+
+GRUPOS = {
+    'busca': benchmark_busca,
+    'dados': benchmark_dados,
+    'figuras': benchmark_figuras,
+    'facetas': benchmark_facetas,
+    'app': benchmark_app,
+    'partida': benchmark_partida,
+    'api': benchmark_api,
+    'trabalhadores': benchmark_trabalhadores,
+}
+
+
+def executar_benchmarks(grupos: list = tuple(GRUPOS), **parametros) -> dict:
+    """
+    Executa os grupos de benchmarks e reúne as métricas com a identificação
+    do ambiente e do commit medido.
+
+    Args:
+        grupos (list, optional): Nomes dos grupos (ver `GRUPOS`).
+        **parametros: Repassados aos grupos que os aceitam (ex.:
+            tamanhos=(1000,) para `busca`).
+
+    Returns:
+        dict: commit, data, python, plataforma e metricas.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    metricas = {}
+    for grupo in grupos:
+        funcao = GRUPOS[grupo]
+        argumentos = {nome: valor for nome, valor in parametros.items()
+                      if nome in funcao.__code__.co_varnames}
+        inicio = time.perf_counter()
+        metricas.update(funcao(**argumentos))
+        print(f'{grupo}: {time.perf_counter() - inicio:.1f}s', file=sys.stderr)
+
+    return {
+        'commit': commit,
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'metricas': metricas,
+    }
+
+
+def comparar(base: dict, atual: dict, limite: float = LIMITE_REGRESSAO,
+             minimo_ms: float = MINIMO_REGRESSAO_MS) -> list:
+    """
+    Compara as métricas da base com as de outro resultado de
+    `executar_benchmarks`. Para as vazões (`*_rps`) a razão é invertida:
+    uma queda é regressão. As métricas ausentes do resultado comparado são
+    incluídas com valor e razão None (sem regressão).
+
+    Args:
+        base (dict): Resultado de referência.
+        atual (dict): Resultado comparado.
+        limite (float, optional): Aumento relativo considerado regressão.
+        minimo_ms (float, optional): Aumento absoluto mínimo (ms) para que
+            a métrica seja considerada regressão.
+
+    Returns:
+        list: Tuplas (métrica, base, atual, razão, regressão), na ordem
+        das métricas da base.
+    """
+    linhas = []
+    for metrica, valor_base in base['metricas'].items():
+        valor = atual['metricas'].get(metrica)
+        if valor is None:
+            razao = regressao = None
+        elif metrica.endswith('_rps'):
+            # Vazão: quanto maior, melhor
+            razao = valor_base / valor if valor else float('inf')
+            regressao = razao > 1 + limite
+        else:
+            razao = valor / valor_base if valor_base else float('inf')
+            regressao = razao > 1 + limite and valor - valor_base > minimo_ms
+        linhas.append((metrica, valor_base, valor, razao, bool(regressao)))
+    return linhas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Mede a busca, a leitura dos dados, a construção das figuras e a '
+                    'execução do webapp, ou compara dois resultados salvos.'
+    )
+    parser.add_argument('--grupos', nargs='+', choices=list(GRUPOS), default=list(GRUPOS))
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_CORPUS),
+                        help='Quantidades de títulos dos corpora sintéticos da busca')
+    parser.add_argument('--saida', type=Path, help='Arquivo JSON com os resultados')
+    parser.add_argument('--comparar', type=Path, nargs='+', metavar='JSON',
+                        help='Resultado de referência e, opcionalmente, o resultado '
+                             'comparado (se omitido, os benchmarks são executados)')
+    parser.add_argument('--limite', type=float, default=LIMITE_REGRESSAO,
+                        help='Aumento relativo considerado regressão (padrão: 0.25)')
+    args = parser.parse_args()
+
+    if args.comparar and len(args.comparar) > 1:
+        atual = json.loads(args.comparar[1].read_text(encoding='utf-8'))
+    else:
+        atual = executar_benchmarks(args.grupos, tamanhos=tuple(args.tamanhos))
+        if args.saida:
+            args.saida.parent.mkdir(parents=True, exist_ok=True)
+            args.saida.write_text(json.dumps(atual, indent=2, ensure_ascii=False),
+                                  encoding='utf-8')
+
+    if not args.comparar:
+        for metrica, valor in atual['metricas'].items():
+            print(f'{metrica:<55} {valor:>12.3f}')
+        sys.exit(0)
+
+    base = json.loads(args.comparar[0].read_text(encoding='utf-8'))
+    linhas = comparar(base, atual, args.limite)
+    print(f'{"métrica":<55} {base["commit"] or "base":>12} {atual["commit"] or "atual":>12} '
+          f'{"razão":>7}')
+    for metrica, valor_base, valor, razao, regressao in linhas:
+        if valor is None:
+            print(f'{metrica:<55} {valor_base:>12.3f} {"ausente":>12}')
+            continue
+        print(f'{metrica:<55} {valor_base:>12.3f} {valor:>12.3f} {razao:>7.2f}'
+              f'{"  REGRESSÃO" if regressao else ""}')
+    regressoes = sum(regressao for *_, regressao in linhas)
+    ausentes = sum(valor is None for _, _, valor, _, _ in linhas)
+    print(f'{regressoes} regressões (limite +{args.limite:.0%}), '
+          f'{ausentes} métricas ausentes do resultado comparado')
+    sys.exit(1 if regressoes else 0)
@@ -0,0 +1,163 @@
+import threading
+import time
+
+from collections import OrderedDict
+from typing import NamedTuple
+
+from indice_busca import FiltrosBusca
+
+
+class ChaveConsulta(NamedTuple):
+    """
+    Chave de uma busca no cache: a consulta normalizada (`titulo_limpo`) e
+    os parâmetros que alteram o resultado.
+    """
+    titulo_limpo: str
+    modo: str
+    k: int
+    filtros: FiltrosBusca = FiltrosBusca()
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Forma do texto digitado usada como chave da normalização: minúsculas e
+    espaços simples, sem espaços nas pontas.
+
+    Args:
+        texto (str): O texto digitado.
+
+    Returns:
+        str: O texto normalizado.
+    """
+    return ' '.join(texto.lower().split())
+
+
+class CacheConsultas:
+    """
+    Cache dos resultados das buscas (top-k), compartilhado entre sessões,
+    com descarte do resultado usado há mais tempo (LRU) quando o limite de
+    itens é atingido e expiração após `ttl_segundos`. Os resultados são
+    válidos para uma geração dos dados: uma consulta (`obter`) com uma
+    geração diferente esvazia o cache, e resultados calculados sobre outra
+    geração não são guardados.
+
+    Também guarda a forma processada (`titulo_limpo`) dos textos digitados,
+    para que buscas repetidas não passem de novo pelo modelo spaCy.
+    """
+
+    def __init__(self, max_itens: int = 1024, ttl_segundos: float = 3600):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.geracao = None
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.expirados = 0
+        self.invalidacoes = 0
+        self._resultados = OrderedDict()
+        self._titulos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._resultados)
+
+    def _verificar_geracao(self, geracao: int):
+        # Chamado com o lock adquirido
+        if geracao != self.geracao:
+            if self._resultados:
+                self.invalidacoes += 1
+            self._resultados.clear()
+            self.geracao = geracao
+
+    def normalizar(self, texto: str, limpar) -> str:
+        """
+        Processa o texto digitado, reutilizando o resultado de textos
+        iguais (após `normalizar_texto`) já processados.
+
+        Args:
+            texto (str): O texto digitado.
+            limpar (callable): Função que processa o texto (ex.:
+                `funcoes.limpar_titulo` com o modelo spaCy).
+
+        Returns:
+            str: O texto processado (`titulo_limpo`).
+        """
+        texto = normalizar_texto(texto)
+        with self._lock:
+            titulo_limpo = self._titulos.get(texto)
+            if titulo_limpo is not None:
+                self._titulos.move_to_end(texto)
+                return titulo_limpo
+
+        titulo_limpo = limpar(texto)
+        with self._lock:
+            self._titulos[texto] = titulo_limpo
+            while len(self._titulos) > self.max_itens:
+                self._titulos.popitem(last=False)
+        return titulo_limpo
+
+    def obter(self, chave: ChaveConsulta, geracao: int) -> tuple:
+        """
+        Busca o resultado de uma consulta no cache.
+
+        Args:
+            chave (ChaveConsulta): A consulta e seus parâmetros.
+            geracao (int): Geração atual dos dados.
+
+        Returns:
+            tuple: Pares (linha no corpus, similaridade), ou None se a
+            consulta não estiver no cache ou tiver expirado.
+        """
+        with self._lock:
+            self._verificar_geracao(geracao)
+            item = self._resultados.get(chave)
+            if item is not None and time.monotonic() - item[0] > self.ttl_segundos:
+                del self._resultados[chave]
+                self.expirados += 1
+                item = None
+            if item is None:
+                self.falhas += 1
+                return None
+            self._resultados.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def guardar(self, chave: ChaveConsulta, resultado, geracao: int):
+        """
+        Guarda o resultado de uma consulta, descartando o menos usado
+        recentemente caso o limite de itens seja ultrapassado. Se a geração
+        do cache mudou durante a busca, o resultado não é guardado: uma
+        busca lenta sobre os dados antigos não pode esvaziar o cache da
+        nova geração, nem voltar a valer depois dela.
+
+        Args:
+            chave (ChaveConsulta): A consulta e seus parâmetros.
+            resultado (list): Pares (linha no corpus, similaridade).
+            geracao (int): Geração dos dados usada na busca.
+        """
+        with self._lock:
+            if geracao != self.geracao:
+                return
+            self._resultados[chave] = (time.monotonic(), tuple(resultado))
+            self._resultados.move_to_end(chave)
+            while len(self._resultados) > self.max_itens:
+                self._resultados.popitem(last=False)
+                self.descartes += 1
+
+    def estatisticas(self) -> dict:
+        """
+        Contadores do cache desde o início do processo.
+
+        Returns:
+            dict: Itens, acertos, falhas, taxa de acerto, descartes (LRU),
+            expirados (TTL) e invalidações (mudança de geração).
+        """
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._resultados), 'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+                'descartes': self.descartes, 'expirados': self.expirados,
+                'invalidacoes': self.invalidacoes, 'geracao': self.geracao,
+            }
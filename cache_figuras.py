@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import threading
+
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+CAMINHO_FIGURAS = Path('data/figuras')
+
+
+def chave_figura(grafico: str, *tabelas: pd.DataFrame, **parametros) -> str:
+    """
+    Gera a chave de uma figura a partir do conteúdo das tabelas de entrada
+    e dos parâmetros do gráfico.
+
+    Args:
+        grafico (str): Nome do gráfico (ex.: 'histograma').
+        *tabelas (pd.DataFrame): Tabelas usadas para montar a figura.
+        **parametros: Demais parâmetros do gráfico (ex.: nome).
+
+    Returns:
+        str: Hash SHA-1 hexadecimal.
+    """
+    hash_figura = hashlib.sha1(grafico.encode('utf-8'))
+    for tabela in tabelas:
+        hash_figura.update(','.join(map(str, tabela.columns)).encode('utf-8'))
+        hash_figura.update(pd.util.hash_pandas_object(tabela).to_numpy().tobytes())
+    hash_figura.update(repr(sorted(parametros.items())).encode('utf-8'))
+    return hash_figura.hexdigest()
+
+
+class CacheFiguras:
+    """
+    Cache das figuras Plotly já serializadas em JSON, com descarte da
+    figura usada há mais tempo (LRU) quando o limite de itens é atingido.
+    Pode ser compartilhado entre sessões (operações protegidas por lock).
+    """
+
+    def __init__(self, max_itens: int = 64):
+        self.max_itens = max_itens
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._figuras)
+
+    def obter(self, chave: str) -> str:
+        """
+        Busca uma figura no cache.
+
+        Args:
+            chave (str): Chave gerada por `chave_figura`.
+
+        Returns:
+            str: O JSON da figura, ou None se não estiver no cache.
+        """
+        with self._lock:
+            figura_json = self._figuras.get(chave)
+            if figura_json is not None:
+                self._figuras.move_to_end(chave)
+            return figura_json
+
+    def guardar(self, chave: str, figura_json: str):
+        """
+        Guarda uma figura no cache, descartando a menos usada recentemente
+        caso o limite de itens seja ultrapassado.
+
+        Args:
+            chave (str): Chave gerada por `chave_figura`.
+            figura_json (str): A figura serializada em JSON.
+        """
+        with self._lock:
+            self._figuras[chave] = figura_json
+            self._figuras.move_to_end(chave)
+            while len(self._figuras) > self.max_itens:
+                self._figuras.popitem(last=False)
+
+    def salvar(self, caminho: Path = CAMINHO_FIGURAS):
+        """
+        Salva as figuras do cache em disco, uma por arquivo `<chave>.json`.
+
+        Args:
+            caminho (Path, optional): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            figuras = list(self._figuras.items())
+        for chave, figura_json in figuras:
+            (caminho / f'{chave}.json').write_text(figura_json, encoding='utf-8')
+
+    def carregar(self, caminho: Path = CAMINHO_FIGURAS):
+        """
+        Carrega no cache as figuras salvas em disco com `salvar`.
+
+        Args:
+            caminho (Path, optional): Diretório das figuras.
+        """
+        caminho = Path(caminho)
+        if not caminho.is_dir():
+            return
+        for arquivo in sorted(caminho.glob('*.json'))[:self.max_itens]:
+            self.guardar(arquivo.stem, arquivo.read_text(encoding='utf-8'))
+
+
+if __name__ == '__main__':
+    from agregacoes import contagem_anual, ensaios, qualidade_decada, resumo_decada
+    from dados import CONDICOES
+    from funcoes import CONSTRUTORES_FIGURAS
+
+    parser = argparse.ArgumentParser(
+        description='Gera as figuras dos gráficos das condições e as salva em disco.'
+    )
+    parser.add_argument('--saida', type=Path, default=CAMINHO_FIGURAS)
+    args = parser.parse_args()
+
+    cache = CacheFiguras(max_itens=4 * len(CONDICOES))
+    for condicao, nome in CONDICOES.items():
+        df1 = contagem_anual(condicao)
+        graficos = [('linha_tempo', (df1,)), ('histograma', (ensaios(condicao),)),
+                    ('bar_quali', (qualidade_decada(condicao),)),
+                    ('linha_quali_quant', (resumo_decada(condicao), df1))]
+        for grafico, tabelas in graficos:
+            figura = CONSTRUTORES_FIGURAS[grafico](*tabelas, nome=nome)
+            cache.guardar(chave_figura(grafico, *tabelas, nome=nome), figura.to_json())
+    cache.salvar(args.saida)
+    print(f'{len(cache)} figuras salvas em {args.saida}')
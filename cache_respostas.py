@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from pathlib import Path
+
+CAMINHO_CACHE = Path('.cache/pedro')
+
+# Segundos em que as páginas de resultados da busca são usadas sem
+# consultar o servidor: depois disso são revalidadas, para que uma nova
+# execução encontre os artigos publicados desde a anterior.
+VALIDADE_LISTAGENS = 24 * 3600
+
+
+def _gravar_atomico(caminho: Path, conteudo: bytes):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, caminho)
+
+
+class RespostaCache:
+    """Resposta guardada no cache, com os dados usados na revalidação."""
+
+    def __init__(self, url: str, conteudo: str, obtido_em: float,
+                 etag: str = None, last_modified: str = None):
+        self.url = url
+        self.conteudo = conteudo
+        self.obtido_em = obtido_em
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def cabecalhos_revalidacao(self) -> dict:
+        """
+        Monta os cabeçalhos de uma requisição condicional (HTTP 304 se a
+        página não mudou).
+
+        Returns:
+            dict: Cabeçalhos If-None-Match/If-Modified-Since disponíveis.
+        """
+        cabecalhos = {}
+        if self.etag:
+            cabecalhos['If-None-Match'] = self.etag
+        if self.last_modified:
+            cabecalhos['If-Modified-Since'] = self.last_modified
+        return cabecalhos
+
+
+class CacheRespostas:
+    """
+    Cache em disco das páginas baixadas, indexado pela URL. O conteúdo é
+    guardado pelo seu hash (endereçado por conteúdo), de modo que páginas
+    iguais ocupam um único arquivo e é possível saber se uma página mudou.
+
+    Estrutura do diretório:
+        urls/<sha256 da url>.json: metadados (url, hash do conteúdo, data,
+            ETag e Last-Modified)
+        objetos/<sha256 do conteúdo>: o conteúdo da página
+    """
+
+    def __init__(self, caminho: Path = CAMINHO_CACHE, validade: float = None,
+                 validade_listagens: float = VALIDADE_LISTAGENS):
+        """
+        Args:
+            caminho (Path, optional): Diretório do cache.
+            validade (float, optional): Segundos em que uma página de
+                detalhes é usada sem consultar o servidor. Depois disso ela
+                é revalidada. Se None, essas páginas nunca expiram.
+            validade_listagens (float, optional): O mesmo para as páginas
+                de resultados da busca. Se None, nunca expiram.
+        """
+        self.caminho = Path(caminho)
+        self.validade = validade
+        self.validade_listagens = validade_listagens
+
+    @staticmethod
+    def _hash(texto: bytes) -> str:
+        return hashlib.sha256(texto).hexdigest()
+
+    def _caminho_url(self, url: str) -> Path:
+        return self.caminho / 'urls' / f'{self._hash(url.encode("utf-8"))}.json'
+
+    def obter(self, url: str) -> RespostaCache:
+        """
+        Busca a página de uma URL no cache.
+
+        Args:
+            url (str): Endereço completo (incluindo a query string).
+
+        Returns:
+            RespostaCache: A resposta guardada, ou None se não houver.
+        """
+        try:
+            meta = json.loads(self._caminho_url(url).read_text(encoding='utf-8'))
+            conteudo = (self.caminho / 'objetos' / meta['conteudo']).read_text(encoding='utf-8')
+        except (OSError, ValueError, KeyError):
+            return None
+        return RespostaCache(url, conteudo, meta['obtido_em'], meta.get('etag'),
+                             meta.get('last_modified'))
+
+    def expirada(self, resposta: RespostaCache, listagem: bool = False) -> bool:
+        """
+        Indica se uma resposta do cache precisa ser revalidada.
+
+        Args:
+            resposta (RespostaCache): Resposta obtida com `obter`.
+            listagem (bool, optional): Se a resposta é uma página de
+                resultados da busca (`validade_listagens`).
+
+        Returns:
+            bool: True se a validade do cache foi ultrapassada.
+        """
+        validade = self.validade_listagens if listagem else self.validade
+        return validade is not None and time.time() - resposta.obtido_em > validade
+
+    def guardar(self, url: str, conteudo: str, etag: str = None,
+                last_modified: str = None) -> bool:
+        """
+        Guarda a página de uma URL.
+
+        Args:
+            url (str): Endereço completo (incluindo a query string).
+            conteudo (str): Conteúdo da página.
+            etag (str, optional): Cabeçalho ETag da resposta.
+            last_modified (str, optional): Cabeçalho Last-Modified da resposta.
+
+        Returns:
+            bool: True se o conteúdo mudou em relação ao que estava em cache.
+        """
+        dados = conteudo.encode('utf-8')
+        hash_conteudo = self._hash(dados)
+        objeto = self.caminho / 'objetos' / hash_conteudo
+        if not objeto.exists():
+            _gravar_atomico(objeto, dados)
+
+        anterior = self.obter(url)
+        meta = {'url': url, 'conteudo': hash_conteudo, 'obtido_em': time.time(),
+                'etag': etag, 'last_modified': last_modified}
+        _gravar_atomico(self._caminho_url(url), json.dumps(meta).encode('utf-8'))
+        return anterior is None or anterior.conteudo != conteudo
+
+    def renovar(self, resposta: RespostaCache):
+        """
+        Marca uma resposta como revalidada agora (servidor respondeu 304).
+
+        Args:
+            resposta (RespostaCache): Resposta obtida com `obter`.
+        """
+        self.guardar(resposta.url, resposta.conteudo, resposta.etag,
+                     resposta.last_modified)
+
+
+class Checkpoint:
+    """
+    Lista dos identificadores de registros já extraídos e gravados, mantida
+    em um arquivo texto (um id por linha, somente acréscimos), para que uma
+    extração interrompida possa ser retomada.
+    """
+
+    def __init__(self, caminho: Path):
+        self.caminho = Path(caminho)
+        self._lock = threading.Lock()
+        self.concluidos = set()
+        if self.caminho.exists():
+            self.concluidos = set(self.caminho.read_text(encoding='utf-8').split())
+
+    def __contains__(self, id_registro: str) -> bool:
+        return id_registro in self.concluidos
+
+    def registrar(self, ids: list):
+        """
+        Acrescenta registros concluídos ao checkpoint.
+
+        Args:
+            ids (list): Identificadores dos registros gravados.
+        """
+        ids = [id_registro for id_registro in ids if id_registro not in self.concluidos]
+        if not ids:
+            return
+        with self._lock:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(''.join(f'{id_registro}\n' for id_registro in ids))
+            self.concluidos.update(ids)
@@ -0,0 +1,72 @@
+import os
+
+# Modelo spaCy usado para processar os títulos da busca. Pode ser trocado por
+# um modelo menor (ex.: en_core_web_sm ou en_core_web_md), desde que esteja
+# instalado no ambiente.
+MODELO_SPACY = os.environ.get('PEDRO_MODELO_SPACY', 'en_core_web_lg')
+
+# Processamento das consultas da busca: 'tabela' usa a tabela de lemas e
+# stop words gerada do modelo (lematizador.py), sem carregar o spaCy; sem
+# tabela gerada para MODELO_SPACY, ou com 'spacy', usa o próprio modelo.
+LEMATIZADOR = os.environ.get('PEDRO_LEMATIZADOR', 'tabela')
+
+# No modo 'tabela', lematiza pelo spaCy as palavras que não estão na tabela
+# (o modelo é carregado na primeira delas) em vez de mantê-las como estão.
+LEMATIZADOR_SPACY_DESCONHECIDAS = os.environ.get('PEDRO_LEMATIZADOR_SPACY', '') not in ('', '0')
+
+# Componentes do pipeline que a busca não utiliza. O lematizador depende
+# apenas do tok2vec, do tagger e do attribute_ruler.
+COMPONENTES_DESATIVADOS = ['parser', 'ner', 'senter']
+
+# Quantidade máxima de condições (tabelas) mantidas em cache
+# na memória do servidor.
+MAX_CONDICOES_EM_CACHE = int(os.environ.get('PEDRO_MAX_CONDICOES_CACHE', 3))
+
+# Quantidade máxima de figuras Plotly (já serializadas) mantidas em cache.
+MAX_FIGURAS_EM_CACHE = int(os.environ.get('PEDRO_MAX_FIGURAS_CACHE', 64))
+
+# Memória máxima (em MB) do bloco de similaridades calculado de uma vez na
+# busca em lote. Limita o número de consultas por produto matricial.
+MEMORIA_BLOCO_BUSCA_MB = int(os.environ.get('PEDRO_MEMORIA_BLOCO_MB', 64))
+
+# Peso da similaridade dos vetores de palavras na busca híbrida (o restante
+# é o peso da similaridade TF-IDF).
+PESO_DENSO_HIBRIDO = float(os.environ.get('PEDRO_PESO_DENSO', 0.5))
+
+# Tamanho mínimo do corpus para a busca usar o índice aproximado (IVF, ver
+# indice_ann.py). Abaixo disso a busca é exata.
+ANN_MIN_DOCUMENTOS = int(os.environ.get('PEDRO_ANN_MIN_DOCUMENTOS', 50000))
+
+# Grupos do índice aproximado visitados por consulta: mais sondas aumentam o
+# recall e a latência.
+ANN_SONDAS = int(os.environ.get('PEDRO_ANN_SONDAS', 8))
+
+# Artigos similares pré-calculados para cada artigo da base (vizinhos.py).
+VIZINHOS_POR_ARTIGO = int(os.environ.get('PEDRO_VIZINHOS', 20))
+
+# Similaridade de Jaccard mínima entre os shingles dos títulos de dois
+# registros do mesmo ano para que sejam tratados como o mesmo ensaio
+# (deduplicacao.py).
+LIMIAR_DUPLICATAS = float(os.environ.get('PEDRO_LIMIAR_DUPLICATAS', 0.9))
+
+# Quantidade máxima de buscas (resultados já calculados) mantidas em cache,
+# compartilhado entre as sessões, e tempo (em segundos) até expirarem.
+MAX_CONSULTAS_EM_CACHE = int(os.environ.get('PEDRO_MAX_CONSULTAS_CACHE', 1024))
+TTL_CONSULTAS_S = float(os.environ.get('PEDRO_TTL_CONSULTAS', 3600))
+
+# Carrega a busca (processador das consultas, índices e vizinhos) em segundo
+# plano depois da primeira página exibida em cada processo do servidor (ver
+# aquecimento.py), para que a primeira busca não espere os carregamentos.
+AQUECIMENTO = os.environ.get('PEDRO_AQUECIMENTO', '1') not in ('', '0')
+
+# Painel de depuração na barra lateral, com os tempos das etapas e o pico de
+# memória de cada execução do script (ver instrumentacao.py).
+DEPURACAO = os.environ.get('PEDRO_DEPURACAO', '') not in ('', '0')
+
+# Arquivo em que as métricas de cada execução são gravadas: linhas JSON ou,
+# com a extensão .prom, texto no formato do Prometheus. Vazio desativa.
+ARQUIVO_METRICAS = os.environ.get('PEDRO_ARQUIVO_METRICAS', '')
+
+# Endereço e porta da API HTTP da busca (api_busca.py).
+API_ENDERECO = os.environ.get('PEDRO_API_ENDERECO', '127.0.0.1')
+API_PORTA = int(os.environ.get('PEDRO_API_PORTA', 8502))
@@ -0,0 +1,398 @@
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import os
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import pandas as pd
+
+from agregacoes import contagem_anual, ensaios, qualidade_decada, resumo_decada
+from armazem_artigos import ArmazemArtigos
+from artefatos_busca import CAMINHO_METADADOS, salvar_metadados
+from cache_figuras import CAMINHO_FIGURAS, chave_figura
+from configuracoes import (
+    COMPONENTES_DESATIVADOS, LIMIAR_DUPLICATAS, MODELO_SPACY, VIZINHOS_POR_ARTIGO
+)
+from deduplicacao import CAMINHO_DUPLICATAS, Duplicatas
+from indice_busca import CAMINHO_INDICE, COLUNAS_METADADOS, IndiceTfidf, MascarasBusca
+from indice_denso import CAMINHO_VETORES, IndiceDenso
+from lematizador import CAMINHO_LEMATIZADOR, Lematizador, palavras_vetores
+from termos import termos_frequentes, termos_por_decada
+from vizinhos import CAMINHO_VIZINHOS, GrafoVizinhos
+
+CAMINHO_DADOS = Path('data')
+
+# Diretório dos módulos do projeto (ver `modulos_locais`)
+CAMINHO_MODULOS = Path(__file__).resolve().parent
+
+# Chave de conteúdo de cada artefato gerado na última construção
+CAMINHO_MANIFESTO = CAMINHO_DADOS / 'construcao.json'
+
+
+class Tarefa(NamedTuple):
+    """
+    Nó do grafo de construção. A tarefa é refeita quando a chave calculada
+    a partir do código da função e dos `modulos` que geram o artefato (com
+    os módulos do projeto que eles importam), das tabelas de entrada, dos
+    parâmetros e do conteúdo das saídas das dependências muda, ou quando
+    alguma saída não existe.
+    """
+    nome: str
+    funcao: Callable
+    saidas: tuple
+    entradas: tuple = ()
+    parametros: dict = {}
+    dependencias: tuple = ()
+    modulos: tuple = ()
+
+
+def gerar_figuras(df1: pd.DataFrame, df2: pd.DataFrame, df3: pd.DataFrame,
+                  df4: pd.DataFrame, frequentes: pd.DataFrame, por_decada: pd.DataFrame,
+                  nome: str, saida: Path):
+    """Gera as figuras Plotly de uma condição no formato de `CacheFiguras`."""
+    from funcoes import CONSTRUTORES_FIGURAS
+
+    saida.mkdir(parents=True, exist_ok=True)
+    for grafico, tabelas in _tabelas_figuras(df1, df2, df3, df4, frequentes, por_decada):
+        figura = CONSTRUTORES_FIGURAS[grafico](*tabelas, nome=nome)
+        (saida / f'{chave_figura(grafico, *tabelas, nome=nome)}.json').write_text(
+            figura.to_json(), encoding='utf-8'
+        )
+
+
+def gerar_indice(titulos: pd.DataFrame, saida: Path, geracao: int):
+    """Constrói o índice TF-IDF da busca de artigos similares."""
+    IndiceTfidf.construir(list(titulos['titulo_limpo']), geracao=geracao).salvar(saida)
+
+
+def gerar_vetores(titulos: pd.DataFrame, saida: Path, modelo: str, geracao: int):
+    """Calcula os vetores densos dos títulos (ver `indice_denso`)."""
+    import spacy
+
+    modelo_spacy = spacy.load(modelo, exclude=COMPONENTES_DESATIVADOS)
+    IndiceDenso.construir(modelo_spacy, list(titulos['titulo_limpo']), modelo,
+                          geracao).salvar(saida)
+
+
+def gerar_duplicatas(registros: pd.DataFrame, saida: Path, n_documentos: int, limiar: float,
+                     geracao: int):
+    """Agrupa os registros repetidos ou quase idênticos (ver `deduplicacao`)."""
+    Duplicatas.construir(registros, n_documentos, limiar, geracao).salvar(saida)
+
+
+def gerar_metadados_busca(registros: pd.DataFrame, vigentes: pd.DataFrame, saida: Path,
+                          indice: Path, duplicatas: Path):
+    """Grava as máscaras e os metadados da busca (ver `artefatos_busca`)."""
+    salvar_metadados(IndiceTfidf.carregar(indice), registros, vigentes,
+                     Duplicatas.carregar(duplicatas), saida)
+
+
+def gerar_vizinhos(metadados: pd.DataFrame, saida: Path, indice: Path, duplicatas: Path,
+                   k: int):
+    """Calcula os artigos similares de cada artigo (ver `vizinhos`)."""
+    indice_tfidf = IndiceTfidf.carregar(indice)
+    mascaras = MascarasBusca(metadados, n_documentos=indice_tfidf.n_documentos,
+                             duplicatas=Duplicatas.carregar(duplicatas))
+    GrafoVizinhos.construir(indice_tfidf, k, mascaras).salvar(saida)
+
+
+def gerar_lematizador(titulos: pd.DataFrame, saida: Path, modelo: str):
+    """Gera a tabela de lemas e stop words da busca sem o spaCy (ver `lematizador`)."""
+    import spacy
+
+    modelo_spacy = spacy.load(modelo, exclude=COMPONENTES_DESATIVADOS)
+    Lematizador.construir(modelo_spacy, list(titulos['titulo']), palavras_vetores(modelo_spacy),
+                          modelo).salvar(saida)
+
+
+def _tabelas_figuras(df1, df2, df3, df4, frequentes, por_decada) -> list:
+    return [('linha_tempo', (df1,)), ('histograma', (df2,)),
+            ('bar_quali', (df3,)), ('linha_quali_quant', (df4, df1)),
+            ('termos_frequentes', (frequentes,)), ('termos_decada', (por_decada,))]
+
+
+def tarefas(condicoes: dict) -> list:
+    """
+    Monta o grafo de construção de todos os artefatos lidos pelo webapp.
+
+    Args:
+        condicoes (dict): Chave da condição -> nome exibido.
+
+    Returns:
+        list: As tarefas (`Tarefa`), com as dependências entre elas.
+    """
+    armazem = ArmazemArtigos()
+    geracao = armazem.geracao
+    # Os índices de busca têm um documento por posição, inclusive dos
+    # registros substituídos
+    titulos = armazem.ler(['titulo_limpo'], vigentes=False).reset_index(drop=True)
+
+    lista = [Tarefa('indice', gerar_indice, (CAMINHO_INDICE,), entradas=(titulos,),
+                    parametros={'saida': CAMINHO_INDICE, 'geracao': geracao},
+                    modulos=('indice_busca',)),
+             Tarefa('vetores', gerar_vetores, (CAMINHO_VETORES,), entradas=(titulos,),
+                    parametros={'saida': CAMINHO_VETORES, 'modelo': MODELO_SPACY,
+                                'geracao': geracao},
+                    modulos=('indice_denso',)),
+             Tarefa('duplicatas', gerar_duplicatas, (CAMINHO_DUPLICATAS,),
+                    entradas=(armazem.ler(['titulo', 'ano', 'condicao', 'escala pedro']),),
+                    parametros={'saida': CAMINHO_DUPLICATAS, 'n_documentos': armazem.n_linhas(),
+                                'limiar': LIMIAR_DUPLICATAS, 'geracao': geracao},
+                    modulos=('deduplicacao',)),
+             Tarefa('metadados', gerar_metadados_busca, (CAMINHO_METADADOS,),
+                    entradas=(armazem.ler(COLUNAS_METADADOS, vigentes=False, compacto=True),
+                              armazem.ler(COLUNAS_METADADOS, compacto=True)),
+                    parametros={'saida': CAMINHO_METADADOS, 'indice': CAMINHO_INDICE,
+                                'duplicatas': CAMINHO_DUPLICATAS},
+                    dependencias=('indice', 'duplicatas'), modulos=('artefatos_busca',)),
+             Tarefa('vizinhos', gerar_vizinhos, (CAMINHO_VIZINHOS,),
+                    entradas=(armazem.ler(COLUNAS_METADADOS),),
+                    parametros={'saida': CAMINHO_VIZINHOS, 'indice': CAMINHO_INDICE,
+                                'duplicatas': CAMINHO_DUPLICATAS, 'k': VIZINHOS_POR_ARTIGO},
+                    dependencias=('indice', 'duplicatas'), modulos=('vizinhos',)),
+             Tarefa('lematizador', gerar_lematizador, (CAMINHO_LEMATIZADOR,),
+                    entradas=(armazem.ler(['titulo']),),
+                    parametros={'saida': CAMINHO_LEMATIZADOR, 'modelo': MODELO_SPACY},
+                    modulos=('lematizador',))]
+    for condicao, nome in condicoes.items():
+        tabelas = (contagem_anual(condicao, geracao=geracao), ensaios(condicao, geracao=geracao),
+                   qualidade_decada(condicao, geracao=geracao),
+                   resumo_decada(condicao, geracao=geracao),
+                   termos_frequentes((condicao,), geracao=geracao),
+                   termos_por_decada((condicao,), geracao=geracao))
+        figuras = tuple(CAMINHO_FIGURAS / f'{chave_figura(grafico, *entradas, nome=nome)}.json'
+                        for grafico, entradas in _tabelas_figuras(*tabelas))
+        lista += [
+            Tarefa(f'figuras:{condicao}', gerar_figuras, figuras, entradas=tabelas,
+                   parametros={'nome': nome, 'saida': CAMINHO_FIGURAS},
+                   modulos=('funcoes', 'cache_figuras')),
+        ]
+    return lista
+
+
+def _hash_saida(caminho: Path) -> bytes:
+    hash_saida = hashlib.sha1()
+    arquivos = sorted(caminho.rglob('*')) if caminho.is_dir() else [caminho]
+    for arquivo in arquivos:
+        if arquivo.is_file():
+            hash_saida.update(arquivo.read_bytes())
+    return hash_saida.digest()
+
+
+def _importacoes_locais(nome: str) -> tuple:
+    # Módulos do projeto importados por um módulo, inclusive dentro de
+    # funções (importações tardias), fora do bloco `__main__`
+    arvore = ast.parse((CAMINHO_MODULOS / f'{nome}.py').read_text(encoding='utf-8'))
+    nos = [no for no in arvore.body
+           if not (isinstance(no, ast.If) and '__main__' in ast.unparse(no.test))]
+    nomes = set()
+    for no in nos:
+        for filho in ast.walk(no):
+            if isinstance(filho, ast.Import):
+                nomes.update(alias.name.split('.')[0] for alias in filho.names)
+            elif isinstance(filho, ast.ImportFrom) and filho.module and not filho.level:
+                nomes.add(filho.module.split('.')[0])
+    return tuple(sorted(nome for nome in nomes if (CAMINHO_MODULOS / f'{nome}.py').exists()))
+
+
+@lru_cache(maxsize=None)
+def modulos_locais(nomes: tuple) -> tuple:
+    """
+    Fecho dos módulos do projeto importados, direta ou indiretamente, pelos
+    módulos informados.
+
+    Args:
+        nomes (tuple): Nomes dos módulos (ex.: ('vizinhos',)).
+
+    Returns:
+        tuple: Os nomes, incluindo os informados, em ordem alfabética.
+    """
+    visitados = set()
+    pendentes = list(nomes)
+    while pendentes:
+        nome = pendentes.pop()
+        if nome not in visitados:
+            visitados.add(nome)
+            pendentes.extend(_importacoes_locais(nome))
+    return tuple(sorted(visitados))
+
+
+def chave_tarefa(tarefa: Tarefa, por_nome: dict) -> str:
+    """
+    Calcula a chave de conteúdo de uma tarefa. Como as dependências entram
+    pelo conteúdo das suas saídas, uma dependência refeita com o mesmo
+    resultado não invalida as tarefas seguintes. O código entra pela função
+    da tarefa e pelos arquivos de `modulos_locais(tarefa.modulos)`.
+
+    Args:
+        tarefa (Tarefa): A tarefa.
+        por_nome (dict): Todas as tarefas, pelo nome.
+
+    Returns:
+        str: Hash SHA-1 hexadecimal.
+    """
+    parametros = {nome: str(valor) if isinstance(valor, Path) else valor
+                  for nome, valor in tarefa.parametros.items()}
+    hash_tarefa = hashlib.sha1(inspect.getsource(tarefa.funcao).encode('utf-8'))
+    for modulo in modulos_locais(tuple(tarefa.modulos)):
+        hash_tarefa.update((CAMINHO_MODULOS / f'{modulo}.py').read_bytes())
+    hash_tarefa.update(chave_figura(tarefa.nome, *tarefa.entradas, **parametros).encode('utf-8'))
+    for dependencia in tarefa.dependencias:
+        for saida in por_nome[dependencia].saidas:
+            hash_tarefa.update(_hash_saida(Path(saida)))
+    return hash_tarefa.hexdigest()
+
+
+class ResultadoConstrucao(NamedTuple):
+    """
+    Resultado de `construir`: as tarefas executadas com sucesso, as que
+    falharam (nome -> mensagem do erro) e as puladas por dependerem, direta
+    ou indiretamente, de uma que falhou.
+    """
+    executadas: list
+    falhas: dict
+    puladas: list
+
+
+def _gravar_manifesto(caminho: Path, manifesto: dict):
+    temporario = caminho.with_name(f'{caminho.name}.tmp')
+    temporario.write_text(json.dumps(manifesto, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(temporario, caminho)
+
+
+def construir(lista: list, processos: int = None, forcar: bool = False,
+              manifesto: Path = CAMINHO_MANIFESTO) -> ResultadoConstrucao:
+    """
+    Executa as tarefas desatualizadas em um pool de processos, respeitando
+    as dependências. O manifesto é gravado após cada tarefa concluída, de
+    forma que uma construção interrompida não refaz o que já terminou.
+
+    Uma tarefa que falha não interrompe a construção: só as tarefas que
+    dependem dela são puladas, e a chave de nenhuma delas é gravada, para
+    que sejam refeitas na próxima construção.
+
+    Args:
+        lista (list): As tarefas (ver `tarefas`).
+        processos (int, optional): Tamanho do pool. Se None, um por CPU.
+        forcar (bool, optional): Refaz todas as tarefas. O padrão é False.
+        manifesto (Path, optional): Arquivo com as chaves da última construção.
+
+    Returns:
+        ResultadoConstrucao: Tarefas executadas, com falha e puladas.
+    """
+    manifesto = Path(manifesto)
+    por_nome = {tarefa.nome: tarefa for tarefa in lista}
+    chaves = json.loads(manifesto.read_text(encoding='utf-8')) if manifesto.exists() else {}
+    grafo = TopologicalSorter({tarefa.nome: tarefa.dependencias for tarefa in lista})
+    grafo.prepare()
+
+    resultado = ResultadoConstrucao([], {}, [])
+    pendentes = {}
+    with ProcessPoolExecutor(processos) as pool:
+        while grafo.is_active():
+            for nome in grafo.get_ready():
+                tarefa = por_nome[nome]
+                if any(dependencia in resultado.falhas or dependencia in resultado.puladas
+                       for dependencia in tarefa.dependencias):
+                    print(f'{nome}: pulada')
+                    resultado.puladas.append(nome)
+                    grafo.done(nome)
+                    continue
+                try:
+                    chave = chave_tarefa(tarefa, por_nome)
+                    if (not forcar and chaves.get(nome) == chave
+                            and all(Path(saida).exists() for saida in tarefa.saidas)):
+                        grafo.done(nome)
+                        continue
+                    futuro = pool.submit(tarefa.funcao, *tarefa.entradas, **tarefa.parametros)
+                except Exception as erro:
+                    # Ex.: saída de uma dependência ilegível ou pool
+                    # interrompido pela queda de um processo
+                    _registrar_falha(resultado, nome, erro)
+                    grafo.done(nome)
+                    continue
+                pendentes[futuro] = (nome, chave, time.perf_counter())
+            if not pendentes:
+                continue
+            concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome, chave, inicio = pendentes.pop(futuro)
+                try:
+                    futuro.result()
+                except Exception as erro:
+                    _registrar_falha(resultado, nome, erro)
+                else:
+                    print(f'{nome}: {time.perf_counter() - inicio:.1f}s')
+                    chaves[nome] = chave
+                    _gravar_manifesto(manifesto, chaves)
+                    resultado.executadas.append(nome)
+                grafo.done(nome)
+    return resultado
+
+
+def _registrar_falha(resultado: ResultadoConstrucao, nome: str, erro: Exception):
+    resultado.falhas[nome] = f'{type(erro).__name__}: {erro}'
+    print(f'{nome}: falhou ({resultado.falhas[nome]})')
+
+
+def remover_figuras_antigas(lista: list):
+    """Remove do diretório das figuras as que não são mais geradas."""
+    atuais = {Path(saida) for tarefa in lista if tarefa.nome.startswith('figuras:')
+              for saida in tarefa.saidas}
+    for arquivo in CAMINHO_FIGURAS.glob('*.json'):
+        if arquivo not in atuais:
+            arquivo.unlink()
+
+
+if __name__ == '__main__':
+    from dados import CONDICOES
+
+    parser = argparse.ArgumentParser(
+        description='Gera todos os artefatos lidos pelo webapp (índice de busca, '
+                    'vizinhos e figuras), refazendo apenas os desatualizados.'
+    )
+    parser.add_argument('--condicao', action='append', choices=list(CONDICOES),
+                        help='Limita a construção a uma condição (pode ser repetido)')
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--forcar', action='store_true', help='Refaz todos os artefatos')
+    parser.add_argument('--listar', action='store_true',
+                        help='Lista as tarefas desatualizadas sem executá-las')
+    args = parser.parse_args()
+
+    condicoes = {condicao: CONDICOES[condicao] for condicao in args.condicao or CONDICOES}
+    lista = tarefas(condicoes)
+    if args.listar:
+        chaves = (json.loads(CAMINHO_MANIFESTO.read_text(encoding='utf-8'))
+                  if CAMINHO_MANIFESTO.exists() else {})
+        por_nome = {tarefa.nome: tarefa for tarefa in lista}
+        desatualizadas = set()
+        for tarefa in lista:
+            # As tarefas vêm depois das suas dependências em `tarefas`
+            if (chaves.get(tarefa.nome) != chave_tarefa(tarefa, por_nome)
+                    or not all(Path(saida).exists() for saida in tarefa.saidas)
+                    or desatualizadas.intersection(tarefa.dependencias)):
+                desatualizadas.add(tarefa.nome)
+            print(f'{tarefa.nome}: {"desatualizada" if tarefa.nome in desatualizadas else "ok"}')
+    else:
+        inicio = time.perf_counter()
+        resultado = construir(lista, args.processos, args.forcar)
+        if args.condicao is None:
+            remover_figuras_antigas(lista)
+        print(f'{len(resultado.executadas)} de {len(lista)} tarefas executadas em '
+              f'{time.perf_counter() - inicio:.1f}s')
+        if resultado.falhas:
+            print(f'{len(resultado.falhas)} tarefa(s) com falha e '
+                  f'{len(resultado.puladas)} pulada(s):')
+            for nome, erro in resultado.falhas.items():
+                print(f'  {nome}: {erro}')
+            if resultado.puladas:
+                print(f'  puladas: {", ".join(resultado.puladas)}')
+            raise SystemExit(1)
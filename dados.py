@@ -0,0 +1,62 @@
+from typing import NamedTuple
+
+import pandas as pd
+import streamlit as st
+
+from agregacoes import (
+    Filtro, contagem_anual, ensaios, qualidade_decada, resumo_decada
+)
+from configuracoes import MAX_CONDICOES_EM_CACHE
+from instrumentacao import etapa
+
+CAMINHO_DADOS = 'data'
+
+# Condições analisadas: chave usada nos nomes dos arquivos -> nome exibido
+CONDICOES = {
+    'cervicalgia': 'Cervicalgia',
+    'lombalgia': 'Lombalgia',
+    'dor_ombro': 'Dor Ombro',
+    'oa_joelho': 'OA Joelho',
+    'dor_tornozelo': 'Dor Tornozelo',
+    'entorse_tornozelo': 'Entorse Tornozelo',
+}
+
+
+class DadosCondicao(NamedTuple):
+    """Tabelas exibidas na seção de uma condição."""
+    df1: pd.DataFrame
+    df2: pd.DataFrame
+    df3: pd.DataFrame
+    df4: pd.DataFrame
+
+
+@st.cache_resource(max_entries=MAX_CONDICOES_EM_CACHE)
+def carregar_condicao(condicao: str, filtro: Filtro = Filtro(),
+                      geracao: int = 0) -> DadosCondicao:
+    """
+    Carrega as tabelas de uma condição, agregadas a partir da base
+    completa (ver `agregacoes`). Os termos dos títulos são contados à parte
+    (ver `termos`). O resultado fica em cache no processo (limitado a
+    MAX_CONDICOES_EM_CACHE condições) e os mesmos objetos são devolvidos
+    nas execuções seguintes; eles não devem ser modificados.
+
+    Args:
+        condicao (str): Chave da condição (ex.: 'cervicalgia').
+        filtro (Filtro, optional): Recorte de anos e regiões das tabelas.
+        geracao (int, optional): Geração dos dados (ver
+            `armazem_artigos.geracao_atual`). Uma geração nova invalida o
+            cache.
+
+    Returns:
+        DadosCondicao: Os dados da condição.
+    """
+    if condicao not in CONDICOES:
+        raise ValueError(f'Condição desconhecida: {condicao}')
+
+    with etapa('tabelas'):
+        tabelas = [contagem_anual(condicao, filtro, geracao),
+                   ensaios(condicao, filtro, geracao),
+                   qualidade_decada(condicao, filtro, geracao),
+                   resumo_decada(condicao, filtro, geracao)]
+
+    return DadosCondicao(*tabelas)
@@ -0,0 +1,431 @@
+import argparse
+import json
+import os
+import time
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from armazem_artigos import ArmazemArtigos
+from configuracoes import LIMIAR_DUPLICATAS
+from indice_busca import assinatura_corpus, normalizar_titulo, salvar_array
+
+CAMINHO_DUPLICATAS = Path('data/duplicatas')
+
+# Assinaturas MinHash com 128 funções de hash, divididas em 16 faixas de 8
+# linhas. Dois títulos viram candidatos quando coincidem em todas as linhas
+# de alguma faixa: a probabilidade é 1 - (1 - J^8)^16 para a similaridade de
+# Jaccard J dos shingles (99,99% com J = 0,9; 95% com J = 0,8; 50% perto de
+# J = 0,69). Os candidatos são confirmados pela similaridade exata.
+N_PERMUTACOES = 128
+N_FAIXAS = 16
+TAMANHO_SHINGLE = 5
+
+# (a * x + b) mod P, com P o primo de Mersenne 2^31 - 1, cabe em uint64
+# para x < 2^32
+_PRIMO = np.uint64(2 ** 31 - 1)
+_MISTURA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def shingles(titulos: list, tamanho: int = TAMANHO_SHINGLE) -> tuple:
+    """
+    Shingles de caracteres dos títulos normalizados (ver
+    `indice_busca.normalizar_titulo`), calculados de uma vez para todos os
+    títulos: eles são unidos em um único buffer, separados por um byte 0,
+    e os shingles que contêm o separador são descartados.
+
+    Args:
+        titulos (list): Os títulos originais.
+        tamanho (int, optional): Bytes (UTF-8) por shingle.
+
+    Returns:
+        tuple: Os shingles de todos os títulos, concatenados (uint64 com
+        valores de 32 bits), e o início de cada título nesse vetor (n + 1
+        posições). Títulos mais curtos que `tamanho` formam um único
+        shingle; títulos vazios, nenhum.
+    """
+    codificados = []
+    for titulo in titulos:
+        codificado = normalizar_titulo(titulo if isinstance(titulo, str) else '').encode('utf-8')
+        codificados.append(codificado.ljust(tamanho) if codificado else codificado)
+    buffer = np.frombuffer(b'\0'.join(codificados) + b'\0', dtype=np.uint8)
+    janelas = np.lib.stride_tricks.sliding_window_view(buffer, tamanho)
+    validos = (janelas != 0).all(axis=1)
+    pesos = np.uint64(256) ** np.arange(tamanho, dtype=np.uint64)
+    valores = (janelas[validos].astype(np.uint64) * pesos).sum(axis=1, dtype=np.uint64)
+    # Mistura multiplicativa para 32 bits (os bytes de texto não são
+    # uniformes)
+    valores = (valores * _MISTURA) >> np.uint64(32)
+    quantidades = [max(len(codificado) - tamanho + 1, 0) for codificado in codificados]
+    return valores, np.concatenate([[0], np.cumsum(quantidades, dtype=np.int64)])
+
+
+def assinaturas_minhash(valores: np.ndarray, inicios: np.ndarray,
+                        n_permutacoes: int = N_PERMUTACOES, semente: int = 0) -> np.ndarray:
+    """
+    Assinaturas MinHash dos títulos: para cada função de hash
+    h(x) = (a * x + b) mod P, o menor valor entre os shingles do título. A
+    fração de posições iguais em duas assinaturas estima a similaridade de
+    Jaccard dos shingles.
+
+    Args:
+        valores (np.ndarray): Shingles de todos os títulos (ver `shingles`).
+        inicios (np.ndarray): Início de cada título em `valores`.
+        n_permutacoes (int, optional): Funções de hash.
+        semente (int, optional): Semente dos coeficientes.
+
+    Returns:
+        np.ndarray: Matriz (n_titulos x n_permutacoes) uint32. Títulos sem
+        shingles têm todas as posições iguais a P (nunca são candidatos,
+        ver `pares_candidatos`).
+    """
+    gerador = np.random.default_rng(semente)
+    a = gerador.integers(1, int(_PRIMO), n_permutacoes, dtype=np.uint64)
+    b = gerador.integers(0, int(_PRIMO), n_permutacoes, dtype=np.uint64)
+    assinaturas = np.full((len(inicios) - 1, n_permutacoes), int(_PRIMO), dtype=np.uint32)
+    com_shingles = np.flatnonzero(np.diff(inicios) > 0)
+    if not len(com_shingles):
+        return assinaturas
+    for j in range(n_permutacoes):
+        hashes = (a[j] * valores + b[j]) % _PRIMO
+        # Mínimo de cada título: um `reduceat` sobre os trechos contíguos
+        assinaturas[com_shingles, j] = np.minimum.reduceat(hashes, inicios[com_shingles])
+    return assinaturas
+
+
+def pares_candidatos(assinaturas: np.ndarray, n_faixas: int = N_FAIXAS) -> np.ndarray:
+    """
+    Pares de títulos com todas as linhas iguais em alguma faixa das
+    assinaturas (LSH). Em cada faixa os títulos são agrupados pelo conteúdo
+    da faixa, e cada título de um grupo forma um par com o primeiro do
+    grupo: o custo é linear no número de títulos, sem comparar todos os
+    pares.
+
+    Args:
+        assinaturas (np.ndarray): Saída de `assinaturas_minhash`.
+        n_faixas (int, optional): Faixas (divisor do número de colunas).
+
+    Returns:
+        np.ndarray: Pares (i, j), i < j, sem repetições (int64, m x 2).
+    """
+    n, n_permutacoes = assinaturas.shape
+    linhas = n_permutacoes // n_faixas
+    validos = np.flatnonzero(assinaturas[:, 0] != np.uint32(_PRIMO))
+    pares = []
+    for faixa in range(n_faixas):
+        bloco = np.ascontiguousarray(assinaturas[validos, faixa * linhas:(faixa + 1) * linhas])
+        chaves = bloco.view(np.dtype((np.void, bloco.dtype.itemsize * linhas))).ravel()
+        _, codigos = np.unique(chaves, return_inverse=True)
+        ordem = np.argsort(codigos.ravel(), kind='stable')
+        ordenados = codigos.ravel()[ordem]
+        inicio_grupo = np.concatenate([[True], ordenados[1:] != ordenados[:-1]])
+        primeiro = ordem[np.maximum.accumulate(np.where(inicio_grupo, np.arange(len(ordem)), 0))]
+        pares.append(np.column_stack([validos[primeiro[~inicio_grupo]],
+                                      validos[ordem[~inicio_grupo]]]))
+    pares = np.concatenate(pares) if pares else np.empty((0, 2), dtype=np.int64)
+    pares = np.sort(pares, axis=1)
+    return np.unique(pares, axis=0) if len(pares) else pares.astype(np.int64)
+
+
+def jaccard(valores: np.ndarray, inicios: np.ndarray, pares: np.ndarray) -> np.ndarray:
+    """
+    Similaridade de Jaccard exata entre os conjuntos de shingles de pares
+    de títulos.
+
+    Args:
+        valores (np.ndarray): Shingles de todos os títulos (ver `shingles`).
+        inicios (np.ndarray): Início de cada título em `valores`.
+        pares (np.ndarray): Pares (i, j) de títulos.
+
+    Returns:
+        np.ndarray: A similaridade de cada par (float64).
+    """
+    similaridades = np.zeros(len(pares))
+    for k, (i, j) in enumerate(pares):
+        a = np.unique(valores[inicios[i]:inicios[i + 1]])
+        b = np.unique(valores[inicios[j]:inicios[j + 1]])
+        comuns = len(np.intersect1d(a, b, assume_unique=True))
+        uniao = len(a) + len(b) - comuns
+        similaridades[k] = comuns / uniao if uniao else 0.0
+    return similaridades
+
+
+class Duplicatas:
+    """
+    Grupos de registros repetidos ou quase idênticos da base (o mesmo
+    ensaio listado em mais de uma condição, ou com pequenas variações no
+    título), um valor por posição da base + incrementos, como no índice de
+    busca:
+
+    - `grupo`: número do grupo (-1 nas posições de registros substituídos);
+    - `canonico`: a linha que representa o grupo;
+    - `canonico_condicao`: a linha que representa o grupo em cada
+      condição (um ensaio listado em duas condições conta nas duas).
+
+    Dois registros são do mesmo grupo quando são do mesmo ano e a
+    similaridade de Jaccard dos shingles dos títulos é pelo menos `limiar`,
+    diretamente ou por uma cadeia de pares. Só são comparados os pares
+    candidatos do LSH sobre as assinaturas MinHash (`pares_candidatos`). A
+    linha canônica é a primeira com nota PEDro ou, sem nota, a primeira do
+    grupo.
+    """
+
+    def __init__(self, grupo: np.ndarray, canonico: np.ndarray, canonico_condicao: np.ndarray,
+                 assinatura: str = '', geracao: int = 0, limiar: float = LIMIAR_DUPLICATAS):
+        self.grupo = grupo
+        self.canonico = canonico
+        self.canonico_condicao = canonico_condicao
+        self.assinatura = assinatura
+        self.geracao = geracao
+        self.limiar = limiar
+
+    ARRAYS = ('grupo', 'canonico', 'canonico_condicao')
+
+    @property
+    def n_documentos(self) -> int:
+        return len(self.grupo)
+
+    @classmethod
+    def construir(cls, registros: pd.DataFrame, n_documentos: int = None,
+                  limiar: float = LIMIAR_DUPLICATAS, geracao: int = 0) -> 'Duplicatas':
+        """
+        Agrupa os registros repetidos.
+
+        Args:
+            registros (pd.DataFrame): Registros vigentes com as colunas
+                titulo, ano, condicao e escala pedro, indexados pela
+                posição na base (`ArmazemArtigos.ler`).
+            n_documentos (int, optional): Total de posições. Se None, o
+                número de registros.
+            limiar (float, optional): Similaridade de Jaccard mínima.
+            geracao (int, optional): Geração dos dados.
+
+        Returns:
+            Duplicatas: Os grupos calculados.
+        """
+        posicoes = (np.arange(len(registros)) if n_documentos is None
+                    else registros.index.to_numpy())
+        n_documentos = len(registros) if n_documentos is None else n_documentos
+        titulos = list(registros['titulo'])
+        valores, inicios = shingles(titulos)
+        pares = pares_candidatos(assinaturas_minhash(valores, inicios))
+        # Só os candidatos do mesmo ano são comparados, pela similaridade
+        # exata (a estimada pelas assinaturas erra alguns centésimos)
+        anos = registros['ano'].to_numpy(dtype=np.int64, na_value=-1)
+        pares = pares[anos[pares[:, 0]] == anos[pares[:, 1]]]
+        pares = pares[jaccard(valores, inicios, pares) >= limiar]
+
+        # Grupos: componentes conexos do grafo dos pares confirmados
+        n = len(registros)
+        grafo = sparse.csr_matrix((np.ones(len(pares), dtype=np.int8), (pares[:, 0], pares[:, 1])),
+                                  shape=(n, n))
+        _, grupos = connected_components(grafo, directed=False)
+
+        # Canônica: a primeira com nota, ou a primeira do grupo
+        sem_nota = registros['escala pedro'].isna().to_numpy()
+        ordem = np.lexsort((np.arange(n), sem_nota))
+        canonico = np.zeros(n, dtype=bool)
+        canonico[ordem[np.unique(grupos[ordem], return_index=True)[1]]] = True
+        condicoes = pd.factorize(registros['condicao'])[0]
+        chaves = grupos.astype(np.int64) * (condicoes.max(initial=0) + 1) + condicoes
+        canonico_condicao = np.zeros(n, dtype=bool)
+        canonico_condicao[ordem[np.unique(chaves[ordem], return_index=True)[1]]] = True
+
+        def espalhar(valores, padrao):
+            vetor = np.full(n_documentos, padrao, dtype=np.asarray(valores).dtype)
+            vetor[posicoes] = valores
+            return vetor
+
+        return cls(espalhar(grupos.astype(np.int32), -1), espalhar(canonico, False),
+                   espalhar(canonico_condicao, False), assinatura_corpus(titulos), geracao,
+                   limiar)
+
+    def resumo(self) -> dict:
+        """
+        Returns:
+            dict: Registros, grupos, registros repetidos (fora da linha
+            canônica) no total e dentro das condições, e o maior grupo.
+        """
+        grupos = self.grupo[self.grupo >= 0]
+        tamanhos = np.bincount(grupos) if len(grupos) else np.zeros(0, dtype=np.int64)
+        return {'registros': int(len(grupos)), 'grupos': int(len(tamanhos)),
+                'repetidos': int(len(grupos) - self.canonico.sum()),
+                'repetidos_condicao': int(len(grupos) - self.canonico_condicao.sum()),
+                'maior_grupo': int(tamanhos.max(initial=0))}
+
+    def salvar(self, caminho: Path = CAMINHO_DUPLICATAS):
+        """
+        Grava os arrays (`.npy`) e a identificação dos dados em
+        `meta.json`, por último.
+
+        Args:
+            caminho (Path, optional): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        for nome in self.ARRAYS:
+            salvar_array(caminho / f'{nome}.npy', getattr(self, nome))
+        temporario = caminho / f'meta.json.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({'assinatura': self.assinatura, 'geracao': self.geracao,
+                       'n_documentos': self.n_documentos, 'limiar': self.limiar}, arquivo)
+        os.replace(temporario, caminho / 'meta.json')
+
+    @classmethod
+    def carregar(cls, caminho: Path = CAMINHO_DUPLICATAS, mapear: bool = True) -> 'Duplicatas':
+        """
+        Abre os grupos gravados com `salvar`.
+
+        Args:
+            caminho (Path, optional): Diretório dos grupos.
+            mapear (bool, optional): Se True, os arrays são memória mapeada
+                (somente leitura). O padrão é True.
+
+        Returns:
+            Duplicatas: Os grupos.
+        """
+        caminho = Path(caminho)
+        with open(caminho / 'meta.json', encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        modo = 'r' if mapear else None
+        arrays = [np.load(caminho / f'{nome}.npy', mmap_mode=modo) for nome in cls.ARRAYS]
+        return cls(*arrays, meta['assinatura'], meta['geracao'], meta['limiar'])
+
+
+def carregar_ou_construir(armazem: ArmazemArtigos = None, caminho: Path = CAMINHO_DUPLICATAS,
+                          limiar: float = LIMIAR_DUPLICATAS) -> Duplicatas:
+    """
+    Abre os grupos salvos em disco, recalculando-os (e salvando) caso não
+    existam ou tenham sido calculados para outros dados ou outro limiar.
+
+    Args:
+        armazem (ArmazemArtigos, optional): A base de artigos. Se None, a
+            base padrão.
+        caminho (Path, optional): Diretório dos grupos.
+        limiar (float, optional): Similaridade de Jaccard mínima.
+
+    Returns:
+        Duplicatas: Os grupos prontos para consulta.
+    """
+    armazem = armazem or ArmazemArtigos()
+    registros = armazem.ler(['titulo', 'ano', 'condicao', 'escala pedro'])
+    n_documentos = armazem.n_linhas()
+    try:
+        duplicatas = Duplicatas.carregar(caminho)
+    except (OSError, ValueError, KeyError):
+        duplicatas = None
+    if (duplicatas is not None and duplicatas.limiar == limiar
+            and duplicatas.n_documentos == n_documentos
+            and duplicatas.assinatura == assinatura_corpus(list(registros['titulo']))):
+        return duplicatas
+
+    duplicatas = Duplicatas.construir(registros, n_documentos, limiar, armazem.geracao)
+    try:
+        duplicatas.salvar(caminho)
+        return Duplicatas.carregar(caminho)
+    except OSError:
+        # Sem permissão de escrita: os grupos continuam válidos em memória.
+        return duplicatas
+
+
+def ler_sem_duplicatas(colunas: list, armazem: ArmazemArtigos = None) -> pd.DataFrame:
+    """
+    Lê os registros vigentes mantendo uma linha por grupo de repetidos em
+    cada condição (`Duplicatas.canonico_condicao`), com o número do grupo
+    na coluna `grupo`. Visões de mais de uma condição contam cada grupo uma
+    vez com `uma_por_grupo`.
+
+    Args:
+        colunas (list): Colunas a serem lidas.
+        armazem (ArmazemArtigos, optional): A base de artigos. Se None, a
+            base padrão.
+
+    Returns:
+        pd.DataFrame: Os registros, indexados pela posição na base.
+    """
+    armazem = armazem or ArmazemArtigos()
+    duplicatas = carregar_ou_construir(armazem)
+    registros = armazem.ler(colunas)
+    posicoes = registros.index.to_numpy()
+    registros = registros.loc[np.asarray(duplicatas.canonico_condicao)[posicoes]].copy()
+    registros['grupo'] = np.asarray(duplicatas.grupo)[registros.index.to_numpy()]
+    return registros
+
+
+def repetidos(grupos: np.ndarray) -> np.ndarray:
+    """
+    Args:
+        grupos (np.ndarray): O grupo de cada linha.
+
+    Returns:
+        np.ndarray: Máscara das linhas cujo grupo tem mais de uma linha.
+    """
+    if not len(grupos):
+        return np.zeros(0, dtype=bool)
+    return np.bincount(grupos)[grupos] > 1
+
+
+def uma_por_grupo(mascara: np.ndarray, grupos: np.ndarray,
+                  repetidas: np.ndarray = None) -> np.ndarray:
+    """
+    Mantém na seleção só a primeira linha selecionada de cada grupo, para
+    que um ensaio listado em várias condições conte uma vez quando elas são
+    vistas juntas.
+
+    Args:
+        mascara (np.ndarray): Linhas selecionadas.
+        grupos (np.ndarray): O grupo de cada linha.
+        repetidas (np.ndarray, optional): Saída de `repetidos` para
+            `grupos`, pré-calculada: só essas linhas são examinadas.
+
+    Returns:
+        np.ndarray: A nova máscara (a original não é modificada).
+    """
+    repetidas = repetidos(grupos) if repetidas is None else repetidas
+    linhas = np.flatnonzero(mascara & repetidas)
+    if not len(linhas):
+        return mascara
+    mascara = mascara.copy()
+    mascara[linhas] = False
+    mascara[linhas[np.unique(grupos[linhas], return_index=True)[1]]] = True
+    return mascara
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Agrupa os registros repetidos ou quase idênticos da base (MinHash e LSH '
+                    'sobre os shingles dos títulos).'
+    )
+    parser.add_argument('--limiar', type=float, default=LIMIAR_DUPLICATAS,
+                        help='Similaridade de Jaccard mínima entre os títulos')
+    parser.add_argument('--saida', type=Path, default=CAMINHO_DUPLICATAS)
+    parser.add_argument('--grupos', type=Path,
+                        help='CSV com os registros dos grupos de mais de uma linha, para '
+                             'conferência')
+    args = parser.parse_args()
+
+    armazem = ArmazemArtigos()
+    registros = armazem.ler(['titulo', 'ano', 'condicao', 'escala pedro', 'revista'])
+    inicio = time.perf_counter()
+    duplicatas = Duplicatas.construir(registros, armazem.n_linhas(), args.limiar,
+                                      armazem.geracao)
+    duracao = time.perf_counter() - inicio
+    duplicatas.salvar(args.saida)
+    resumo = duplicatas.resumo()
+    print(f"{resumo['registros']} registros em {resumo['grupos']} grupos "
+          f"({resumo['repetidos']} repetidos, {resumo['repetidos_condicao']} dentro da "
+          f"mesma condição; maior grupo: {resumo['maior_grupo']}) em {duracao:.1f}s, "
+          f'gravados em {args.saida}')
+    if args.grupos is not None:
+        posicoes = registros.index.to_numpy()
+        registros['grupo'] = duplicatas.grupo[posicoes]
+        registros['canonico'] = duplicatas.canonico[posicoes]
+        registros = registros.loc[repetidos(duplicatas.grupo[posicoes])]
+        registros.sort_values(['grupo', 'canonico'], ascending=[True, False]).to_csv(
+            args.grupos, index_label='posicao'
+        )
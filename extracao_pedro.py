@@ -0,0 +1,447 @@
+import argparse
+import csv
+import os
+import re
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from cache_respostas import CAMINHO_CACHE, VALIDADE_LISTAGENS, CacheRespostas, Checkpoint
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+URL_BASE = 'https://search.pedro.org.au'
+CAMINHO_BUSCA = '/advanced-search/results'
+
+COLUNAS = ['id', 'titulo', 'escala pedro', 'revista', 'tipo estudo', 'ano']
+
+# Linhas (base 1) da tabela de detalhes do artigo em #search-content
+LINHA_REVISTA = 3
+LINHA_TIPO = 4
+LINHA_ESCALA = 5
+
+# Elementos HTML sem tag de fechamento
+ELEMENTOS_VAZIOS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                    'link', 'meta', 'source', 'track', 'wbr'}
+
+
+class Artigo(NamedTuple):
+    """Artigo listado nos resultados da busca."""
+    id: str
+    titulo: str
+    url: str
+
+
+class _ParserResultados(HTMLParser):
+    """Coleta os links dos artigos (classe 'left') e o link da próxima página."""
+
+    def __init__(self):
+        super().__init__()
+        self.artigos = []
+        self.proxima = None
+        self._link = None
+        self._texto = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self._link = dict(attrs)
+            self._texto = []
+        elif tag == 'br' and self._link is not None:
+            self._texto.append(' ')
+
+    def handle_data(self, data):
+        if self._link is not None:
+            self._texto.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != 'a' or self._link is None:
+            return
+        texto = ' '.join(''.join(self._texto).split())
+        href = self._link.get('href')
+        if href and 'left' in (self._link.get('class') or '').split():
+            self.artigos.append((texto, href))
+        elif href and '»' in texto:
+            self.proxima = href
+        self._link = None
+
+
+class _ParserDetalhes(HTMLParser):
+    """
+    Coleta o texto de cada linha da tabela dentro de #search-content. Se a
+    linha tiver células <td>, guarda apenas o texto delas (sem o rótulo).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.linhas = []
+        self._profundidade = 0
+        self._linha = None
+        self._celulas = None
+        self._na_celula = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'br':
+            self.handle_data(' ')
+        if tag in ELEMENTOS_VAZIOS:
+            return
+        if self._profundidade:
+            self._profundidade += 1
+        elif dict(attrs).get('id') == 'search-content':
+            self._profundidade = 1
+        if not self._profundidade:
+            return
+        if tag == 'tr':
+            self._linha, self._celulas = [], []
+        elif tag == 'td' and self._linha is not None:
+            self._na_celula = True
+
+    def handle_data(self, data):
+        if self._linha is not None:
+            self._linha.append(data)
+            if self._na_celula:
+                self._celulas.append(data)
+
+    def handle_endtag(self, tag):
+        if not self._profundidade or tag in ELEMENTOS_VAZIOS:
+            return
+        self._profundidade -= 1
+        if tag == 'td':
+            self._na_celula = False
+        elif tag == 'tr' and self._linha is not None:
+            texto = ''.join(self._celulas) or ''.join(self._linha)
+            self.linhas.append(' '.join(texto.split()))
+            self._linha = self._celulas = None
+
+
+def id_artigo(url: str) -> str:
+    """
+    Extrai o identificador do registro a partir do link de detalhes.
+
+    Args:
+        url (str): Link da página de detalhes do artigo.
+
+    Returns:
+        str: O último segmento do caminho do link.
+    """
+    return urlparse(url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def ler_resultados(html: str, url_pagina: str) -> tuple:
+    """
+    Lê uma página de resultados da busca.
+
+    Args:
+        html (str): Conteúdo da página.
+        url_pagina (str): Endereço da página, usado para resolver links
+            relativos.
+
+    Returns:
+        tuple: Lista de `Artigo` e o link da próxima página (ou None).
+    """
+    parser = _ParserResultados()
+    parser.feed(html)
+    artigos = [Artigo(id_artigo(urljoin(url_pagina, href)), titulo,
+                      urljoin(url_pagina, href))
+               for titulo, href in parser.artigos]
+    proxima = urljoin(url_pagina, parser.proxima) if parser.proxima else None
+    return artigos, proxima
+
+
+def ler_detalhes(html: str) -> dict:
+    """
+    Lê a página de detalhes de um artigo (revista, tipo de estudo e nota
+    na escala PEDro).
+
+    Args:
+        html (str): Conteúdo da página.
+
+    Returns:
+        dict: Campos 'revista', 'tipo estudo', 'escala pedro' e 'ano'. Os
+        campos ausentes na página ficam como None.
+    """
+    parser = _ParserDetalhes()
+    parser.feed(html)
+
+    def linha(numero):
+        return parser.linhas[numero - 1] if len(parser.linhas) >= numero else ''
+
+    revista = linha(LINHA_REVISTA)
+    tipo = linha(LINHA_TIPO)
+    nota = re.search(r'(\d+)(?:\s*/\s*10)?', linha(LINHA_ESCALA))
+    ano = re.search(r'\d{4}', revista)
+    return {
+        'revista': revista or None,
+        'tipo estudo': tipo.upper() or None,
+        'escala pedro': int(nota.group(1)) if nota else None,
+        'ano': int(ano.group()) if ano else None,
+    }
+
+
+def remover_substituidos(caminho: Path):
+    """
+    Mantém no CSV apenas a última linha de cada id (registros extraídos de
+    novo são acrescentados ao final do arquivo). O arquivo é substituído
+    atomicamente.
+
+    Args:
+        caminho (Path): Arquivo CSV gravado por `ClientePedro.extrair`.
+    """
+    caminho = Path(caminho)
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        registros = {registro['id']: registro for registro in csv.DictReader(arquivo)}
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+    with open(temporario, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS)
+        escritor.writeheader()
+        escritor.writerows(registros.values())
+    os.replace(temporario, caminho)
+
+
+class LimitadorTaxa:
+    """
+    Limita a quantidade de requisições por segundo a cada host, de forma
+    compartilhada entre as threads.
+    """
+
+    def __init__(self, requisicoes_por_segundo: float):
+        self.intervalo = 1 / requisicoes_por_segundo if requisicoes_por_segundo > 0 else 0
+        self._proxima = {}
+        self._lock = threading.Lock()
+
+    def aguardar(self, url: str):
+        """
+        Bloqueia até que uma nova requisição ao host da url seja permitida.
+
+        Args:
+            url (str): Endereço da requisição.
+        """
+        if not self.intervalo:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            agora = time.monotonic()
+            horario = max(agora, self._proxima.get(host, agora))
+            self._proxima[host] = horario + self.intervalo
+        if horario > agora:
+            time.sleep(horario - agora)
+
+
+class ClientePedro:
+    """
+    Cliente HTTP da PEDro com um pool de conexões compartilhado, limite de
+    requisições por host e novas tentativas com espera exponencial. Com um
+    `CacheRespostas`, páginas já baixadas não são requisitadas novamente
+    (ou são apenas revalidadas, depois da validade do cache).
+    """
+
+    def __init__(self, url_base: str = URL_BASE, trabalhadores: int = 8,
+                 requisicoes_por_segundo: float = 2.0, tentativas: int = 4,
+                 espera_base: float = 0.5, tempo_limite: float = 30.0,
+                 cache: CacheRespostas = None):
+        self.url_base = url_base
+        self.cache = cache
+        self.trabalhadores = trabalhadores
+        self.tempo_limite = tempo_limite
+        self.limitador = LimitadorTaxa(requisicoes_por_segundo)
+        retry = Retry(total=tentativas, backoff_factor=espera_base,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      respect_retry_after_header=True)
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=trabalhadores,
+                                max_retries=retry)
+        self.sessao = requests.Session()
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+
+    def obter(self, url: str, params: dict = None, listagem: bool = False) -> str:
+        """
+        Faz uma requisição GET respeitando o limite de taxa. Se houver
+        cache, a página em cache é usada enquanto estiver válida e, depois
+        disso, revalidada com uma requisição condicional.
+
+        Args:
+            url (str): Endereço da página.
+            params (dict, optional): Parâmetros da query string.
+            listagem (bool, optional): Se é uma página de resultados da
+                busca (ver `CacheRespostas.validade_listagens`).
+
+        Returns:
+            str: O conteúdo da página.
+        """
+        return self._obter(url, params, listagem)[0]
+
+    def _obter(self, url: str, params: dict = None, listagem: bool = False) -> tuple:
+        # Devolve também se a página é nova ou mudou desde a versão em cache
+        url = requests.Request('GET', url, params=params).prepare().url
+        em_cache = self.cache.obter(url) if self.cache is not None else None
+        if em_cache is not None and not self.cache.expirada(em_cache, listagem):
+            return em_cache.conteudo, False
+
+        cabecalhos = em_cache.cabecalhos_revalidacao() if em_cache is not None else {}
+        self.limitador.aguardar(url)
+        resposta = self.sessao.get(url, headers=cabecalhos, timeout=self.tempo_limite)
+        if resposta.status_code == 304 and em_cache is not None:
+            self.cache.renovar(em_cache)
+            return em_cache.conteudo, False
+        resposta.raise_for_status()
+        mudou = True
+        if self.cache is not None:
+            mudou = self.cache.guardar(url, resposta.text, resposta.headers.get('ETag'),
+                                       resposta.headers.get('Last-Modified'))
+        return resposta.text, mudou
+
+    def listar_artigos(self, parametros: dict) -> list:
+        """
+        Percorre todas as páginas de resultados de uma busca.
+
+        Args:
+            parametros (dict): Campos da busca avançada (ex.:
+                {'abstract_with_title': 'acupuncture', 'perpage': 50}).
+
+        Returns:
+            list: Lista de `Artigo` encontrados.
+        """
+        artigos = []
+        url = urljoin(self.url_base, CAMINHO_BUSCA)
+        html = self.obter(url, params=parametros, listagem=True)
+        while True:
+            pagina, proxima = ler_resultados(html, url)
+            artigos.extend(pagina)
+            if proxima is None or not pagina:
+                return artigos
+            url = proxima
+            html = self.obter(url, listagem=True)
+
+    def extrair_artigo(self, artigo: Artigo, apenas_alterado: bool = False) -> dict:
+        """
+        Extrai os detalhes de um artigo.
+
+        Args:
+            artigo (Artigo): Artigo listado nos resultados.
+            apenas_alterado (bool, optional): Se True, devolve None quando a
+                página de detalhes é a mesma já guardada no cache.
+
+        Returns:
+            dict: Registro com as colunas de `COLUNAS`.
+        """
+        html, mudou = self._obter(artigo.url)
+        if apenas_alterado and not mudou:
+            return None
+        return {'id': artigo.id, 'titulo': artigo.titulo, **ler_detalhes(html)}
+
+    def extrair(self, artigos: list, saida: Path, tamanho_lote: int = 100,
+                checkpoint: Checkpoint = None) -> int:
+        """
+        Extrai os detalhes dos artigos em paralelo e grava os registros em
+        um CSV, em lotes, à medida que ficam prontos.
+
+        Args:
+            artigos (list): Lista de `Artigo`.
+            saida (Path): Arquivo CSV de destino.
+            tamanho_lote (int, optional): Registros por gravação. O padrão
+                é 100.
+            checkpoint (Checkpoint, optional): Registros já gravados em uma
+                execução anterior. Sem validade no cache, são ignorados;
+                com validade, suas páginas passam pela revalidação do
+                cache e só os registros cujas páginas mudaram são extraídos
+                de novo e substituem os anteriores no CSV. Cada lote gravado
+                é acrescentado ao checkpoint.
+
+        Returns:
+            int: Quantidade de registros gravados (novos ou atualizados).
+        """
+        saida = Path(saida)
+        novo = not saida.exists()
+        revalidar = self.cache is not None and self.cache.validade is not None
+        if checkpoint is not None and not revalidar:
+            artigos = [artigo for artigo in artigos if artigo.id not in checkpoint]
+
+        def extrair_artigo(artigo):
+            concluido = checkpoint is not None and artigo.id in checkpoint
+            return self.extrair_artigo(artigo, apenas_alterado=concluido)
+
+        total = 0
+        atualizados = False
+        with open(saida, 'a', newline='', encoding='utf-8') as arquivo, \
+                ThreadPoolExecutor(max_workers=self.trabalhadores) as executor:
+            escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS)
+            if novo:
+                escritor.writeheader()
+            lote = []
+            for registro in executor.map(extrair_artigo, artigos):
+                if registro is None:
+                    continue
+                atualizados |= checkpoint is not None and registro['id'] in checkpoint
+                lote.append(registro)
+                if len(lote) >= tamanho_lote:
+                    total += self._gravar_lote(escritor, arquivo, lote, checkpoint)
+                    lote = []
+            total += self._gravar_lote(escritor, arquivo, lote, checkpoint)
+        if atualizados:
+            remover_substituidos(saida)
+        return total
+
+    @staticmethod
+    def _gravar_lote(escritor, arquivo, lote: list, checkpoint: Checkpoint) -> int:
+        escritor.writerows(lote)
+        arquivo.flush()
+        if checkpoint is not None:
+            checkpoint.registrar([registro['id'] for registro in lote])
+        return len(lote)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Extrai artigos da PEDro (título, revista, tipo de estudo, '
+                    'escala PEDro e ano) para um arquivo CSV.'
+    )
+    parser.add_argument('--termo', default='', help='Texto buscado no título/resumo')
+    parser.add_argument('--regiao', default='', help='Região do corpo (body_part)')
+    parser.add_argument('--metodo', default='', help='Ex.: clinical trial')
+    parser.add_argument('--ano', default='', help='Publicados a partir deste ano')
+    parser.add_argument('--nota-min', default='', help='Nota mínima na escala PEDro')
+    parser.add_argument('--por-pagina', type=int, default=50)
+    parser.add_argument('--saida', type=Path, default=Path('data/extracao.csv'))
+    parser.add_argument('--url-base', default=URL_BASE,
+                        help='Permite apontar para um servidor local com páginas gravadas')
+    parser.add_argument('--trabalhadores', type=int, default=8)
+    parser.add_argument('--taxa', type=float, default=2.0,
+                        help='Requisições por segundo por host (0 = sem limite)')
+    parser.add_argument('--tentativas', type=int, default=4)
+    parser.add_argument('--lote', type=int, default=100)
+    parser.add_argument('--cache', type=Path, default=CAMINHO_CACHE,
+                        help='Diretório do cache das páginas baixadas')
+    parser.add_argument('--validade-horas', type=float, default=None,
+                        help='Revalida as páginas de detalhes em cache mais antigas que isso e '
+                             'extrai de novo os registros que mudaram (padrão: nunca expiram)')
+    parser.add_argument('--validade-listagens-horas', type=float,
+                        default=VALIDADE_LISTAGENS / 3600,
+                        help='Revalida as páginas de resultados em cache mais antigas que isso')
+    parser.add_argument('--sem-cache', action='store_true')
+    parser.add_argument('--checkpoint', type=Path, default=None,
+                        help='Arquivo com os ids já gravados (padrão: <saida>.concluidos)')
+    args = parser.parse_args()
+
+    cache = None
+    if not args.sem_cache:
+        validade = args.validade_horas * 3600 if args.validade_horas is not None else None
+        cache = CacheRespostas(args.cache, validade, args.validade_listagens_horas * 3600)
+    checkpoint = Checkpoint(args.checkpoint or args.saida.with_name(f'{args.saida.name}.concluidos'))
+
+    cliente = ClientePedro(args.url_base, args.trabalhadores, args.taxa,
+                           args.tentativas, cache=cache)
+    parametros = {'abstract_with_title': args.termo, 'body_part': args.regiao,
+                  'method': args.metodo, 'year_of_publication': args.ano,
+                  'nscore': args.nota_min, 'perpage': args.por_pagina}
+    parametros = {campo: valor for campo, valor in parametros.items() if valor != ''}
+
+    artigos = cliente.listar_artigos(parametros)
+    print(f'{len(artigos)} artigo(s) encontrado(s)')
+    total = cliente.extrair(artigos, args.saida, args.lote, checkpoint)
+    print(f'{total} registro(s) gravado(s) em {args.saida}')
@@ -0,0 +1,275 @@
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import (
+    NOTA_CORTE_QUALIDADE, QUALIDADE_ALTA, QUALIDADE_BAIXA, TIPOS_ESTUDO,
+    tabela_ensaios, tabela_outros_estudos
+)
+from armazem_artigos import REGIAO_CONDICAO
+from deduplicacao import repetidos, uma_por_grupo
+
+# Notas possíveis na escala PEDro; ensaios sem nota recebem o código NOTA_MAX + 1
+NOTA_MAX = 10
+SEM_NOTA = NOTA_MAX + 1
+
+
+class SelecaoFacetas(NamedTuple):
+    """
+    Valores escolhidos em cada faceta da exploração. Campos com valor None
+    não filtram; os intervalos de ano e nota incluem os extremos. Por ser
+    imutável, também serve de chave de cache.
+    """
+    condicoes: tuple = None
+    regioes: tuple = None
+    tipos_estudo: tuple = None
+    ano_min: int = None
+    ano_max: int = None
+    nota_min: int = None
+    nota_max: int = None
+
+
+class ResumoFacetas(NamedTuple):
+    """
+    Agregados da seleção, no formato das entradas dos gráficos de
+    `funcoes` (`df2` com as contagens por nota, e não os ensaios).
+    """
+    n_ensaios: int
+    df1: pd.DataFrame
+    df2: pd.DataFrame
+    df3: pd.DataFrame
+    df4: pd.DataFrame
+
+
+def _bits(mascara: np.ndarray) -> np.ndarray:
+    return np.packbits(mascara)
+
+
+class IndiceFacetas:
+    """
+    Índice de bitmaps sobre os ensaios clínicos: um bitmap (máscara
+    booleana compactada em bits, `np.packbits`) por valor de condição,
+    região e tipo de estudo, e bitmaps cumulativos de ano e de nota PEDro
+    (linhas com ano/nota menor ou igual a cada valor), de forma que
+    qualquer intervalo é a diferença de dois bitmaps. Uma seleção é
+    combinada com operações bit a bit sobre N/8 bytes por faceta, e os
+    agregados são contagens vetorizadas (`np.bincount`) dos códigos das
+    linhas selecionadas. Um ensaio listado em várias condições (mesmo
+    `grupo`, ver `deduplicacao`) conta uma vez na seleção.
+    """
+
+    def __init__(self, ensaios: pd.DataFrame, outros_estudos: pd.DataFrame = None):
+        """
+        Args:
+            ensaios (pd.DataFrame): Um ensaio clínico por linha, com as
+                colunas condicao, regiao, tipo estudo, ano, decada e escala
+                pedro e, opcionalmente, grupo.
+            outros_estudos (pd.DataFrame, optional): Contagens anuais das
+                revisões e diretrizes (ver `agregacoes.tabela_outros_estudos`),
+                somadas à linha do tempo. Sem nota PEDro, ficam de fora
+                quando a nota é filtrada.
+        """
+        self.n = len(ensaios)
+        self.grupo = ensaios['grupo'].to_numpy() if 'grupo' in ensaios else None
+        self.repetidas = repetidos(self.grupo) if self.grupo is not None else None
+        self.valores = {coluna: {valor: _bits((ensaios[coluna] == valor).to_numpy())
+                                 for valor in sorted(ensaios[coluna].dropna().unique())}
+                        for coluna in ('condicao', 'regiao', 'tipo estudo')}
+
+        anos = ensaios['ano'].to_numpy(dtype=np.int64)
+        if outros_estudos is None:
+            outros_estudos = pd.DataFrame({'condicao': [], 'ano': [], 'tipo estudo': [],
+                                           'quantidade': []})
+        anos_outros = outros_estudos['ano'].to_numpy(dtype=np.int64)
+        todos_anos = np.concatenate([anos, anos_outros])
+        self.ano_inicial = int(todos_anos.min()) if len(todos_anos) else 0
+        self.ano_final = int(todos_anos.max()) if len(todos_anos) else 0
+        self.codigo_ano = (anos - self.ano_inicial).astype(np.int32)
+        self.n_anos = self.ano_final - self.ano_inicial + 1
+        self.ate_ano = [_bits(self.codigo_ano <= i) for i in range(self.n_anos)]
+
+        decadas = ensaios['decada'].to_numpy(dtype=np.int64)
+        self.decadas, codigo_decada = np.unique(decadas, return_inverse=True)
+        self.codigo_decada = codigo_decada.astype(np.int32)
+
+        notas = ensaios['escala pedro'].to_numpy(dtype=float, na_value=np.nan)
+        self.codigo_nota = np.where(np.isnan(notas), SEM_NOTA,
+                                    np.clip(np.nan_to_num(notas), 0, NOTA_MAX)).astype(np.int32)
+        self.ate_nota = [_bits(self.codigo_nota <= nota) for nota in range(NOTA_MAX + 1)]
+
+        # A tabela é de ensaios clínicos: tipos desconhecidos contam como o
+        # primeiro de TIPOS_ESTUDO
+        self.codigo_tipo = np.maximum(pd.Categorical(ensaios['tipo estudo'],
+                                                     categories=TIPOS_ESTUDO).codes,
+                                      0).astype(np.int32)
+
+        # Revisões e diretrizes: poucas linhas já agregadas por condição, ano
+        # e tipo, filtradas diretamente e somadas com pesos no `bincount`
+        self.outros_condicao = outros_estudos['condicao'].to_numpy(dtype=object)
+        self.outros_regiao = outros_estudos['condicao'].map(REGIAO_CONDICAO).to_numpy(dtype=object)
+        self.outros_tipo = outros_estudos['tipo estudo'].to_numpy(dtype=object)
+        self.outros_ano = anos_outros
+        self.outros_codigo = ((anos_outros - self.ano_inicial) * len(TIPOS_ESTUDO)
+                              + np.maximum(pd.Categorical(outros_estudos['tipo estudo'],
+                                                          categories=TIPOS_ESTUDO).codes, 0))
+        self.outros_quantidade = outros_estudos['quantidade'].to_numpy(dtype=np.int64)
+
+    def _uniao(self, coluna: str, valores: tuple) -> np.ndarray:
+        bitmap = np.zeros_like(self.ate_nota[0])
+        for valor in valores:
+            if valor in self.valores[coluna]:
+                bitmap |= self.valores[coluna][valor]
+        return bitmap
+
+    def _intervalo(self, cumulativos: list, inicio: int, fim: int) -> np.ndarray:
+        # Linhas com código em [inicio, fim]: "até fim" sem "até inicio - 1"
+        fim = min(fim, len(cumulativos) - 1)
+        if fim < 0 or inicio > fim:
+            return np.zeros_like(cumulativos[0])
+        if inicio <= 0:
+            return cumulativos[fim]
+        return cumulativos[fim] & ~cumulativos[inicio - 1]
+
+    def bitmap(self, selecao: SelecaoFacetas) -> np.ndarray:
+        """
+        Combina os bitmaps das facetas escolhidas.
+
+        Args:
+            selecao (SelecaoFacetas): Os valores escolhidos.
+
+        Returns:
+            np.ndarray: As linhas selecionadas, um bit por linha (uint8,
+            ver `np.packbits`).
+        """
+        bitmap = np.full_like(self.ate_nota[0], 0xFF)
+        for coluna, valores in (('condicao', selecao.condicoes), ('regiao', selecao.regioes),
+                                ('tipo estudo', selecao.tipos_estudo)):
+            if valores is not None:
+                bitmap &= self._uniao(coluna, valores)
+        if selecao.ano_min is not None or selecao.ano_max is not None:
+            inicio = (selecao.ano_min if selecao.ano_min is not None else self.ano_inicial)
+            fim = (selecao.ano_max if selecao.ano_max is not None else self.ano_final)
+            bitmap &= self._intervalo(self.ate_ano, inicio - self.ano_inicial,
+                                      fim - self.ano_inicial)
+        if selecao.nota_min is not None or selecao.nota_max is not None:
+            bitmap &= self._intervalo(self.ate_nota, selecao.nota_min or 0,
+                                      NOTA_MAX if selecao.nota_max is None
+                                      else selecao.nota_max)
+        return bitmap
+
+    def mascara(self, selecao: SelecaoFacetas) -> np.ndarray:
+        """
+        Args:
+            selecao (SelecaoFacetas): Os valores escolhidos.
+
+        Returns:
+            np.ndarray: Máscara booleana das linhas selecionadas.
+        """
+        mascara = np.unpackbits(self.bitmap(selecao), count=self.n).view(bool)
+        if self.grupo is None:
+            return mascara
+        return uma_por_grupo(mascara, self.grupo, self.repetidas)
+
+    def _contagem_outros(self, selecao: SelecaoFacetas) -> np.ndarray:
+        # Revisões e diretrizes por ano e tipo. Elas não têm nota PEDro e
+        # ficam de fora quando a nota é filtrada; a região vem da condição.
+        minimo = self.n_anos * len(TIPOS_ESTUDO)
+        if selecao.nota_min is not None or selecao.nota_max is not None:
+            return np.zeros(minimo, dtype=np.int64)
+        mascara = np.ones(len(self.outros_ano), dtype=bool)
+        for valores, coluna in ((selecao.condicoes, self.outros_condicao),
+                                (selecao.regioes, self.outros_regiao),
+                                (selecao.tipos_estudo, self.outros_tipo)):
+            if valores is not None:
+                mascara &= np.isin(coluna, list(valores))
+        if selecao.ano_min is not None:
+            mascara &= self.outros_ano >= selecao.ano_min
+        if selecao.ano_max is not None:
+            mascara &= self.outros_ano <= selecao.ano_max
+        return np.bincount(self.outros_codigo[mascara], weights=self.outros_quantidade[mascara],
+                           minlength=minimo).astype(np.int64)
+
+    def resumir(self, selecao: SelecaoFacetas) -> ResumoFacetas:
+        """
+        Calcula os agregados dos gráficos a partir da máscara combinada: a
+        quantidade de estudos por ano e tipo, a distribuição das notas, os
+        ensaios por década e qualidade e a mediana da nota por década.
+
+        Args:
+            selecao (SelecaoFacetas): Os valores escolhidos.
+
+        Returns:
+            ResumoFacetas: Os agregados da seleção.
+        """
+        mascara = self.mascara(selecao)
+        n_tipos = len(TIPOS_ESTUDO)
+        por_ano = np.bincount(self.codigo_ano[mascara] * n_tipos
+                              + self.codigo_tipo[mascara],
+                              minlength=self.n_anos * n_tipos)
+        por_ano = (por_ano + self._contagem_outros(selecao)).reshape(self.n_anos, n_tipos)
+        anos, tipos = np.nonzero(por_ano)
+        df1 = pd.DataFrame({'ano': anos + self.ano_inicial,
+                            'tipo estudo': np.array(TIPOS_ESTUDO)[tipos],
+                            'quantidade': por_ano[anos, tipos]})
+
+        # Ensaios por década e nota (a última coluna são os ensaios sem nota)
+        n_decadas = len(self.decadas)
+        por_decada = np.bincount(self.codigo_decada[mascara] * (SEM_NOTA + 1)
+                                 + self.codigo_nota[mascara],
+                                 minlength=n_decadas * (SEM_NOTA + 1)).reshape(n_decadas,
+                                                                               SEM_NOTA + 1)
+        por_nota = por_decada.sum(axis=0)
+        df2 = pd.DataFrame({'escala pedro': np.arange(NOTA_MAX + 1),
+                            'quantidade': por_nota[:SEM_NOTA]})
+
+        # Como em `agregacoes.ensaios`, ensaios sem nota contam como baixa
+        # qualidade
+        altas = por_decada[:, NOTA_CORTE_QUALIDADE + 1:SEM_NOTA].sum(axis=1)
+        totais = por_decada.sum(axis=1)
+        linhas = np.flatnonzero(totais)
+        df3 = pd.DataFrame({
+            'decada': np.repeat(self.decadas[linhas], 2),
+            'qualidade': [QUALIDADE_BAIXA, QUALIDADE_ALTA] * len(linhas),
+            'quantidade': np.column_stack([totais[linhas] - altas[linhas],
+                                           altas[linhas]]).ravel(),
+        })
+        df3 = df3.loc[df3['quantidade'] > 0].reset_index(drop=True)
+
+        df4 = pd.DataFrame({'decada': self.decadas[linhas],
+                            'escala pedro': _medianas(por_decada[linhas, :SEM_NOTA]),
+                            'quantidade': totais[linhas]})
+        return ResumoFacetas(int(mascara.sum()), df1, df2, df3, df4)
+
+
+def _medianas(contagens: np.ndarray) -> np.ndarray:
+    """
+    Mediana de cada linha de uma tabela de contagens por nota (colunas 0 a
+    NOTA_MAX), com a mesma convenção do pandas: média dos dois valores
+    centrais em quantidades pares e NaN sem valores.
+    """
+    acumuladas = contagens.cumsum(axis=1)
+    totais = acumuladas[:, -1]
+    medianas = np.full(len(contagens), np.nan)
+    for i, total in enumerate(totais):
+        if total:
+            baixo = np.searchsorted(acumuladas[i], (total - 1) // 2, side='right')
+            alto = np.searchsorted(acumuladas[i], total // 2, side='right')
+            medianas[i] = (baixo + alto) / 2
+    return medianas
+
+
+@lru_cache(maxsize=1)
+def indice_facetas(geracao: int = 0) -> IndiceFacetas:
+    """
+    Constrói o índice de facetas dos ensaios clínicos de todas as condições.
+
+    Args:
+        geracao (int, optional): Geração dos dados (ver
+            `agregacoes.tabela_ensaios`).
+
+    Returns:
+        IndiceFacetas: O índice.
+    """
+    return IndiceFacetas(tabela_ensaios(geracao), tabela_outros_estudos())
@@ -1,14 +1,25 @@
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import streamlit as st
-import spacy
 
+from artefatos_busca import TabelaMetadados
+from cache_consultas import CacheConsultas
+from cache_figuras import CAMINHO_FIGURAS, CacheFiguras, chave_figura
+from configuracoes import (
+    COMPONENTES_DESATIVADOS, MAX_CONSULTAS_EM_CACHE, MAX_FIGURAS_EM_CACHE,
+    MODELO_SPACY, TTL_CONSULTAS_S
+)
+from indice_busca import (
+    FiltrosBusca, IndiceTfidf, MascarasBusca, buscar_similares_lote
+)
+from instrumentacao import etapa
+from lematizador import Lematizador, carregar_processador as carregar_processador_consultas
 from plotly.subplots import make_subplots
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 
-def graf_linha_tempo(df1=None, nome=None):
+def figura_linha_tempo(df1=None, nome=None):
     fig = px.line(
         data_frame=df1, x="ano", y="quantidade", color="tipo estudo", 
         title=f'{nome} ({df1["ano"].min()} - 2022): {df1["quantidade"].sum()} estudos'
@@ -17,9 +28,9 @@ def graf_linha_tempo(df1=None, nome=None):
                       yaxis_title="Quantidade", legend_title='Tipo de estudo', 
                       legend=dict(y=0.87, x=0.0775),  width=810, 
                       height=500, font=dict(size=13))
-    return st.plotly_chart(fig, theme='streamlit', use_container_width=True)
+    return fig
 
-def histograma(df2=None, nome=None):
+def figura_histograma(df2=None, nome=None):
     fig2 = px.histogram(
         data_frame=df2, x="escala pedro", histnorm='percent', 
         title=f'{nome} ({df2["ano"].min()} - 2022): Qualidade de {df2.shape[0]} ensaios clínicos'
@@ -28,9 +39,24 @@ def histograma(df2=None, nome=None):
                        xaxis_title="Pontuação na Escala PEDro",
                        yaxis_title="Porcentagem (%)", width=810, height=500, 
                        font=dict(size=13))
-    return st.plotly_chart(fig2, theme='streamlit', use_container_width=True)
+    return fig2
 
-def bar_quali(df3=None, nome=None):
+def figura_histograma_contagem(df2=None, nome=None):
+    # Mesmo gráfico de `figura_histograma`, a partir das contagens por nota
+    # (ver `facetas.IndiceFacetas.resumir`)
+    total = df2["quantidade"].sum()
+    percentual = df2["quantidade"] / total * 100 if total else df2["quantidade"] * 0.0
+    fig2 = px.bar(
+        x=df2["escala pedro"], y=percentual, 
+        title=f'{nome}: Qualidade de {total} ensaios clínicos'
+    )
+    fig2.update_layout(title_font=dict(size=18), 
+                       xaxis_title="Pontuação na Escala PEDro",
+                       yaxis_title="Porcentagem (%)", width=810, height=500, 
+                       font=dict(size=13))
+    return fig2
+
+def figura_bar_quali(df3=None, nome=None):
     fig3 = px.bar(df3, x='decada', y='quantidade', color='qualidade', 
                   color_discrete_sequence=["red", "blue"], 
                   title=f"{nome}: Qualidade dos ensaios clínicos")
@@ -38,9 +64,9 @@ def bar_quali(df3=None, nome=None):
                        legend=dict(y=0.78, x=0.085), xaxis_title="Década", 
                        yaxis_title="Quantidade", width=810, height=500, 
                        font=dict(size=13))
-    return st.plotly_chart(fig3, theme='streamlit', use_container_width=True)
+    return fig3
 
-def linha_quali_quant(df4=None, df1=None, nome=None):
+def figura_linha_quali_quant(df4=None, df1=None, nome=None):
     fig4 = make_subplots(rows=2, cols=1,
                          subplot_titles=("Quantidade por década","Nota Escala PEDro (Mediana)"))
     fig4.append_trace(go.Scatter(x=df4['decada'], y=df4['quantidade'],
@@ -49,17 +75,195 @@ def linha_quali_quant(df4=None, df1=None, nome=None):
                                  ), row=2, col=1)
     fig4.update_layout(height=500, width=810, showlegend=False, 
                        title_text=f"{nome} ({df1['ano'].min()} - 2022)")
-    return st.plotly_chart(fig4, theme='streamlit', use_container_width=True)
+    return fig4
+
+def figura_termos_frequentes(df_termos=None, nome=None):
+    # Substitui a nuvem de palavras: barras horizontais dos termos mais
+    # frequentes (ver `termos.termos_frequentes`)
+    fig5 = px.bar(df_termos, x='quantidade', y='termo', orientation='h',
+                  title=f'{nome}: Termos mais frequentes nos títulos')
+    fig5.update_layout(title_font=dict(size=18), xaxis_title="Quantidade",
+                       yaxis_title="", yaxis=dict(categoryorder='total ascending'),
+                       width=810, height=550, font=dict(size=13))
+    return fig5
+
+def figura_termos_decada(df_decadas=None, nome=None):
+    # Substitui o vídeo: um quadro por década com os termos mais frequentes
+    # da década (ver `termos.termos_por_decada`), animado no navegador
+    maximo = df_decadas['quantidade'].max() if len(df_decadas) else 1
+    fig6 = px.bar(df_decadas, x='quantidade', y='posicao', text='termo', orientation='h',
+                  animation_frame='decada', range_x=[0, maximo * 1.15],
+                  title=f'{nome}: Termos mais frequentes por década')
+    fig6.update_traces(textposition='outside')
+    fig6.update_layout(title_font=dict(size=18), xaxis_title="Quantidade",
+                       yaxis=dict(title="", autorange='reversed', showticklabels=False),
+                       width=810, height=550, font=dict(size=13))
+    return fig6
+
+CONSTRUTORES_FIGURAS = {
+    'linha_tempo': figura_linha_tempo,
+    'histograma': figura_histograma,
+    'histograma_contagem': figura_histograma_contagem,
+    'bar_quali': figura_bar_quali,
+    'linha_quali_quant': figura_linha_quali_quant,
+    'termos_frequentes': figura_termos_frequentes,
+    'termos_decada': figura_termos_decada,
+}
+
+@st.cache_resource
+def obter_cache_figuras():
+    """
+    Cria o cache de figuras do processo, compartilhado entre as sessões, 
+    já com as figuras geradas previamente em disco (ver `cache_figuras`).
+
+    Returns:
+        CacheFiguras: O cache de figuras.
+    """
+    cache = CacheFiguras(max_itens=MAX_FIGURAS_EM_CACHE)
+    cache.carregar(CAMINHO_FIGURAS)
+    return cache
+
+@st.cache_resource
+def obter_cache_consultas():
+    """
+    Cria o cache dos resultados das buscas do processo, compartilhado entre
+    as sessões (ver `cache_consultas`).
+
+    Returns:
+        CacheConsultas: O cache das buscas.
+    """
+    return CacheConsultas(max_itens=MAX_CONSULTAS_EM_CACHE, ttl_segundos=TTL_CONSULTAS_S)
+
+def exibir_figura(grafico: str, *tabelas, nome: str = None):
+    """
+    Exibe um dos gráficos de `CONSTRUTORES_FIGURAS`. A figura só é montada 
+    se ainda não estiver no cache para o mesmo conteúdo das tabelas e o 
+    mesmo nome.
+
+    Args:
+        grafico (str): Nome do gráfico em `CONSTRUTORES_FIGURAS`.
+        *tabelas (pd.DataFrame): Tabelas de entrada do gráfico.
+        nome (str, optional): Nome da condição exibido no título.
+    """
+    with etapa(f'figura.{grafico}'):
+        cache = obter_cache_figuras()
+        chave = chave_figura(grafico, *tabelas, nome=nome)
+        figura_json = cache.obter(chave)
+        if figura_json is None:
+            with etapa('construcao'):
+                figura_json = CONSTRUTORES_FIGURAS[grafico](*tabelas, nome=nome).to_json()
+            cache.guardar(chave, figura_json)
+        with etapa('st.plotly_chart'):
+            return st.plotly_chart(pio.from_json(figura_json), theme='streamlit', 
+                                   use_container_width=True)
+
+def graf_linha_tempo(df1=None, nome=None):
+    return exibir_figura('linha_tempo', df1, nome=nome)
+
+def histograma(df2=None, nome=None):
+    return exibir_figura('histograma', df2, nome=nome)
+
+def bar_quali(df3=None, nome=None):
+    return exibir_figura('bar_quali', df3, nome=nome)
+
+def linha_quali_quant(df4=None, df1=None, nome=None):
+    return exibir_figura('linha_quali_quant', df4, df1, nome=nome)
+
+@st.cache_resource
+def carregar_modelo_spacy(nome: str = MODELO_SPACY):
+    """
+    Carrega o modelo spaCy uma única vez por processo do servidor, 
+    compartilhado entre todas as sessões. Somente os componentes usados 
+    na limpeza dos títulos são carregados (tokenizador, stop words e 
+    lematizador); parser e NER ficam de fora.
+
+    Args:
+        nome (str, optional): Nome do modelo spaCy instalado. O padrão é 
+            definido pela variável de ambiente PEDRO_MODELO_SPACY.
+
+    Returns:
+        spacy.language.Language: O pipeline spaCy reduzido.
+    """
+    import spacy
 
-def similaridade_cosseno(modelo_spacy: spacy.load, titulo: str, 
+    with etapa('spacy.load'):
+        return spacy.load(nome, exclude=COMPONENTES_DESATIVADOS)
+
+@st.cache_resource
+def carregar_processador():
+    """
+    Carrega o processador das consultas da busca, compartilhado entre as 
+    sessões: a tabela de lemas e stop words (`lematizador.Lematizador`), 
+    que dispensa o spaCy, ou o modelo spaCy se não houver tabela gerada 
+    para MODELO_SPACY ou com PEDRO_LEMATIZADOR=spacy.
+
+    Returns:
+        Lematizador | spacy.language.Language: O processador, aceito por 
+        `limpar_titulo` e `limpar_titulos`.
+    """
+    with etapa('lematizador'):
+        return carregar_processador_consultas(carregar_modelo_spacy)
+
+def limpar_titulo(modelo_spacy, titulo: str, lemma: bool = True) -> str:
+    """
+    Processa um título da mesma forma que a coluna `titulo_limpo` da base:
+    texto em minúsculas, sem stop words e pontuação, opcionalmente 
+    lematizado.
+
+    Args:
+        modelo_spacy (spacy.language.Language | Lematizador): O modelo de 
+            processamento spaCy ou a tabela que o substitui.
+        titulo (str): O título a ser processado.
+        lemma (bool, optional): Se True, utiliza os lemas das palavras; se 
+            False, utiliza o texto original das palavras. O padrão é True.
+
+    Returns:
+        str: O título processado.
+    """
+    if isinstance(modelo_spacy, Lematizador):
+        return modelo_spacy.limpar(titulo, lemma)
+    return _juntar_tokens(modelo_spacy(titulo.lower()), lemma)
+
+def _juntar_tokens(doc, lemma: bool) -> str:
+    if lemma:
+        tokens = [token.lemma_ for token in doc 
+                  if not token.is_stop and not token.is_punct]
+    else:
+        tokens = [token.text for token in doc 
+                  if not token.is_stop and not token.is_punct]
+    
+    return " ".join(tokens)
+
+def limpar_titulos(modelo_spacy, titulos: list, lemma: bool = True) -> list:
+    """
+    Processa vários títulos como em `limpar_titulo`, passando-os pelo 
+    modelo spaCy em lotes (`nlp.pipe`).
+
+    Args:
+        modelo_spacy (spacy.language.Language | Lematizador): O modelo de 
+            processamento spaCy ou a tabela que o substitui.
+        titulos (list): Os títulos a serem processados.
+        lemma (bool, optional): Se True, utiliza os lemas das palavras. O 
+            padrão é True.
+
+    Returns:
+        list: Os títulos processados, na mesma ordem.
+    """
+    if isinstance(modelo_spacy, Lematizador):
+        return modelo_spacy.limpar_lote(titulos, lemma)
+    docs = modelo_spacy.pipe((titulo.lower() for titulo in titulos), batch_size=256)
+    return [_juntar_tokens(doc, lemma) for doc in docs]
+
+def similaridade_cosseno(modelo_spacy, titulo: str, 
                          titulos: list, min_ngram: int, max_ngram: int,
-                         lemma: bool = True):
+                         lemma: bool = True, indice: IndiceTfidf = None):
     """
     Calcula a similaridade de cosseno entre um título de referência 
     e uma lista de títulos.
 
     Args:
-        modelo_spacy (spacy.load): O modelo de processamento spaCy a ser 
+        modelo_spacy (spacy.language.Language | Lematizador): O modelo de 
+            processamento spaCy, ou a tabela que o substitui, a ser 
             aplicado aos títulos.
         titulo (str): O título de referência.
         titulos (list): Uma lista de títulos a serem comparados com o título 
@@ -71,27 +275,61 @@ def similaridade_cosseno(modelo_spacy: spacy.load, titulo: str,
         lemma (bool, optional): Se True, utiliza os lemas das palavras nos 
             títulos; se False, utiliza o texto original das palavras. O 
             padrão é True.
+        indice (IndiceTfidf, optional): Índice TF-IDF já ajustado sobre 
+            `titulos`. Se não for informado, o índice é ajustado nesta 
+            chamada.
         
     Returns:
         float: Uma lista de similaridades de cosseno entre o título 
         de referência e os títulos da lista.
     """
-    titulo_lower = titulo.lower()
-    doc = modelo_spacy(titulo_lower)
-    
-    if lemma:
-        tokens = [token.lemma_ for token in doc 
-                  if not token.is_stop and not token.is_punct]
-    else:
-        tokens = [token.text for token in doc 
-                  if not token.is_stop and not token.is_punct]
-    
-    titulo_limpo = " ".join(tokens)
+    titulo_limpo = limpar_titulo(modelo_spacy, titulo, lemma)
+
+    if indice is None:
+        indice = IndiceTfidf.construir(titulos, min_ngram, max_ngram)
 
-    tfidf_vec = TfidfVectorizer(ngram_range=(min_ngram, max_ngram))
-    titulos_tfidf = tfidf_vec.fit_transform([titulo_limpo] + titulos)
+    return indice.similaridade(titulo_limpo)
 
-    similaridade = cosine_similarity(titulos_tfidf)
+def similaridade_cosseno_lote(modelo_spacy, titulos: list,
+                              indice: IndiceTfidf, metadados: TabelaMetadados, k: int = 5,
+                              mascaras: MascarasBusca = None,
+                              filtros: FiltrosBusca = FiltrosBusca(),
+                              lemma: bool = True) -> pd.DataFrame:
+    """
+    Busca os k artigos mais similares a cada título de uma lista (ex.: as 
+    referências de uma revisão sistemática), em uma única passada sobre o 
+    corpus (ver `buscar_similares_lote`).
 
-    return similaridade[0, 1:]
+    Args:
+        modelo_spacy (spacy.language.Language | Lematizador): O modelo de 
+            processamento spaCy ou a tabela que o substitui.
+        titulos (list): Os títulos de referência.
+        indice (IndiceTfidf): Índice TF-IDF do corpus.
+        metadados (TabelaMetadados): Metadados do corpus (ver 
+            `artefatos_busca`).
+        k (int, optional): Quantidade de artigos por título. O padrão é 5.
+        mascaras (MascarasBusca, optional): Máscaras usadas nos filtros e na 
+            remoção de títulos repetidos.
+        filtros (FiltrosBusca, optional): Os filtros da busca.
+        lemma (bool, optional): Se True, utiliza os lemas das palavras. O 
+            padrão é True.
 
+    Returns:
+        pd.DataFrame: Uma linha por par (título de referência, artigo 
+        similar), com as colunas consulta, titulo_consulta, posicao, titulo, 
+        regiao, escala pedro e similaridade.
+    """
+    titulos = [str(titulo) for titulo in titulos]
+    with etapa('limpar_titulos'):
+        titulos_limpos = limpar_titulos(modelo_spacy, titulos, lemma)
+    with etapa('buscar_similares_lote'):
+        resultados = buscar_similares_lote(indice, titulos_limpos, k, mascaras, filtros)
+    linhas = [(consulta, titulos[consulta], posicao, linha, similaridade)
+              for consulta, resultado in enumerate(resultados)
+              for posicao, (linha, similaridade) in enumerate(resultado, start=1)]
+    tabela = pd.DataFrame(linhas, columns=['consulta', 'titulo_consulta', 'posicao',
+                                           'linha', 'similaridade'])
+    artigos = metadados.linhas(tabela['linha'], ['titulo', 'regiao', 'escala pedro'])
+    tabela = pd.concat([tabela.drop(columns='linha'), artigos.reset_index(drop=True)], axis=1)
+    return tabela[['consulta', 'titulo_consulta', 'posicao', 'titulo', 'regiao',
+                   'escala pedro', 'similaridade']]
@@ -0,0 +1,322 @@
+import argparse
+import json
+import os
+import time
+
+from pathlib import Path
+
+import numpy as np
+
+from scipy import sparse
+
+from configuracoes import ANN_SONDAS
+from indice_busca import salvar_array
+
+CAMINHO_ANN = Path('data/ann')
+
+# Linhas do corpus comparadas aos centróides de uma vez no agrupamento
+TAMANHO_BLOCO = 4096
+
+
+def _similaridades(vetores, consulta, linhas: np.ndarray = None) -> np.ndarray:
+    """Produto escalar entre a consulta e os vetores (esparsos ou densos)."""
+    selecao = vetores if linhas is None else vetores[linhas]
+    if sparse.issparse(consulta):
+        if not sparse.issparse(selecao):
+            # Vetores densos (centróides): só as colunas dos termos da consulta
+            return np.asarray(selecao[:, consulta.indices] @ consulta.data).ravel()
+        consulta = consulta.toarray().ravel()
+    return np.asarray(selecao @ consulta).ravel()
+
+
+def _atribuir(vetores, centroides: np.ndarray) -> np.ndarray:
+    rotulos = np.empty(vetores.shape[0], dtype=np.int32)
+    for inicio in range(0, vetores.shape[0], TAMANHO_BLOCO):
+        similaridades = np.asarray(vetores[inicio:inicio + TAMANHO_BLOCO] @ centroides.T)
+        rotulos[inicio:inicio + TAMANHO_BLOCO] = similaridades.argmax(axis=1)
+    return rotulos
+
+
+class IndiceIVF:
+    """
+    Índice aproximado de arquivo invertido (IVF). Os documentos são
+    agrupados pelo k-means esférico (similaridade de cosseno) e cada
+    consulta só é comparada aos documentos dos `n_sondas` grupos com
+    centróides mais próximos. Funciona sobre a matriz TF-IDF (esparsa) ou
+    sobre os vetores densos dos títulos, ambos normalizados.
+
+    Mais sondas aumentam o recall e a latência; com todas as sondas a busca
+    é exata.
+    """
+
+    def __init__(self, centroides: np.ndarray, ordem: np.ndarray, inicios: np.ndarray,
+                 n_sondas: int = ANN_SONDAS, geracao: int = 0):
+        """
+        Args:
+            centroides (np.ndarray): Centróides normalizados (n_listas x
+                dimensão).
+            ordem (np.ndarray): Documentos ordenados por grupo.
+            inicios (np.ndarray): Posição em `ordem` do início de cada grupo
+                (n_listas + 1 valores).
+            n_sondas (int, optional): Grupos visitados por consulta.
+            geracao (int, optional): Geração dos dados indexados.
+        """
+        self.centroides = centroides
+        self.ordem = ordem
+        self.inicios = inicios
+        self.n_sondas = n_sondas
+        self.geracao = geracao
+
+    @property
+    def n_listas(self) -> int:
+        return self.centroides.shape[0]
+
+    @property
+    def n_documentos(self) -> int:
+        return len(self.ordem)
+
+    @classmethod
+    def construir(cls, vetores, n_listas: int = None, iteracoes: int = 10,
+                  n_sondas: int = ANN_SONDAS, semente: int = 0,
+                  geracao: int = 0) -> 'IndiceIVF':
+        """
+        Agrupa os documentos com o k-means esférico.
+
+        Args:
+            vetores (sparse.csr_matrix | np.ndarray): Vetores normalizados
+                dos documentos (matriz TF-IDF ou vetores densos).
+            n_listas (int, optional): Quantidade de grupos. Se None, a raiz
+                quadrada do número de documentos.
+            iteracoes (int, optional): Iterações do k-means. O padrão é 10.
+            n_sondas (int, optional): Grupos visitados por consulta.
+            semente (int, optional): Semente dos centróides iniciais.
+            geracao (int, optional): Geração dos dados indexados.
+
+        Returns:
+            IndiceIVF: O índice construído.
+        """
+        n = vetores.shape[0]
+        n_listas = min(n, n_listas or max(1, int(np.sqrt(n))))
+        gerador = np.random.default_rng(semente)
+
+        def densa(linhas):
+            selecao = vetores[linhas]
+            return (selecao.toarray() if sparse.issparse(selecao)
+                    else np.asarray(selecao)).astype(np.float32)
+
+        centroides = densa(np.sort(gerador.choice(n, n_listas, replace=False)))
+        for _ in range(iteracoes):
+            rotulos = _atribuir(vetores, centroides)
+            indicadora = sparse.csr_matrix(
+                (np.ones(n, dtype=np.float32), (rotulos, np.arange(n))), shape=(n_listas, n)
+            )
+            somas = indicadora @ vetores
+            somas = somas.toarray() if sparse.issparse(somas) else np.asarray(somas)
+            normas = np.linalg.norm(somas, axis=1)
+            vazios = np.flatnonzero(normas == 0)
+            if len(vazios):
+                # Grupos vazios recebem documentos sorteados como centróides
+                somas[vazios] = densa(gerador.choice(n, len(vazios), replace=False))
+                normas[vazios] = np.linalg.norm(somas[vazios], axis=1)
+            centroides = (somas / np.where(normas > 0, normas, 1)[:, None]).astype(np.float32)
+
+        rotulos = _atribuir(vetores, centroides)
+        ordem = np.argsort(rotulos, kind='stable').astype(np.int32)
+        inicios = np.searchsorted(rotulos[ordem], np.arange(n_listas + 1)).astype(np.int64)
+        return cls(centroides, ordem, inicios, n_sondas, geracao)
+
+    def candidatos(self, consulta, n_sondas: int = None) -> np.ndarray:
+        """
+        Seleciona os documentos dos grupos mais próximos da consulta.
+
+        Args:
+            consulta (sparse.csr_matrix | np.ndarray): Vetor normalizado da
+                consulta, do mesmo tipo dos vetores indexados.
+            n_sondas (int, optional): Grupos visitados. Se None, usa o
+                valor do índice.
+
+        Returns:
+            np.ndarray: Linhas candidatas, em ordem crescente.
+        """
+        n_sondas = min(self.n_listas, n_sondas or self.n_sondas)
+        similaridades = _similaridades(self.centroides, consulta)
+        grupos = np.argpartition(-similaridades, n_sondas - 1)[:n_sondas]
+        linhas = np.concatenate([self.ordem[self.inicios[grupo]:self.inicios[grupo + 1]]
+                                 for grupo in grupos])
+        return np.sort(linhas)
+
+    def salvar(self, caminho: Path):
+        """
+        Salva o índice em um diretório (centróides, ordem e inícios dos
+        grupos em `.npy` e os metadados em `meta.json`, por último), por
+        substituição atômica dos arquivos.
+
+        Args:
+            caminho (Path): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        salvar_array(caminho / 'centroides.npy', self.centroides)
+        salvar_array(caminho / 'ordem.npy', self.ordem)
+        salvar_array(caminho / 'inicios.npy', self.inicios)
+        meta = {'n_listas': self.n_listas, 'n_documentos': self.n_documentos,
+                'n_sondas': self.n_sondas, 'geracao': self.geracao}
+        temporario = caminho / f'meta.json.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(meta, arquivo)
+        os.replace(temporario, caminho / 'meta.json')
+
+    @classmethod
+    def carregar(cls, caminho: Path, n_sondas: int = None) -> 'IndiceIVF':
+        """
+        Carrega um índice salvo com `salvar` (a lista de documentos como
+        memória mapeada).
+
+        Args:
+            caminho (Path): Diretório do índice.
+            n_sondas (int, optional): Grupos visitados por consulta. Se
+                None, usa o valor salvo.
+
+        Returns:
+            IndiceIVF: O índice carregado.
+        """
+        caminho = Path(caminho)
+        with open(caminho / 'meta.json', encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        return cls(np.load(caminho / 'centroides.npy'),
+                   np.load(caminho / 'ordem.npy', mmap_mode='r'),
+                   np.load(caminho / 'inicios.npy'),
+                   n_sondas or meta['n_sondas'], meta['geracao'])
+
+
+def carregar_ou_construir(vetores, caminho: Path, geracao: int = 0,
+                          n_sondas: int = ANN_SONDAS) -> IndiceIVF:
+    """
+    Carrega o índice aproximado salvo em disco, reconstruindo-o (e
+    salvando) caso não exista ou seja de outra geração dos dados.
+
+    Args:
+        vetores (sparse.csr_matrix | np.ndarray): Vetores dos documentos.
+        caminho (Path): Diretório do índice.
+        geracao (int, optional): Geração dos dados. O padrão é 0.
+        n_sondas (int, optional): Grupos visitados por consulta.
+
+    Returns:
+        IndiceIVF: O índice pronto para busca.
+    """
+    try:
+        indice = IndiceIVF.carregar(caminho, n_sondas)
+        if indice.geracao == geracao and indice.n_documentos == vetores.shape[0]:
+            return indice
+    except (OSError, ValueError, KeyError):
+        pass
+
+    indice = IndiceIVF.construir(vetores, n_sondas=n_sondas, geracao=geracao)
+    try:
+        indice.salvar(caminho)
+    except OSError:
+        # Sem permissão de escrita: o índice continua válido em memória.
+        pass
+    return indice
+
+
+def recall_em_k(exatos: list, aproximados: list) -> float:
+    """
+    Fração dos k vizinhos exatos encontrados pela busca aproximada, média
+    entre as consultas.
+
+    Args:
+        exatos (list): Para cada consulta, as linhas da busca exata.
+        aproximados (list): Para cada consulta, as linhas da busca
+            aproximada.
+
+    Returns:
+        float: O recall@k médio (entre 0 e 1).
+    """
+    acertos = [len(set(exato) & set(aproximado)) / len(exato)
+               for exato, aproximado in zip(exatos, aproximados) if len(exato)]
+    return float(np.mean(acertos)) if acertos else 1.0
+
+
+def avaliar(ivf: IndiceIVF, vetores, consultas: list, k: int = 10,
+            sondas: list = (1, 2, 4, 8, 16)) -> list:
+    """
+    Compara a busca aproximada com a exata para diferentes quantidades de
+    sondas.
+
+    Args:
+        ivf (IndiceIVF): O índice aproximado.
+        vetores (sparse.csr_matrix | np.ndarray): Vetores dos documentos.
+        consultas (list): Vetores das consultas.
+        k (int, optional): Quantidade de vizinhos. O padrão é 10.
+        sondas (list, optional): Quantidades de sondas avaliadas.
+
+    Returns:
+        list: Um dicionário por quantidade de sondas (e um para a busca
+        exata) com recall@k, latência média (ms) e documentos comparados.
+    """
+    from indice_busca import top_k
+
+    inicio = time.perf_counter()
+    exatos = [[linha for linha, _ in top_k(_similaridades(vetores, consulta), k)]
+              for consulta in consultas]
+    latencia_exata = (time.perf_counter() - inicio) / len(consultas) * 1000
+    resultados = [{'sondas': 'exata', 'recall': 1.0, 'latencia_ms': latencia_exata,
+                   'documentos': vetores.shape[0]}]
+
+    for n_sondas in sondas:
+        aproximados, comparados = [], 0
+        inicio = time.perf_counter()
+        for consulta in consultas:
+            linhas = ivf.candidatos(consulta, n_sondas)
+            selecionados = top_k(_similaridades(vetores, consulta, linhas), k)
+            aproximados.append([int(linhas[i]) for i, _ in selecionados])
+            comparados += len(linhas)
+        latencia = (time.perf_counter() - inicio) / len(consultas) * 1000
+        resultados.append({'sondas': n_sondas, 'recall': recall_em_k(exatos, aproximados),
+                           'latencia_ms': latencia, 'documentos': comparados / len(consultas)})
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Constrói o índice aproximado (IVF) da busca e mede o recall@k '
+                    'em relação à busca exata.'
+    )
+    parser.add_argument('--tipo', choices=['tfidf', 'denso'], default='tfidf')
+    parser.add_argument('--listas', type=int, default=None,
+                        help='Quantidade de grupos (padrão: raiz do número de documentos)')
+    parser.add_argument('--iteracoes', type=int, default=10)
+    parser.add_argument('--sondas', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--consultas', type=int, default=200,
+                        help='Títulos do corpus sorteados como consultas')
+    parser.add_argument('--salvar', action='store_true',
+                        help=f'Salva o índice em {CAMINHO_ANN}/<tipo>')
+    args = parser.parse_args()
+
+    if args.tipo == 'tfidf':
+        from indice_busca import IndiceTfidf
+        indice = IndiceTfidf.carregar()
+        vetores, geracao = indice.matriz, indice.geracao
+    else:
+        from indice_denso import IndiceDenso
+        indice = IndiceDenso.carregar()
+        vetores, geracao = indice.vetores, indice.geracao
+
+    inicio = time.perf_counter()
+    ivf = IndiceIVF.construir(vetores, args.listas, args.iteracoes, geracao=geracao)
+    print(f'{ivf.n_listas} grupos para {ivf.n_documentos} documentos '
+          f'({time.perf_counter() - inicio:.1f}s)')
+    if args.salvar:
+        ivf.salvar(CAMINHO_ANN / args.tipo)
+
+    gerador = np.random.default_rng(0)
+    amostra = gerador.choice(vetores.shape[0], min(args.consultas, vetores.shape[0]),
+                             replace=False)
+    consultas = [vetores[i] if sparse.issparse(vetores) else np.asarray(vetores[i])
+                 for i in amostra]
+    print(f'{"sondas":>7} {"recall@" + str(args.k):>10} {"latência (ms)":>14} {"documentos":>11}')
+    for resultado in avaliar(ivf, vetores, consultas, args.k, args.sondas):
+        print(f'{resultado["sondas"]:>7} {resultado["recall"]:>10.3f} '
+              f'{resultado["latencia_ms"]:>14.3f} {resultado["documentos"]:>11.0f}')
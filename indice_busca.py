@@ -0,0 +1,827 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+from configuracoes import MEMORIA_BLOCO_BUSCA_MB
+
+CAMINHO_DADOS = Path('data/df_completo.feather')
+CAMINHO_INDICE = Path('data/indice_tfidf')
+
+
+def assinatura_corpus(titulos: list, anterior: str = '') -> str:
+    """
+    Gera uma assinatura (hash) do conteúdo de uma lista de títulos, usada
+    para detectar quando o índice salvo está desatualizado.
+
+    Args:
+        titulos (list): Lista de títulos já processados.
+        anterior (str, optional): Assinatura dos títulos anteriores, quando
+            os títulos são acrescentados a um índice existente.
+
+    Returns:
+        str: Hash SHA-1 hexadecimal dos títulos.
+    """
+    hash_titulos = hashlib.sha1(anterior.encode('utf-8'))
+    for titulo in titulos:
+        hash_titulos.update(titulo.encode('utf-8'))
+        hash_titulos.update(b'\0')
+    return hash_titulos.hexdigest()
+
+
+def salvar_array(caminho: Path, array: np.ndarray):
+    """
+    Grava um array em `.npy` por substituição atômica do arquivo. Processos
+    que já abriram a versão anterior como memória mapeada continuam lendo-a,
+    em vez de ver o arquivo truncado durante a gravação.
+
+    Args:
+        caminho (Path): Arquivo de destino.
+        array (np.ndarray): O array.
+    """
+    caminho = Path(caminho)
+    temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+    with open(temporario, 'wb') as arquivo:
+        np.save(arquivo, np.ascontiguousarray(array))
+    os.replace(temporario, caminho)
+
+
+def salvar_csr(caminho: Path, nome: str, matriz: sparse.csr_matrix):
+    """Grava os arrays de uma matriz CSR (`<nome>.data.npy`, `.indices` e `.indptr`)."""
+    for parte in ('data', 'indices', 'indptr'):
+        salvar_array(caminho / f'{nome}.{parte}.npy', getattr(matriz, parte))
+
+
+def carregar_csr(caminho: Path, nome: str, n_colunas: int,
+                 mapear: bool = True) -> sparse.csr_matrix:
+    """
+    Abre uma matriz gravada com `salvar_csr`.
+
+    Args:
+        caminho (Path): Diretório da matriz.
+        nome (str): Nome da matriz.
+        n_colunas (int): Quantidade de colunas.
+        mapear (bool, optional): Se True, os arrays são memória mapeada
+            (somente leitura): a matriz não é copiada para o processo, e
+            processos que abrem os mesmos arquivos compartilham as páginas
+            do cache do sistema. O padrão é True.
+
+    Returns:
+        sparse.csr_matrix: A matriz.
+    """
+    modo = 'r' if mapear else None
+    data, indices, indptr = (np.load(caminho / f'{nome}.{parte}.npy', mmap_mode=modo)
+                             for parte in ('data', 'indices', 'indptr'))
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_colunas),
+                             copy=False)
+
+
+class Vocabulario:
+    """
+    Vocabulário do índice em dois arrays: os termos (UTF-8) em ordem
+    crescente e a coluna de cada um na matriz. Um termo é encontrado por
+    busca binária, sem o dicionário de strings Python que cada processo
+    teria de montar, e os arrays podem ser abertos como memória mapeada.
+    """
+
+    def __init__(self, termos: np.ndarray, colunas: np.ndarray):
+        self.termos = termos
+        self.colunas = colunas
+
+    @classmethod
+    def de_dicionario(cls, vocabulario: dict) -> 'Vocabulario':
+        """Cria o vocabulário a partir de um dicionário termo -> coluna."""
+        termos = np.array([termo.encode('utf-8') for termo in vocabulario], dtype=bytes)
+        colunas = np.fromiter(vocabulario.values(), dtype=np.int32, count=len(vocabulario))
+        ordem = np.argsort(termos, kind='stable')
+        return cls(termos[ordem], colunas[ordem])
+
+    def __len__(self) -> int:
+        return len(self.termos)
+
+    def colunas_termos(self, termos: list) -> np.ndarray:
+        """
+        Colunas de uma lista de termos.
+
+        Args:
+            termos (list): Os termos.
+
+        Returns:
+            np.ndarray: A coluna de cada termo, ou -1 para os termos fora
+            do vocabulário.
+        """
+        if not termos or not len(self.termos):
+            return np.full(len(termos), -1, dtype=np.int64)
+        chaves = np.array([termo.encode('utf-8') for termo in termos], dtype=bytes)
+        posicoes = np.minimum(np.searchsorted(self.termos, chaves), len(self.termos) - 1)
+        return np.where(self.termos[posicoes] == chaves, self.colunas[posicoes], -1)
+
+    def dicionario(self) -> dict:
+        """O vocabulário como dicionário termo -> coluna."""
+        return {termo.decode('utf-8'): int(coluna)
+                for termo, coluna in zip(self.termos, self.colunas)}
+
+
+def ponderar(contagens: sparse.csr_matrix) -> tuple:
+    """
+    Calcula os pesos IDF (suavizados, como no TfidfVectorizer) e a matriz
+    TF-IDF normalizada pela norma L2 a partir das contagens de termos.
+
+    Args:
+        contagens (sparse.csr_matrix): Contagens (n_documentos x n_termos).
+
+    Returns:
+        tuple: Vetor IDF e matriz TF-IDF normalizada, ambos em float32.
+    """
+    from sklearn.preprocessing import normalize
+
+    n_documentos = contagens.shape[0]
+    frequencia = np.bincount(contagens.indices, minlength=contagens.shape[1])
+    idf = (np.log((1 + n_documentos) / (1 + frequencia)) + 1).astype(np.float32)
+    matriz = normalize(contagens.multiply(idf).tocsr().astype(np.float32))
+    return idf, matriz
+
+
+def analisador(min_ngram: int = 1, max_ngram: int = 1):
+    """
+    Separador de termos (e n-grams) do CountVectorizer usado no índice. O
+    scikit-learn, cuja importação leva cerca de 1 s, só é importado aqui e
+    na construção do índice: as páginas que não usam a busca não o
+    carregam.
+
+    Args:
+        min_ngram (int, optional): Tamanho mínimo do n-gram. O padrão é 1.
+        max_ngram (int, optional): Tamanho máximo do n-gram. O padrão é 1.
+
+    Returns:
+        Callable: Função título -> lista de termos.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    return CountVectorizer(ngram_range=(min_ngram, max_ngram)).build_analyzer()
+
+
+class IndiceTfidf:
+    """
+    Índice TF-IDF dos títulos da base, ajustado uma única vez e salvo em
+    disco (vocabulário, pesos IDF e matriz CSR normalizada pela norma L2).
+    Todos os arrays são gravados como `.npy` sem compressão e abertos como
+    memória mapeada: vários processos do servidor na mesma máquina
+    compartilham uma única cópia do índice (o cache de páginas do sistema).
+
+    A busca de um título transforma apenas a consulta e calcula um único
+    produto matriz-vetor esparso, com custo linear no tamanho do corpus.
+
+    As contagens de termos também são guardadas, para que novos títulos
+    possam ser acrescentados (`acrescentar`) sem reajustar o corpus: só os
+    pesos IDF e a normalização são recalculados. Em disco, cada acréscimo
+    vira um arquivo de incremento, unido à base por `compactar`.
+    """
+
+    def __init__(self, vocabulario, contagens: sparse.csr_matrix,
+                 min_ngram: int = 1, max_ngram: int = 1, assinatura: str = '',
+                 geracao: int = 0, idf: np.ndarray = None,
+                 matriz: sparse.csr_matrix = None):
+        if isinstance(vocabulario, dict):
+            vocabulario = Vocabulario.de_dicionario(vocabulario)
+        self.vocabulario = vocabulario
+        self.contagens = contagens
+        self.min_ngram = min_ngram
+        self.max_ngram = max_ngram
+        self.assinatura = assinatura
+        self.geracao = geracao
+        if idf is None or matriz is None:
+            idf, matriz = ponderar(contagens)
+        self.idf = idf
+        self.matriz = matriz
+        self.incrementos = []
+        self._n_salvos = 0
+        self._analisador = analisador(min_ngram, max_ngram)
+
+    @property
+    def n_documentos(self) -> int:
+        return self.matriz.shape[0]
+
+    @classmethod
+    def construir(cls, titulos: list, min_ngram: int = 1,
+                  max_ngram: int = 1, geracao: int = 0) -> 'IndiceTfidf':
+        """
+        Ajusta o TF-IDF sobre os títulos do corpus.
+
+        Args:
+            titulos (list): Lista de títulos já processados (titulo_limpo).
+            min_ngram (int, optional): Tamanho mínimo do n-gram. O padrão é 1.
+            max_ngram (int, optional): Tamanho máximo do n-gram. O padrão é 1.
+            geracao (int, optional): Geração dos dados a que o índice
+                corresponde. O padrão é 0.
+
+        Returns:
+            IndiceTfidf: O índice ajustado.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        contador = CountVectorizer(ngram_range=(min_ngram, max_ngram),
+                                   dtype=np.float32)
+        contagens = contador.fit_transform(titulos).tocsr()
+        vocabulario = {termo: int(i) for termo, i in contador.vocabulary_.items()}
+        return cls(vocabulario, contagens, min_ngram, max_ngram,
+                   assinatura_corpus(titulos), geracao)
+
+    def acrescentar(self, titulos: list, geracao: int = None):
+        """
+        Acrescenta documentos ao índice. Termos novos são adicionados ao
+        fim do vocabulário; os pesos IDF e a normalização da matriz são
+        recalculados a partir das contagens.
+
+        Args:
+            titulos (list): Títulos já processados dos novos documentos.
+            geracao (int, optional): Nova geração dos dados. Se None, a
+                geração atual é incrementada.
+        """
+        vocabulario = self.vocabulario.dicionario()
+        linhas, colunas = [], []
+        for linha, titulo in enumerate(titulos):
+            for termo in self._analisador(titulo):
+                coluna = vocabulario.setdefault(termo, len(vocabulario))
+                linhas.append(linha)
+                colunas.append(coluna)
+        novas = sparse.csr_matrix(
+            (np.ones(len(linhas), dtype=np.float32), (linhas, colunas)),
+            shape=(len(titulos), len(vocabulario))
+        )
+        novas.sum_duplicates()
+        anteriores = self.contagens
+        anteriores.resize(anteriores.shape[0], len(vocabulario))
+        self.contagens = sparse.vstack([anteriores, novas], format='csr')
+        self.idf, self.matriz = ponderar(self.contagens)
+        self.vocabulario = Vocabulario.de_dicionario(vocabulario)
+        self.assinatura = assinatura_corpus(titulos, self.assinatura)
+        self.geracao = self.geracao + 1 if geracao is None else geracao
+
+    def _salvar_meta(self, caminho: Path):
+        salvar_array(caminho / 'termos.npy', self.vocabulario.termos)
+        salvar_array(caminho / 'termos_colunas.npy', self.vocabulario.colunas)
+        meta = {'min_ngram': self.min_ngram, 'max_ngram': self.max_ngram,
+                'n_documentos': self.n_documentos, 'n_termos': len(self.vocabulario),
+                'assinatura': self.assinatura, 'geracao': self.geracao,
+                'incrementos': self.incrementos}
+        temporario = caminho / f'meta.json.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(meta, arquivo)
+        os.replace(temporario, caminho / 'meta.json')
+
+    def salvar(self, caminho: Path = CAMINHO_INDICE):
+        """
+        Salva o índice completo (compactado) em disco, em um diretório com o
+        vocabulário, os pesos IDF, a matriz de documentos, as contagens de
+        termos e os metadados. Incrementos anteriores e arquivos do formato
+        antigo (matrizes `.npz` compactadas, que não podem ser mapeadas) são
+        removidos.
+
+        Args:
+            caminho (Path, optional): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        salvar_array(caminho / 'idf.npy', self.idf)
+        salvar_csr(caminho, 'matriz', self.matriz)
+        salvar_csr(caminho, 'contagens', self.contagens)
+        incrementos, self.incrementos = self.incrementos, []
+        self._n_salvos = self.n_documentos
+        self._salvar_meta(caminho)
+        for arquivo in incrementos + ['matriz.npz', 'contagens.npz', 'vocabulario.json']:
+            (caminho / arquivo).unlink(missing_ok=True)
+
+    def salvar_incremento(self, caminho: Path = CAMINHO_INDICE):
+        """
+        Salva apenas os documentos acrescentados desde a última gravação,
+        em um novo arquivo de incremento, sem reescrever a base.
+
+        Args:
+            caminho (Path, optional): Diretório do índice (já salvo antes
+                com `salvar`).
+        """
+        caminho = Path(caminho)
+        if self._n_salvos == self.n_documentos:
+            return
+        incremento = f'contagens_{self.geracao:06d}.npz'
+        sparse.save_npz(caminho / incremento, self.contagens[self._n_salvos:])
+        self.incrementos.append(incremento)
+        self._n_salvos = self.n_documentos
+        self._salvar_meta(caminho)
+
+    def compactar(self, caminho: Path = CAMINHO_INDICE):
+        """
+        Une a base e os incrementos em disco em uma nova base.
+
+        Args:
+            caminho (Path, optional): Diretório do índice.
+        """
+        self.salvar(caminho)
+
+    @classmethod
+    def carregar(cls, caminho: Path = CAMINHO_INDICE, mapear: bool = True) -> 'IndiceTfidf':
+        """
+        Carrega um índice salvo com `salvar` (e eventuais incrementos).
+
+        Args:
+            caminho (Path, optional): Diretório do índice.
+            mapear (bool, optional): Se True, abre os arrays como memória
+                mapeada (ver `carregar_csr`). Com incrementos pendentes, a
+                matriz e os pesos são recalculados na memória do processo
+                até a próxima compactação. O padrão é True.
+
+        Returns:
+            IndiceTfidf: O índice carregado.
+        """
+        caminho = Path(caminho)
+        modo = 'r' if mapear else None
+        with open(caminho / 'meta.json', encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        vocabulario = Vocabulario(np.load(caminho / 'termos.npy', mmap_mode=modo),
+                                  np.load(caminho / 'termos_colunas.npy', mmap_mode=modo))
+        contagens = carregar_csr(caminho, 'contagens', len(vocabulario), mapear)
+        incrementos = meta.get('incrementos', [])
+        if incrementos:
+            partes = [contagens] + [sparse.load_npz(caminho / incremento).tocsr()
+                                    for incremento in incrementos]
+            for parte in partes:
+                parte.resize(parte.shape[0], len(vocabulario))
+            contagens = sparse.vstack(partes, format='csr')
+            idf = matriz = None
+        else:
+            idf = np.load(caminho / 'idf.npy', mmap_mode=modo)
+            matriz = carregar_csr(caminho, 'matriz', len(vocabulario), mapear)
+        indice = cls(vocabulario, contagens, meta['min_ngram'], meta['max_ngram'],
+                     meta['assinatura'], meta.get('geracao', 0), idf, matriz)
+        indice.incrementos = incrementos
+        indice._n_salvos = indice.n_documentos
+        return indice
+
+    def vetorizar(self, titulos: list) -> sparse.csr_matrix:
+        """
+        Transforma títulos já processados em vetores TF-IDF normalizados,
+        usando o vocabulário e os pesos IDF do corpus.
+
+        Args:
+            titulos (list): Lista de títulos já processados.
+
+        Returns:
+            sparse.csr_matrix: Matriz (n_titulos x n_termos) normalizada.
+        """
+        termos = [self._analisador(titulo) for titulo in titulos]
+        linhas = np.repeat(np.arange(len(titulos)), [len(termos_titulo) for termos_titulo in termos])
+        colunas = self.vocabulario.colunas_termos([termo for termos_titulo in termos
+                                                   for termo in termos_titulo])
+        conhecidos = colunas >= 0
+        # Construída direto em CSR (os termos já estão agrupados por título)
+        indptr = np.zeros(len(titulos) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(linhas[conhecidos], minlength=len(titulos)), out=indptr[1:])
+        contagens = sparse.csr_matrix(
+            (np.ones(conhecidos.sum(), dtype=np.float32), colunas[conhecidos], indptr),
+            shape=(len(titulos), len(self.vocabulario))
+        )
+        contagens.sum_duplicates()
+        # Pesos e norma L2 calculados direto nos arrays da matriz (as
+        # consultas são poucas linhas, e `multiply`/`normalize` custavam
+        # mais que o resto da vetorização)
+        contagens.data *= self.idf[contagens.indices]
+        por_linha = np.diff(contagens.indptr)
+        normas = np.sqrt(np.bincount(np.repeat(np.arange(len(titulos)), por_linha),
+                                     weights=contagens.data.astype(np.float64) ** 2,
+                                     minlength=len(titulos)))
+        contagens.data /= np.repeat(normas, por_linha).astype(np.float32)
+        return contagens
+
+    def similaridade(self, titulo_limpo: str) -> np.ndarray:
+        """
+        Calcula a similaridade de cosseno entre um título processado e todos
+        os documentos do índice.
+
+        Args:
+            titulo_limpo (str): Título de referência já processado.
+
+        Returns:
+            np.ndarray: Vetor com uma similaridade por documento do índice.
+        """
+        return self.similaridade_vetor(self.vetorizar([titulo_limpo]))
+
+    def similaridade_vetor(self, consulta: sparse.csr_matrix,
+                           linhas: np.ndarray = None) -> np.ndarray:
+        """
+        Calcula a similaridade de cosseno entre uma consulta já vetorizada
+        e os documentos do índice.
+
+        Args:
+            consulta (sparse.csr_matrix): Saída de `vetorizar` (uma linha).
+            linhas (np.ndarray, optional): Documentos comparados. Se None,
+                todos.
+
+        Returns:
+            np.ndarray: Uma similaridade por documento comparado.
+        """
+        matriz = self.matriz if linhas is None else self.matriz[linhas]
+        # Produto por um vetor denso: mais rápido que o produto esparso
+        return matriz @ consulta.toarray().ravel()
+
+
+# Colunas da base usadas pela busca (filtros, títulos repetidos e resultados)
+COLUNAS_METADADOS = ['titulo', 'regiao', 'tipo estudo', 'ano', 'escala pedro']
+
+
+class FiltrosBusca(NamedTuple):
+    """
+    Filtros da busca de artigos similares. Campos com valor None não
+    filtram. Por ser imutável, também serve de chave de cache.
+    """
+    regioes: tuple = None
+    tipos_estudo: tuple = None
+    ano_min: int = None
+    ano_max: int = None
+    escala_min: float = None
+
+
+def normalizar_titulo(titulo: str) -> str:
+    """
+    Normaliza um título para identificar registros repetidos: minúsculas,
+    sem pontuação e com espaços simples.
+
+    Args:
+        titulo (str): O título original.
+
+    Returns:
+        str: O título normalizado.
+    """
+    return ' '.join(re.sub(r'[^\w\s]', ' ', titulo.lower()).split())
+
+
+class MascarasBusca:
+    """
+    Máscaras booleanas pré-calculadas sobre os metadados dos artigos, usadas
+    para restringir a busca antes do cálculo das similaridades, e os
+    títulos normalizados (como códigos inteiros) usados na remoção de
+    repetidos.
+    """
+
+    def __init__(self, metadados: pd.DataFrame, n_documentos: int = None, duplicatas=None):
+        """
+        Args:
+            metadados (pd.DataFrame): Metadados dos artigos, na ordem dos
+                documentos do índice.
+            n_documentos (int, optional): Total de documentos do índice.
+                Quando informado, o índice de `metadados` indica a posição
+                de cada linha no índice; os documentos ausentes (registros
+                substituídos, ver `armazem_artigos`) nunca são devolvidos.
+            duplicatas (deduplicacao.Duplicatas, optional): Grupos de
+                registros repetidos, com uma posição por documento. Quando
+                informados, só a linha canônica de cada grupo em cada
+                condição fica ativa e a remoção de repetidos usa os grupos
+                em vez dos títulos normalizados.
+        """
+        self.n_documentos = len(metadados) if n_documentos is None else n_documentos
+        self._linhas = {}
+        self._lock = threading.Lock()
+        posicoes = (np.arange(len(metadados)) if n_documentos is None
+                    else metadados.index.to_numpy())
+        self.ativos = self._espalhar(posicoes, True, False)
+        self.regiao = self._categorias(posicoes, metadados['regiao'])
+        self.tipo_estudo = self._categorias(posicoes, metadados['tipo estudo'])
+        self.ano = self._espalhar(posicoes, metadados['ano'].to_numpy(dtype=np.int64,
+                                                                        na_value=0), 0)
+        self.escala = self._espalhar(
+            posicoes, metadados['escala pedro'].to_numpy(dtype=float, na_value=np.nan), np.nan
+        )
+        if duplicatas is None:
+            titulos = metadados['titulo'].map(normalizar_titulo)
+            self.titulo_codigo = self._espalhar(posicoes, pd.factorize(titulos)[0], -1)
+        else:
+            self.ativos &= np.asarray(duplicatas.canonico_condicao, dtype=bool)
+            self.titulo_codigo = np.where(self.ativos, duplicatas.grupo, -1).astype(np.int64)
+
+    # Arrays gravados por `salvar` (as categorias são matrizes com uma linha
+    # por valor)
+    ARRAYS = ('ativos', 'ano', 'escala', 'titulo_codigo')
+    CATEGORIAS = ('regiao', 'tipo_estudo')
+
+    # Combinações de filtros mantidas em cache por `linhas`
+    MAX_LINHAS_EM_CACHE = 32
+
+    def salvar(self, caminho: Path):
+        """
+        Grava as máscaras em um diretório (`.npy` e `mascaras.json`, com os
+        valores das categorias).
+
+        Args:
+            caminho (Path): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        for nome in self.ARRAYS:
+            salvar_array(caminho / f'{nome}.npy', getattr(self, nome))
+        valores = {}
+        for nome in self.CATEGORIAS:
+            mascaras = getattr(self, nome)
+            valores[nome] = list(mascaras)
+            salvar_array(caminho / f'{nome}.npy',
+                         np.array(list(mascaras.values()), dtype=bool).reshape(
+                             len(mascaras), self.n_documentos))
+        with open(caminho / 'mascaras.json', 'w', encoding='utf-8') as arquivo:
+            json.dump({'n_documentos': self.n_documentos, 'valores': valores},
+                      arquivo, ensure_ascii=False)
+
+    @classmethod
+    def carregar(cls, caminho: Path, mapear: bool = True) -> 'MascarasBusca':
+        """
+        Abre máscaras gravadas com `salvar`.
+
+        Args:
+            caminho (Path): Diretório das máscaras.
+            mapear (bool, optional): Se True, os arrays são memória mapeada
+                (somente leitura). O padrão é True.
+
+        Returns:
+            MascarasBusca: As máscaras.
+        """
+        caminho = Path(caminho)
+        modo = 'r' if mapear else None
+        with open(caminho / 'mascaras.json', encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        mascaras = cls.__new__(cls)
+        mascaras.n_documentos = meta['n_documentos']
+        mascaras._linhas = {}
+        mascaras._lock = threading.Lock()
+        for nome in cls.ARRAYS:
+            setattr(mascaras, nome, np.load(caminho / f'{nome}.npy', mmap_mode=modo))
+        for nome in cls.CATEGORIAS:
+            matriz = np.load(caminho / f'{nome}.npy', mmap_mode=modo)
+            setattr(mascaras, nome, dict(zip(meta['valores'][nome], matriz)))
+        return mascaras
+
+    def _espalhar(self, posicoes: np.ndarray, valores, padrao) -> np.ndarray:
+        vetor = np.full(self.n_documentos, padrao, dtype=np.result_type(valores, padrao))
+        vetor[posicoes] = valores
+        return vetor
+
+    def _categorias(self, posicoes: np.ndarray, coluna: pd.Series) -> dict:
+        return {valor: self._espalhar(posicoes, (coluna == valor).to_numpy(), False)
+                for valor in coluna.dropna().unique()}
+
+    def _uniao(self, mascaras: dict, valores: tuple) -> np.ndarray:
+        mascara = np.zeros(self.n_documentos, dtype=bool)
+        for valor in valores:
+            if valor in mascaras:
+                mascara |= mascaras[valor]
+        return mascara
+
+    def linhas(self, filtros: FiltrosBusca) -> np.ndarray:
+        """
+        Combina as máscaras dos filtros. As últimas MAX_LINHAS_EM_CACHE
+        combinações ficam em cache na própria instância (e são descartadas
+        com ela quando as máscaras de uma nova geração são carregadas).
+
+        Args:
+            filtros (FiltrosBusca): Os filtros da busca.
+
+        Returns:
+            np.ndarray: Índices das linhas que atendem aos filtros, ou None
+            se nenhum filtro foi informado. Sem filtros, a matriz inteira é
+            comparada e os documentos inativos, com `titulo_codigo` -1, são
+            descartados por `top_k`, em vez de copiar as linhas ativas.
+        """
+        with self._lock:
+            if filtros in self._linhas:
+                return self._linhas[filtros]
+        linhas = self._combinar(filtros)
+        with self._lock:
+            if len(self._linhas) >= self.MAX_LINHAS_EM_CACHE:
+                del self._linhas[next(iter(self._linhas))]
+            self._linhas[filtros] = linhas
+        return linhas
+
+    def _combinar(self, filtros: FiltrosBusca) -> np.ndarray:
+        if filtros == FiltrosBusca():
+            return None
+        mascara = self.ativos.copy()
+        if filtros.regioes is not None:
+            mascara &= self._uniao(self.regiao, filtros.regioes)
+        if filtros.tipos_estudo is not None:
+            mascara &= self._uniao(self.tipo_estudo, filtros.tipos_estudo)
+        if filtros.ano_min is not None:
+            mascara &= self.ano >= filtros.ano_min
+        if filtros.ano_max is not None:
+            mascara &= self.ano <= filtros.ano_max
+        if filtros.escala_min is not None:
+            mascara &= self.escala >= filtros.escala_min
+        return np.flatnonzero(mascara)
+
+
+def top_k(similaridades: np.ndarray, k: int, 
+          codigos: np.ndarray = None) -> list:
+    """
+    Seleciona os k maiores valores por seleção parcial (sem ordenar o vetor
+    inteiro). Se `codigos` for informado, mantém apenas a primeira
+    ocorrência de cada código (ex.: títulos repetidos) e descarta os
+    documentos com código negativo (inativos, ver `MascarasBusca`).
+
+    Args:
+        similaridades (np.ndarray): Uma similaridade por documento.
+        k (int): Quantidade de resultados.
+        codigos (np.ndarray, optional): Código de agrupamento por documento.
+
+    Returns:
+        list: Pares (posição, similaridade) em ordem decrescente.
+    """
+    n = len(similaridades)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    m = min(n, 2 * k)
+    while True:
+        candidatos = np.argpartition(-similaridades, m - 1)[:m]
+        candidatos = candidatos[np.lexsort((candidatos, -similaridades[candidatos]))]
+        if codigos is None:
+            selecionados = candidatos[:k]
+        else:
+            candidatos = candidatos[codigos[candidatos] >= 0]
+            _, primeiros = np.unique(codigos[candidatos], return_index=True)
+            selecionados = candidatos[np.sort(primeiros)][:k]
+        if len(selecionados) == k or m == n:
+            return [(int(i), float(similaridades[i])) for i in selecionados]
+        m = min(n, 2 * m)
+
+
+def selecionar_similares(pontuar, k: int, mascaras: MascarasBusca = None,
+                         filtros: FiltrosBusca = FiltrosBusca(),
+                         candidatos: np.ndarray = None) -> list:
+    """
+    Aplica os filtros, calcula as similaridades das linhas selecionadas e
+    devolve as k maiores, sem títulos repetidos. Usada pelos diferentes
+    modos de busca (TF-IDF, vetores densos e híbrida).
+
+    Args:
+        pontuar (callable): Recebe os índices das linhas selecionadas (ou
+            None para todas) e devolve uma similaridade por linha.
+        k (int): Quantidade de resultados.
+        mascaras (MascarasBusca, optional): Máscaras dos metadados do corpus.
+            Necessárias para aplicar filtros e remover repetidos.
+        filtros (FiltrosBusca, optional): Os filtros da busca.
+        candidatos (np.ndarray, optional): Linhas pré-selecionadas por um
+            índice aproximado (ver `indice_ann`), em ordem crescente. Se
+            None, a busca é exata.
+
+    Returns:
+        list: Pares (linha no corpus, similaridade) em ordem decrescente.
+    """
+    linhas = mascaras.linhas(filtros) if mascaras is not None else None
+    if candidatos is not None:
+        linhas = candidatos if linhas is None else np.intersect1d(
+            linhas, candidatos, assume_unique=True
+        )
+    similaridades = pontuar(linhas)
+
+    codigos = None
+    if mascaras is not None:
+        codigos = mascaras.titulo_codigo if linhas is None else mascaras.titulo_codigo[linhas]
+    resultado = top_k(similaridades, k, codigos)
+    if linhas is not None:
+        resultado = [(int(linhas[i]), similaridade) for i, similaridade in resultado]
+    return resultado
+
+
+def buscar_similares(indice: IndiceTfidf, titulo_limpo: str, k: int,
+                     mascaras: MascarasBusca = None,
+                     filtros: FiltrosBusca = FiltrosBusca(), ann=None) -> list:
+    """
+    Busca os k documentos mais similares a um título, aplicando os filtros
+    antes do cálculo das similaridades e removendo títulos repetidos.
+
+    Args:
+        indice (IndiceTfidf): O índice TF-IDF.
+        titulo_limpo (str): Título de referência já processado.
+        k (int): Quantidade de resultados.
+        mascaras (MascarasBusca, optional): Máscaras dos metadados do corpus.
+            Necessárias para aplicar filtros e remover repetidos.
+        filtros (FiltrosBusca, optional): Os filtros da busca.
+        ann (indice_ann.IndiceIVF, optional): Índice aproximado sobre a
+            matriz TF-IDF. Se None, a busca é exata.
+
+    Returns:
+        list: Pares (linha no corpus, similaridade) em ordem decrescente.
+    """
+    consulta = indice.vetorizar([titulo_limpo])
+    candidatos = ann.candidatos(consulta) if ann is not None else None
+    return selecionar_similares(lambda linhas: indice.similaridade_vetor(consulta, linhas),
+                                k, mascaras, filtros, candidatos)
+
+
+def buscar_similares_lote(indice: IndiceTfidf, titulos_limpos: list, k: int,
+                          mascaras: MascarasBusca = None,
+                          filtros: FiltrosBusca = FiltrosBusca(),
+                          memoria_bloco_mb: int = MEMORIA_BLOCO_BUSCA_MB) -> list:
+    """
+    Busca os k documentos mais similares a cada um de vários títulos. As
+    consultas são vetorizadas de uma vez e comparadas ao corpus por blocos
+    de consultas, com um único produto matricial por bloco; o tamanho do
+    bloco é limitado por `memoria_bloco_mb`.
+
+    Args:
+        indice (IndiceTfidf): O índice TF-IDF.
+        titulos_limpos (list): Títulos de referência já processados.
+        k (int): Quantidade de resultados por título.
+        mascaras (MascarasBusca, optional): Máscaras dos metadados do corpus.
+            Necessárias para aplicar filtros e remover repetidos.
+        filtros (FiltrosBusca, optional): Os filtros da busca.
+        memoria_bloco_mb (int, optional): Memória máxima (MB) das
+            similaridades de um bloco de consultas.
+
+    Returns:
+        list: Para cada título, os pares (linha no corpus, similaridade) em
+        ordem decrescente, como em `buscar_similares`.
+    """
+    consultas = indice.vetorizar(titulos_limpos)
+    linhas = mascaras.linhas(filtros) if mascaras is not None else None
+    matriz = indice.matriz if linhas is None else indice.matriz[linhas]
+    codigos = None
+    if mascaras is not None:
+        codigos = mascaras.titulo_codigo if linhas is None else mascaras.titulo_codigo[linhas]
+
+    # As consultas de um bloco são densificadas: o produto da matriz esparsa
+    # do corpus por uma matriz densa é mais rápido que o produto esparso,
+    # cujo resultado é quase todo preenchido pelos termos comuns. Memória
+    # por consulta: um vetor denso de termos e um de similaridades.
+    bytes_consulta = 4 * (consultas.shape[1] + matriz.shape[0])
+    tamanho_bloco = max(1, memoria_bloco_mb * 2 ** 20 // bytes_consulta)
+
+    resultados = []
+    for inicio in range(0, consultas.shape[0], tamanho_bloco):
+        bloco = consultas[inicio:inicio + tamanho_bloco].T.toarray()
+        bloco = (matriz @ bloco).T
+        for similaridades in bloco:
+            resultado = top_k(similaridades, k, codigos)
+            if linhas is not None:
+                resultado = [(int(linhas[i]), similaridade) for i, similaridade in resultado]
+            resultados.append(resultado)
+    return resultados
+
+
+def carregar_ou_construir(titulos: list, caminho: Path = CAMINHO_INDICE,
+                          min_ngram: int = 1, max_ngram: int = 1) -> IndiceTfidf:
+    """
+    Carrega o índice salvo em disco, reconstruindo-o (e salvando) caso não
+    exista ou tenha sido gerado para outro corpus ou outros n-grams.
+
+    Args:
+        titulos (list): Lista de títulos já processados (titulo_limpo).
+        caminho (Path, optional): Diretório do índice.
+        min_ngram (int, optional): Tamanho mínimo do n-gram. O padrão é 1.
+        max_ngram (int, optional): Tamanho máximo do n-gram. O padrão é 1.
+
+    Returns:
+        IndiceTfidf: O índice pronto para busca.
+    """
+    caminho = Path(caminho)
+    try:
+        indice = IndiceTfidf.carregar(caminho)
+    except (OSError, ValueError, KeyError):
+        # Índice inexistente ou salvo em formato antigo
+        indice = None
+    if (indice is not None and indice.min_ngram == min_ngram
+            and indice.max_ngram == max_ngram
+            and indice.assinatura == assinatura_corpus(titulos)):
+        return indice
+
+    indice = IndiceTfidf.construir(titulos, min_ngram, max_ngram)
+    try:
+        indice.salvar(caminho)
+    except OSError:
+        # Sem permissão de escrita (ex.: deploy somente leitura): o índice
+        # continua válido em memória.
+        pass
+    return indice
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Constrói o índice TF-IDF da busca de artigos similares.'
+    )
+    parser.add_argument('--dados', type=Path, default=CAMINHO_DADOS)
+    parser.add_argument('--saida', type=Path, default=CAMINHO_INDICE)
+    parser.add_argument('--min-ngram', type=int, default=1)
+    parser.add_argument('--max-ngram', type=int, default=1)
+    args = parser.parse_args()
+
+    titulos = list(pd.read_feather(args.dados, columns=['titulo_limpo'])['titulo_limpo'])
+    indice = IndiceTfidf.construir(titulos, args.min_ngram, args.max_ngram)
+    indice.salvar(args.saida)
+    print(f'Índice salvo em {args.saida}: {indice.n_documentos} documentos, '
+          f'{len(indice.vocabulario)} termos')
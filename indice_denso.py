@@ -0,0 +1,226 @@
+import json
+import os
+
+from pathlib import Path
+
+import numpy as np
+
+from indice_busca import (
+    FiltrosBusca, IndiceTfidf, MascarasBusca, assinatura_corpus, salvar_array,
+    selecionar_similares
+)
+
+CAMINHO_VETORES = Path('data/vetores_titulos')
+
+
+def vetores_titulos(modelo_spacy, titulos_limpos: list) -> np.ndarray:
+    """
+    Calcula um vetor por título: a média dos vetores estáticos das palavras
+    do modelo spaCy (ex.: en_core_web_lg), normalizada pela norma L2. Só o
+    tokenizador é executado; palavras sem vetor são ignoradas.
+
+    Args:
+        modelo_spacy (spacy.language.Language): Modelo com vetores de
+            palavras.
+        titulos_limpos (list): Títulos já processados (titulo_limpo).
+
+    Returns:
+        np.ndarray: Matriz float32 (n_titulos x dimensão). Títulos sem
+        nenhuma palavra conhecida resultam em vetores nulos.
+    """
+    vetores = np.zeros((len(titulos_limpos), modelo_spacy.vocab.vectors_length),
+                       dtype=np.float32)
+    for i, doc in enumerate(modelo_spacy.tokenizer.pipe(titulos_limpos, batch_size=256)):
+        vetores[i] = doc.vector
+    normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+    return vetores / np.where(normas > 0, normas, 1)
+
+
+class IndiceDenso:
+    """
+    Vetores densos (float32, normalizados) dos títulos da base, na mesma
+    ordem dos documentos do índice TF-IDF. Em disco ficam em um `.npy`
+    carregado como memória mapeada: a abertura é imediata e as páginas são
+    compartilhadas, pelo cache do sistema operacional, entre os processos
+    que servem o webapp.
+    """
+
+    def __init__(self, vetores: np.ndarray, modelo: str, assinatura: str = '',
+                 geracao: int = 0):
+        self.vetores = vetores
+        self.modelo = modelo
+        self.assinatura = assinatura
+        self.geracao = geracao
+
+    @property
+    def n_documentos(self) -> int:
+        return self.vetores.shape[0]
+
+    @classmethod
+    def construir(cls, modelo_spacy, titulos_limpos: list, modelo: str,
+                  geracao: int = 0) -> 'IndiceDenso':
+        """
+        Calcula os vetores dos títulos do corpus.
+
+        Args:
+            modelo_spacy (spacy.language.Language): Modelo com vetores.
+            titulos_limpos (list): Títulos já processados (titulo_limpo).
+            modelo (str): Nome do modelo, guardado nos metadados.
+            geracao (int, optional): Geração dos dados. O padrão é 0.
+
+        Returns:
+            IndiceDenso: O índice construído (em memória).
+        """
+        return cls(vetores_titulos(modelo_spacy, titulos_limpos), modelo,
+                   assinatura_corpus(titulos_limpos), geracao)
+
+    def salvar(self, caminho: Path = CAMINHO_VETORES):
+        """
+        Salva os vetores (`vetores.npy`) e os metadados em `meta.json`, por
+        último, por substituição atômica dos arquivos.
+
+        Args:
+            caminho (Path, optional): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        salvar_array(caminho / 'vetores.npy', np.asarray(self.vetores, dtype=np.float32))
+        meta = {'modelo': self.modelo, 'assinatura': self.assinatura,
+                'geracao': self.geracao, 'n_documentos': self.n_documentos,
+                'dimensao': int(self.vetores.shape[1])}
+        temporario = caminho / f'meta.json.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(meta, arquivo)
+        os.replace(temporario, caminho / 'meta.json')
+
+    @classmethod
+    def carregar(cls, caminho: Path = CAMINHO_VETORES) -> 'IndiceDenso':
+        """
+        Abre os vetores salvos com `salvar` como memória mapeada (somente
+        leitura).
+
+        Args:
+            caminho (Path, optional): Diretório dos vetores.
+
+        Returns:
+            IndiceDenso: O índice carregado.
+        """
+        caminho = Path(caminho)
+        with open(caminho / 'meta.json', encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        vetores = np.load(caminho / 'vetores.npy', mmap_mode='r')
+        return cls(vetores, meta['modelo'], meta['assinatura'], meta['geracao'])
+
+    def similaridade(self, vetor: np.ndarray, linhas: np.ndarray = None) -> np.ndarray:
+        """
+        Calcula a similaridade de cosseno entre o vetor (normalizado) de uma
+        consulta e os títulos do corpus.
+
+        Args:
+            vetor (np.ndarray): Vetor da consulta (ver `vetores_titulos`).
+            linhas (np.ndarray, optional): Documentos comparados. Se None,
+                todos.
+
+        Returns:
+            np.ndarray: Uma similaridade por documento comparado.
+        """
+        vetores = self.vetores if linhas is None else self.vetores[linhas]
+        return vetores @ vetor
+
+
+def carregar_salvo(modelo: str, geracao: int, n_documentos: int,
+                   caminho: Path = CAMINHO_VETORES) -> IndiceDenso:
+    """
+    Abre os vetores salvos em disco sem o modelo spaCy, se foram gerados
+    para o modelo, a geração dos dados e a quantidade de documentos
+    informados.
+
+    Args:
+        modelo (str): Nome do modelo.
+        geracao (int): Geração dos dados.
+        n_documentos (int): Documentos do índice TF-IDF.
+        caminho (Path, optional): Diretório dos vetores.
+
+    Returns:
+        IndiceDenso: O índice, ou None se não houver vetores válidos.
+    """
+    try:
+        indice = IndiceDenso.carregar(caminho)
+    except (OSError, ValueError, KeyError):
+        return None
+    if (indice.modelo == modelo and indice.geracao == geracao
+            and indice.n_documentos == n_documentos):
+        return indice
+    return None
+
+
+def carregar_ou_construir(modelo_spacy, titulos_limpos: list, modelo: str,
+                          geracao: int = 0,
+                          caminho: Path = CAMINHO_VETORES) -> IndiceDenso:
+    """
+    Abre os vetores salvos em disco, recalculando-os (e salvando) caso não
+    existam ou tenham sido gerados para outra geração dos dados ou outro
+    modelo.
+
+    Args:
+        modelo_spacy (spacy.language.Language): Modelo com vetores.
+        titulos_limpos (list): Títulos do corpus na ordem do índice TF-IDF.
+        modelo (str): Nome do modelo.
+        geracao (int, optional): Geração dos dados. O padrão é 0.
+        caminho (Path, optional): Diretório dos vetores.
+
+    Returns:
+        IndiceDenso: O índice pronto para busca.
+    """
+    indice = carregar_salvo(modelo, geracao, len(titulos_limpos), caminho)
+    if indice is not None:
+        return indice
+
+    indice = IndiceDenso.construir(modelo_spacy, titulos_limpos, modelo, geracao)
+    try:
+        indice.salvar(caminho)
+        return IndiceDenso.carregar(caminho)
+    except OSError:
+        # Sem permissão de escrita: o índice continua válido em memória.
+        return indice
+
+
+def buscar_similares_denso(indice: IndiceDenso, vetor: np.ndarray, k: int,
+                           mascaras: MascarasBusca = None,
+                           filtros: FiltrosBusca = FiltrosBusca(),
+                           indice_tfidf: IndiceTfidf = None, titulo_limpo: str = None,
+                           peso_denso: float = 1.0, ann=None) -> list:
+    """
+    Busca os k documentos com vetores mais próximos do vetor da consulta.
+    No modo híbrido (`indice_tfidf` e `titulo_limpo` informados), a
+    similaridade é a média ponderada das similaridades densa e TF-IDF.
+
+    Args:
+        indice (IndiceDenso): Os vetores dos títulos.
+        vetor (np.ndarray): Vetor da consulta (ver `vetores_titulos`).
+        k (int): Quantidade de resultados.
+        mascaras (MascarasBusca, optional): Máscaras dos metadados do corpus.
+        filtros (FiltrosBusca, optional): Os filtros da busca.
+        indice_tfidf (IndiceTfidf, optional): Índice TF-IDF, no modo híbrido.
+        titulo_limpo (str, optional): Consulta já processada, no modo híbrido.
+        peso_denso (float, optional): Peso da similaridade densa no modo
+            híbrido (entre 0 e 1). O padrão é 1.0.
+        ann (indice_ann.IndiceIVF, optional): Índice aproximado sobre os
+            vetores densos. Se None, a busca é exata.
+
+    Returns:
+        list: Pares (linha no corpus, similaridade) em ordem decrescente.
+    """
+    vetor = np.asarray(vetor, dtype=np.float32)
+    candidatos = ann.candidatos(vetor) if ann is not None else None
+    if indice_tfidf is None or titulo_limpo is None:
+        return selecionar_similares(lambda linhas: indice.similaridade(vetor, linhas),
+                                    k, mascaras, filtros, candidatos)
+
+    consulta = indice_tfidf.vetorizar([titulo_limpo])
+
+    def pontuar(linhas):
+        return (peso_denso * indice.similaridade(vetor, linhas)
+                + (1 - peso_denso) * indice_tfidf.similaridade_vetor(consulta, linhas))
+
+    return selecionar_similares(pontuar, k, mascaras, filtros, candidatos)
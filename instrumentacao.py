@@ -0,0 +1,211 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from configuracoes import ARQUIVO_METRICAS, DEPURACAO
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# As etapas só são medidas com o painel de depuração ou o arquivo de
+# métricas ativos; caso contrário `etapa` devolve um contexto vazio.
+ATIVA = DEPURACAO or bool(ARQUIVO_METRICAS)
+
+_NULO = contextlib.nullcontext()
+_STATUS = Path('/proc/self/status')
+_local = threading.local()
+_lock = threading.Lock()
+# Etapa -> [quantidade de execuções, soma dos tempos em ms], desde o início
+# do processo
+_acumulado = {}
+
+
+class Execucao:
+    """
+    Tempos das etapas de uma execução (rerun) do script, na ordem em que
+    terminaram. Etapas aninhadas têm os nomes unidos por '/' (ex.:
+    'condicao.dados/tabelas').
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.duracao_ms = None
+        self.rss_inicial_mb = _memoria('VmRSS')
+        self.pico_memoria_mb = None
+        self._pilha = []
+
+    def registro(self) -> dict:
+        """
+        Returns:
+            dict: A execução em formato serializável (JSON).
+        """
+        return {
+            'instante': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'duracao_ms': self.duracao_ms, 'rss_inicial_mb': self.rss_inicial_mb,
+            'pico_memoria_mb': self.pico_memoria_mb,
+            'etapas': [{'etapa': nome, 'ms': ms} for nome, ms in self.etapas],
+        }
+
+
+def _memoria(campo: str) -> float:
+    """Campo de memória (em MB) de /proc/self/status, ou None fora do Linux."""
+    try:
+        for linha in _STATUS.read_text().splitlines():
+            if linha.startswith(f'{campo}:'):
+                return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reiniciar_pico_memoria():
+    # No Linux, escrever 5 em clear_refs zera o pico de RSS (VmHWM)
+    try:
+        with open('/proc/self/clear_refs', 'w') as arquivo:
+            arquivo.write('5')
+    except OSError:
+        pass
+
+
+def _pico_memoria() -> float:
+    pico = _memoria('VmHWM')
+    if pico is None and resource is not None:
+        # Sem /proc: o pico do processo inteiro (ru_maxrss em KB no Linux e
+        # em bytes no macOS)
+        divisor = 2**20 if os.uname().sysname == 'Darwin' else 1024
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    return pico
+
+
+@contextlib.contextmanager
+def _medir(execucao: Execucao, nome: str):
+    execucao._pilha.append(nome)
+    caminho = '/'.join(execucao._pilha)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        execucao.etapas.append((caminho, (time.perf_counter() - inicio) * 1000))
+        execucao._pilha.pop()
+
+
+def etapa(nome: str):
+    """
+    Contexto que mede o tempo de uma etapa da execução atual:
+
+        with etapa('spacy.load'):
+            ...
+
+    Sem instrumentação ativa (ou fora de uma execução iniciada com
+    `iniciar_execucao`), não mede nada.
+
+    Args:
+        nome (str): Nome da etapa.
+
+    Returns:
+        contextlib.AbstractContextManager: O contexto da etapa.
+    """
+    if not ATIVA:
+        return _NULO
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None:
+        return _NULO
+    return _medir(execucao, nome)
+
+
+def iniciar_execucao() -> Execucao:
+    """
+    Inicia a medição de uma execução do script na thread atual (cada
+    sessão do Streamlit executa o script em sua própria thread) e zera o
+    pico de memória residente do processo (Linux).
+
+    Returns:
+        Execucao: A execução iniciada, ou None sem instrumentação ativa.
+    """
+    if not ATIVA:
+        return None
+    _reiniciar_pico_memoria()
+    _local.execucao = Execucao()
+    return _local.execucao
+
+
+def finalizar_execucao() -> Execucao:
+    """
+    Encerra a execução da thread atual, registra o pico de memória e grava
+    as métricas em ARQUIVO_METRICAS, se definido.
+
+    Returns:
+        Execucao: A execução encerrada, ou None se nenhuma foi iniciada.
+    """
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is None:
+        return None
+    _local.execucao = None
+    execucao.duracao_ms = (time.perf_counter() - execucao.inicio) * 1000
+    # O pico é do processo: com sessões simultâneas inclui a memória usada
+    # pelas outras execuções
+    execucao.pico_memoria_mb = _pico_memoria()
+
+    with _lock:
+        for nome, ms in execucao.etapas + [('execucao', execucao.duracao_ms)]:
+            acumulado = _acumulado.setdefault(nome, [0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += ms
+        if ARQUIVO_METRICAS:
+            gravar_metricas(execucao, Path(ARQUIVO_METRICAS))
+    return execucao
+
+
+def texto_prometheus(execucao: Execucao = None) -> str:
+    """
+    Métricas acumuladas no formato de texto do Prometheus: soma e
+    quantidade dos tempos de cada etapa e, se informada, a memória da
+    última execução.
+
+    Args:
+        execucao (Execucao, optional): A última execução.
+
+    Returns:
+        str: O texto das métricas.
+    """
+    linhas = ['# HELP pedro_etapa_segundos Tempo das etapas das execuções do webapp.',
+              '# TYPE pedro_etapa_segundos summary']
+    for nome, (quantidade, soma_ms) in sorted(_acumulado.items()):
+        rotulo = nome.replace('\\', '\\\\').replace('"', '\\"')
+        linhas.append(f'pedro_etapa_segundos_sum{{etapa="{rotulo}"}} {soma_ms / 1000:.6f}')
+        linhas.append(f'pedro_etapa_segundos_count{{etapa="{rotulo}"}} {quantidade}')
+    if execucao is not None and execucao.pico_memoria_mb is not None:
+        linhas += ['# HELP pedro_pico_memoria_bytes Pico de memória residente durante a '
+                   'última execução.',
+                   '# TYPE pedro_pico_memoria_bytes gauge',
+                   f'pedro_pico_memoria_bytes {execucao.pico_memoria_mb * 2**20:.0f}']
+    return '\n'.join(linhas) + '\n'
+
+
+def gravar_metricas(execucao: Execucao, caminho: Path):
+    """
+    Grava as métricas de uma execução: arquivos `.prom` são reescritos com
+    as métricas acumuladas no formato do Prometheus (ex.: para o textfile
+    collector do node_exporter); nos demais, a execução é acrescentada como
+    uma linha JSON.
+
+    Args:
+        execucao (Execucao): A execução encerrada.
+        caminho (Path): O arquivo de destino.
+    """
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    if caminho.suffix == '.prom':
+        temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+        temporario.write_text(texto_prometheus(execucao), encoding='utf-8')
+        os.replace(temporario, caminho)
+    else:
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(execucao.registro(), ensure_ascii=False) + '\n')
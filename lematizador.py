@@ -0,0 +1,508 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from configuracoes import (
+    COMPONENTES_DESATIVADOS, LEMATIZADOR, LEMATIZADOR_SPACY_DESCONHECIDAS, MAX_CONSULTAS_EM_CACHE,
+    MODELO_SPACY
+)
+
+CAMINHO_LEMATIZADOR = Path('data/lematizador.json')
+
+# Versão do formato do arquivo da tabela
+VERSAO = 1
+
+
+def _pontuacao(texto: str) -> bool:
+    # Mesma regra do atributo `is_punct` do spaCy
+    return all(unicodedata.category(caractere).startswith('P') for caractere in texto)
+
+
+def regras_tokenizador(modelo_spacy) -> dict:
+    """
+    Extrai do tokenizador do spaCy as regras usadas por `Lematizador`:
+    expressões de prefixos, sufixos, infixos e URLs e os casos especiais
+    (ex.: "can't" -> "ca", "n't").
+
+    Args:
+        modelo_spacy (spacy.language.Language): O modelo spaCy.
+
+    Returns:
+        dict: As regras, serializáveis em JSON.
+    """
+    tokenizador = modelo_spacy.tokenizer
+
+    def expressao(funcao):
+        padrao = getattr(funcao, '__self__', None)
+        return None if padrao is None else {'padrao': padrao.pattern, 'flags': padrao.flags}
+
+    # Os títulos chegam em minúsculas: casos especiais com maiúsculas nunca
+    # são encontrados
+    especiais = {texto: [sub[65] for sub in subtokens]  # 65 = ORTH
+                 for texto, subtokens in tokenizador.rules.items()
+                 if texto == texto.lower() and not texto.isspace()}
+    return {
+        'prefixo': expressao(tokenizador.prefix_search),
+        'sufixo': expressao(tokenizador.suffix_search),
+        'infixo': expressao(tokenizador.infix_finditer),
+        'token': expressao(tokenizador.token_match),
+        'url': expressao(tokenizador.url_match),
+        'especiais': especiais,
+    }
+
+
+def palavras_vetores(modelo_spacy, limite: int = 50000) -> list:
+    """
+    Palavras gerais do inglês tiradas da tabela de vetores do modelo (em
+    minúsculas, só letras), na ordem da tabela.
+
+    Args:
+        modelo_spacy (spacy.language.Language): O modelo spaCy.
+        limite (int, optional): Quantidade máxima de palavras.
+
+    Returns:
+        list: As palavras, sem repetições. Vazia se o modelo não tem vetores.
+    """
+    palavras = {}
+    strings = modelo_spacy.vocab.strings
+    for chave in modelo_spacy.vocab.vectors.keys():
+        palavra = strings[chave] if chave in strings else ''
+        if palavra.isalpha() and palavra == palavra.lower():
+            palavras[palavra] = None
+            if len(palavras) >= limite:
+                break
+    return list(palavras)
+
+
+class Lematizador:
+    """
+    Processa títulos como `funcoes.limpar_titulo` sem o spaCy: um
+    tokenizador em Python puro, que reproduz o algoritmo do tokenizador do
+    spaCy (`Tokenizer.explain`) com as regras exportadas do modelo, e uma
+    tabela token -> lema com as stop words, gerada do mesmo modelo para o
+    vocabulário do corpus e uma lista geral de palavras.
+
+    O lematizador dos modelos `en_core_web_*` depende da classe gramatical
+    da palavra no título; a tabela guarda o lema mais frequente de cada
+    token no corpus, então o resultado pode diferir do spaCy em palavras
+    ambíguas (ver `python lematizador.py verificar`). Tokens fora da tabela
+    são mantidos como estão ou, com `carregar_spacy`, lematizados pelo
+    modelo spaCy (carregado só na primeira palavra desconhecida).
+    """
+
+    def __init__(self, regras: dict, lemas: dict, stop_words, modelo: str = '',
+                 carregar_spacy=None):
+        self.regras = regras
+        self.lemas = lemas
+        self.stop_words = frozenset(stop_words)
+        self.modelo = modelo
+        self.carregar_spacy = carregar_spacy
+        self.desconhecidas = 0
+        self._lock = threading.Lock()
+
+        def compilar(chave):
+            expressao = regras.get(chave)
+            return None if expressao is None else re.compile(expressao['padrao'],
+                                                             expressao['flags'])
+
+        self._prefixo = compilar('prefixo')
+        self._sufixo = compilar('sufixo')
+        self._infixo = compilar('infixo')
+        self._token = compilar('token')
+        self._url = compilar('url')
+        self._especiais = {texto: tuple(subtokens)
+                           for texto, subtokens in regras['especiais'].items()}
+        # Casos especiais que as regras de afixos dividiriam (ex.: "):"): o
+        # spaCy os junta depois da divisão, como faremos em `_juntar_especiais`
+        self._compostos = {}
+        for texto, subtokens in self._especiais.items():
+            divisao = self._dividir_pedaco(texto, especiais=False)
+            if len(divisao) > 1:
+                self._compostos[divisao] = subtokens
+        self._max_composto = max(map(len, self._compostos), default=0)
+        # Os pedaços entre espaços se repetem muito entre títulos, como no
+        # cache do próprio tokenizador do spaCy
+        self._dividir = lru_cache(maxsize=65536)(self._dividir_pedaco)
+        # Lemas do spaCy para tokens fora da tabela, à parte de `lemas`: as
+        # palavras digitadas nas consultas não fazem a tabela crescer sem
+        # limite
+        self._lema_spacy = lru_cache(maxsize=MAX_CONSULTAS_EM_CACHE)(self._lematizar_spacy)
+
+    @property
+    def n_lemas(self) -> int:
+        return len(self.lemas)
+
+    @classmethod
+    def construir(cls, modelo_spacy, titulos: list, palavras: list = (),
+                  modelo: str = '') -> 'Lematizador':
+        """
+        Gera a tabela passando os títulos do corpus (em minúsculas, como em
+        `funcoes.limpar_titulo`) e as palavras gerais pelo modelo spaCy.
+
+        Args:
+            modelo_spacy (spacy.language.Language): O modelo spaCy.
+            titulos (list): Títulos do corpus (texto original).
+            palavras (list, optional): Palavras gerais, lematizadas
+                isoladamente; não substituem os lemas vistos no corpus.
+            modelo (str, optional): Nome do modelo, guardado na tabela.
+
+        Returns:
+            Lematizador: O lematizador com a tabela gerada.
+        """
+        contagens = defaultdict(Counter)
+        textos = (str(titulo).lower() for titulo in titulos)
+        for doc in modelo_spacy.pipe(textos, batch_size=256):
+            for token in doc:
+                if not (token.is_space or token.is_stop or token.is_punct):
+                    contagens[token.text][token.lemma_] += 1
+        lemas = {texto: contagem.most_common(1)[0][0] for texto, contagem in contagens.items()}
+
+        novas = [palavra for palavra in dict.fromkeys(str(p).lower() for p in palavras)
+                 if palavra and palavra not in lemas]
+        for palavra, doc in zip(novas, modelo_spacy.pipe(novas, batch_size=1024)):
+            if len(doc) == 1 and not (doc[0].is_stop or doc[0].is_punct):
+                lemas[palavra] = doc[0].lemma_
+
+        return cls(regras_tokenizador(modelo_spacy), lemas,
+                   sorted(modelo_spacy.Defaults.stop_words), modelo)
+
+    def salvar(self, caminho: Path = CAMINHO_LEMATIZADOR):
+        """
+        Grava a tabela em um arquivo JSON.
+
+        Args:
+            caminho (Path, optional): O arquivo de destino.
+        """
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        dados = {'versao': VERSAO, 'modelo': self.modelo, 'regras': self.regras,
+                 'stop_words': sorted(self.stop_words), 'lemas': self.lemas}
+        temporario = caminho.with_name(f'{caminho.name}.{os.getpid()}.tmp')
+        temporario.write_text(json.dumps(dados, ensure_ascii=False), encoding='utf-8')
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho: Path = CAMINHO_LEMATIZADOR,
+                 carregar_spacy=None) -> 'Lematizador':
+        """
+        Abre uma tabela gravada com `salvar`.
+
+        Args:
+            caminho (Path, optional): O arquivo da tabela.
+            carregar_spacy (callable, optional): Função sem argumentos que
+                devolve o modelo spaCy, usado nos tokens fora da tabela.
+
+        Raises:
+            ValueError: Se o arquivo é de outra versão do formato.
+
+        Returns:
+            Lematizador: O lematizador carregado.
+        """
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        if dados.get('versao') != VERSAO:
+            raise ValueError(f'Versão da tabela não suportada: {dados.get("versao")}')
+        return cls(dados['regras'], dados['lemas'], dados['stop_words'], dados['modelo'],
+                   carregar_spacy)
+
+    def _dividir_pedaco(self, pedaco: str, especiais: bool = True) -> tuple:
+        # Porta do algoritmo de `Tokenizer.explain` do spaCy para um trecho
+        # sem espaços
+        especiais = self._especiais if especiais else {}
+        prefixo, sufixo = self._prefixo, self._sufixo
+        tokens, sufixos = [], []
+        while pedaco:
+            if pedaco in especiais:
+                tokens.extend(especiais[pedaco])
+                break
+            while ((prefixo is not None and prefixo.search(pedaco))
+                   or (sufixo is not None and sufixo.search(pedaco))):
+                if self._token is not None and self._token.match(pedaco):
+                    tokens.append(pedaco)
+                    pedaco = ''
+                    break
+                if pedaco in especiais:
+                    tokens.extend(especiais[pedaco])
+                    pedaco = ''
+                    break
+                encontrado = prefixo.search(pedaco) if prefixo is not None else None
+                if encontrado:
+                    fim = encontrado.end()
+                    tokens.append(pedaco[:fim])
+                    pedaco = pedaco[fim:]
+                    if pedaco in especiais:
+                        continue
+                encontrado = sufixo.search(pedaco) if sufixo is not None else None
+                if encontrado:
+                    inicio = encontrado.start()
+                    sufixos.append(pedaco[inicio:])
+                    pedaco = pedaco[:inicio]
+            if not pedaco:
+                break
+            if ((self._token is not None and self._token.match(pedaco))
+                    or (self._url is not None and self._url.match(pedaco))):
+                tokens.append(pedaco)
+            elif pedaco in especiais:
+                tokens.extend(especiais[pedaco])
+            elif self._infixo is not None and self._infixo.search(pedaco):
+                deslocamento = 0
+                for encontrado in self._infixo.finditer(pedaco):
+                    if deslocamento == 0 and encontrado.start() == 0:
+                        continue
+                    tokens.append(pedaco[deslocamento:encontrado.start()])
+                    tokens.append(pedaco[encontrado.start():encontrado.end()])
+                    deslocamento = encontrado.end()
+                if pedaco[deslocamento:]:
+                    tokens.append(pedaco[deslocamento:])
+            else:
+                tokens.append(pedaco)
+            break
+        tokens.extend(reversed(sufixos))
+        tokens = tuple(token for token in tokens if token)
+        if especiais and self._max_composto and len(tokens) > 1:
+            tokens = self._juntar_especiais(tokens)
+        return tokens
+
+    def _juntar_especiais(self, tokens: tuple) -> tuple:
+        # Substitui as sequências de tokens que formam um caso especial,
+        # preferindo a mais longa a partir de cada posição
+        resultado = []
+        i = 0
+        while i < len(tokens):
+            for tamanho in range(min(self._max_composto, len(tokens) - i), 1, -1):
+                subtokens = self._compostos.get(tokens[i:i + tamanho])
+                if subtokens is not None:
+                    resultado.extend(subtokens)
+                    i += tamanho
+                    break
+            else:
+                resultado.append(tokens[i])
+                i += 1
+        return tuple(resultado)
+
+    def tokenizar(self, texto: str) -> list:
+        """
+        Divide o texto nos mesmos tokens do tokenizador do spaCy (sem os
+        tokens de espaço).
+
+        Args:
+            texto (str): O texto.
+
+        Returns:
+            list: Os tokens.
+        """
+        tokens = []
+        for pedaco in texto.split():
+            tokens.extend(self._dividir(pedaco))
+        return tokens
+
+    def lema(self, token: str) -> str:
+        """
+        Args:
+            token (str): Um token (ver `tokenizar`).
+
+        Returns:
+            str: O lema da tabela; fora dela, o lema do spaCy (com
+            `carregar_spacy`) ou o próprio token.
+        """
+        lema = self.lemas.get(token)
+        if lema is not None:
+            return lema
+        if self.carregar_spacy is None:
+            with self._lock:
+                self.desconhecidas += 1
+            return token
+        return self._lema_spacy(token)
+
+    def _lematizar_spacy(self, token: str) -> str:
+        with self._lock:
+            self.desconhecidas += 1
+        doc = self.carregar_spacy()(token)
+        return doc[0].lemma_ if len(doc) == 1 else token
+
+    def limpar(self, titulo: str, lemma: bool = True) -> str:
+        """
+        Processa um título como `funcoes.limpar_titulo`: minúsculas, sem
+        stop words e pontuação, opcionalmente lematizado.
+
+        Args:
+            titulo (str): O título a ser processado.
+            lemma (bool, optional): Se True, utiliza os lemas das palavras. O
+                padrão é True.
+
+        Returns:
+            str: O título processado.
+        """
+        tokens = [token for token in self.tokenizar(titulo.lower())
+                  if token.lower() not in self.stop_words and not _pontuacao(token)]
+        if lemma:
+            tokens = [self.lema(token) for token in tokens]
+        return ' '.join(tokens)
+
+    def limpar_lote(self, titulos: list, lemma: bool = True) -> list:
+        """
+        Processa vários títulos como em `limpar`.
+
+        Args:
+            titulos (list): Os títulos a serem processados.
+            lemma (bool, optional): Se True, utiliza os lemas das palavras.
+
+        Returns:
+            list: Os títulos processados, na mesma ordem.
+        """
+        return [self.limpar(titulo, lemma) for titulo in titulos]
+
+
+def carregar_tabela(modelo: str = MODELO_SPACY, caminho: Path = CAMINHO_LEMATIZADOR,
+                    carregar_spacy=None) -> Lematizador:
+    """
+    Abre a tabela gerada para `modelo`, se existir.
+
+    Args:
+        modelo (str, optional): Nome do modelo spaCy configurado.
+        caminho (Path, optional): O arquivo da tabela.
+        carregar_spacy (callable, optional): Ver `Lematizador.carregar`.
+
+    Returns:
+        Lematizador: O lematizador, ou None se não houver tabela válida
+        gerada para o modelo.
+    """
+    try:
+        lematizador = Lematizador.carregar(caminho, carregar_spacy)
+    except (OSError, ValueError, KeyError):
+        return None
+    return lematizador if lematizador.modelo == modelo else None
+
+
+def carregar_processador(carregar_spacy, modelo: str = MODELO_SPACY,
+                         caminho: Path = CAMINHO_LEMATIZADOR, modo: str = LEMATIZADOR,
+                         spacy_desconhecidas: bool = LEMATIZADOR_SPACY_DESCONHECIDAS):
+    """
+    Escolhe o processador das consultas da busca: a tabela gerada para
+    `modelo` no modo 'tabela' ou, sem ela (ou no modo 'spacy'), o modelo
+    spaCy.
+
+    Args:
+        carregar_spacy (callable): Função sem argumentos que devolve o
+            modelo spaCy; só é chamada se o modelo for necessário.
+        modelo (str, optional): Nome do modelo spaCy configurado.
+        caminho (Path, optional): O arquivo da tabela.
+        modo (str, optional): 'tabela' ou 'spacy' (PEDRO_LEMATIZADOR).
+        spacy_desconhecidas (bool, optional): Lematiza pelo spaCy os tokens
+            fora da tabela (PEDRO_LEMATIZADOR_SPACY).
+
+    Returns:
+        Lematizador | spacy.language.Language: O processador, aceito por
+        `funcoes.limpar_titulo` e `funcoes.limpar_titulos`.
+    """
+    if modo == 'tabela':
+        lematizador = carregar_tabela(modelo, caminho,
+                                      carregar_spacy if spacy_desconhecidas else None)
+        if lematizador is not None:
+            return lematizador
+    return carregar_spacy()
+
+
+def verificar(lematizador: Lematizador, modelo_spacy, titulos: list,
+              exemplos: int = 10) -> dict:
+    """
+    Compara o lematizador com o caminho do spaCy (`funcoes.limpar_titulo`)
+    título a título: tokens (sem espaços) e título processado.
+
+    Args:
+        lematizador (Lematizador): O lematizador avaliado.
+        modelo_spacy (spacy.language.Language): O modelo de referência.
+        titulos (list): Os títulos comparados.
+        exemplos (int, optional): Quantidade de divergências guardadas.
+
+    Returns:
+        dict: Títulos comparados, proporção com os mesmos tokens e com o
+        mesmo título processado, tempo médio por título em cada caminho
+        (ms) e exemplos de divergências.
+    """
+    textos = [str(titulo).lower() for titulo in titulos]
+    inicio = time.perf_counter()
+    docs = [modelo_spacy(texto) for texto in textos]
+    ms_spacy = (time.perf_counter() - inicio) * 1000
+    inicio = time.perf_counter()
+    limpos = [lematizador.limpar(texto) for texto in textos]
+    ms_tabela = (time.perf_counter() - inicio) * 1000
+
+    mesmos_tokens = mesmos_titulos = 0
+    divergencias = []
+    for texto, doc, limpo in zip(textos, docs, limpos):
+        mesmos_tokens += [t.text for t in doc if not t.is_space] == lematizador.tokenizar(texto)
+        # `split` ignora os tokens de espaço que o spaCy mantém no título
+        referencia = ' '.join(token.lemma_ for token in doc
+                              if not token.is_stop and not token.is_punct).split()
+        if referencia == limpo.split():
+            mesmos_titulos += 1
+        elif len(divergencias) < exemplos:
+            divergencias.append((texto, ' '.join(referencia), limpo))
+
+    n = max(len(textos), 1)
+    return {'titulos': len(textos), 'tokens': mesmos_tokens / n,
+            'titulos_limpos': mesmos_titulos / n, 'ms_spacy': ms_spacy / n,
+            'ms_tabela': ms_tabela / n, 'divergencias': divergencias}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Gera a tabela de lemas e stop words usada na busca sem o spaCy '
+                    'e compara o resultado com o spaCy.'
+    )
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    construir = comandos.add_parser('construir', help='Gera a tabela a partir do modelo '
+                                                      'spaCy configurado')
+    construir.add_argument('--palavras', type=Path,
+                           help='Arquivo com palavras gerais (uma por linha); o padrão '
+                                'são as palavras da tabela de vetores do modelo')
+    construir.add_argument('--max-palavras', type=int, default=50000)
+    construir.add_argument('--saida', type=Path, default=CAMINHO_LEMATIZADOR)
+    verificacao = comandos.add_parser('verificar', help='Compara a tabela com o spaCy '
+                                                        'nos títulos da base')
+    verificacao.add_argument('--tabela', type=Path, default=CAMINHO_LEMATIZADOR)
+    verificacao.add_argument('--amostra', type=int, default=None,
+                             help='Quantidade de títulos comparados (padrão: todos)')
+    verificacao.add_argument('--minimo', type=float, default=0.99,
+                             help='Proporção mínima de títulos iguais; abaixo dela o '
+                                  'comando termina com erro')
+    args = parser.parse_args()
+
+    import spacy
+
+    from armazem_artigos import ArmazemArtigos
+
+    nlp = spacy.load(MODELO_SPACY, exclude=COMPONENTES_DESATIVADOS)
+    titulos = ArmazemArtigos().ler(['titulo'])['titulo']
+    if args.comando == 'construir':
+        if args.palavras is not None:
+            palavras = args.palavras.read_text(encoding='utf-8').split()[:args.max_palavras]
+        else:
+            palavras = palavras_vetores(nlp, args.max_palavras)
+        lematizador = Lematizador.construir(nlp, list(titulos), palavras, MODELO_SPACY)
+        lematizador.salvar(args.saida)
+        print(f'{lematizador.n_lemas} lemas e {len(lematizador.stop_words)} stop words '
+              f'gravados em {args.saida}')
+    else:
+        lematizador = Lematizador.carregar(args.tabela)
+        if lematizador.modelo != MODELO_SPACY:
+            parser.error(f'tabela gerada com {lematizador.modelo}, não {MODELO_SPACY}')
+        if args.amostra is not None:
+            titulos = titulos.sample(min(args.amostra, len(titulos)), random_state=0)
+        resultado = verificar(lematizador, nlp, list(titulos))
+        print(f'{resultado["titulos"]} títulos: tokens iguais em {resultado["tokens"]:.2%}, '
+              f'títulos processados iguais em {resultado["titulos_limpos"]:.2%}')
+        print(f'Tempo por título: spaCy {resultado["ms_spacy"]:.3f} ms, '
+              f'tabela {resultado["ms_tabela"]:.3f} ms')
+        for texto, referencia, limpo in resultado['divergencias']:
+            print(f'\n  {texto}\n  spaCy:  {referencia}\n  tabela: {limpo}')
+        raise SystemExit(0 if resultado['titulos_limpos'] >= args.minimo else 1)
@@ -0,0 +1,208 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from scipy import sparse
+
+from agregacoes import Filtro
+from deduplicacao import ler_sem_duplicatas, repetidos, uma_por_grupo
+
+# Termos presentes em quase todos os títulos de ensaios clínicos, que não
+# indicam o tema estudado
+TERMOS_IGNORADOS = frozenset({
+    'trial', 'randomized', 'randomised', 'randomize', 'control', 'controlled',
+    'clinical', 'study', 'effect', 'patient', 'therapy', 'treatment', 'versus',
+    'pilot', 'comparison', 'consumer', 'summary', 'blind', 'pain', 'base',
+    'non', 'simplify', 'character', 'chinese', 'observation',
+})
+
+# Termos que nomeiam a própria condição
+TERMOS_CONDICAO = {
+    'cervicalgia': frozenset({'neck', 'cervical'}),
+    'lombalgia': frozenset({'low', 'back', 'lumbar'}),
+    'dor_ombro': frozenset({'shoulder'}),
+    'oa_joelho': frozenset({'knee', 'osteoarthritis'}),
+    'dor_tornozelo': frozenset({'ankle'}),
+    'entorse_tornozelo': frozenset({'ankle', 'sprain'}),
+}
+
+# Termos exibidos por década e no total
+N_TERMOS_DECADA = 10
+N_TERMOS_FREQUENTES = 20
+
+
+def termos_ignorados(condicao: str = None) -> frozenset:
+    """
+    Termos desconsiderados na contagem dos temas de uma condição.
+
+    Args:
+        condicao (str, optional): Chave da condição. Se None, apenas os
+            termos comuns a todas as condições.
+
+    Returns:
+        frozenset: Os termos ignorados.
+    """
+    return TERMOS_IGNORADOS | TERMOS_CONDICAO.get(condicao, frozenset())
+
+
+class MatrizTermos:
+    """
+    Ocorrências dos termos nos títulos processados (titulo_limpo) de todos
+    os ensaios clínicos, em uma matriz esparsa (ensaios x termos) montada
+    uma vez. As contagens por década de qualquer recorte (condições, anos
+    e regiões) saem de um único produto esparso: uma matriz de agrupamento
+    (décadas x ensaios), com 1 na década de cada ensaio selecionado,
+    multiplicada pela matriz dos termos. Um ensaio listado em várias
+    condições (mesmo `grupo`, ver `deduplicacao`) conta uma vez.
+    """
+
+    def __init__(self, ensaios: pd.DataFrame):
+        """
+        Args:
+            ensaios (pd.DataFrame): Colunas ano, titulo_limpo, condicao,
+                regiao e, opcionalmente, grupo.
+        """
+        termos = ensaios['titulo_limpo'].fillna('').str.split().explode().dropna()
+        linhas = np.repeat(np.arange(len(ensaios)),
+                           ensaios['titulo_limpo'].fillna('').str.split().str.len().to_numpy())
+        colunas, vocabulario = pd.factorize(termos.to_numpy(), sort=True)
+        # Números isolados (doses, anos) não são temas
+        numeros = np.array([termo.isdigit() for termo in vocabulario], dtype=bool)
+        matriz = sparse.csr_matrix((np.ones(len(colunas), dtype=np.int32), (linhas, colunas)),
+                                   shape=(len(ensaios), len(vocabulario)))
+        self.matriz = matriz[:, np.flatnonzero(~numeros)].tocsr()
+        self.termos = np.asarray(vocabulario, dtype=object)[~numeros]
+        self.ano = ensaios['ano'].to_numpy(dtype=np.int64)
+        self.condicao = ensaios['condicao'].to_numpy(dtype=object)
+        self.regiao = ensaios['regiao'].to_numpy(dtype=object)
+        self.grupo = ensaios['grupo'].to_numpy() if 'grupo' in ensaios else None
+        self.repetidas = repetidos(self.grupo) if self.grupo is not None else None
+
+    def contar(self, condicoes: tuple = None, filtro: Filtro = Filtro(),
+               ignorados: frozenset = TERMOS_IGNORADOS) -> pd.DataFrame:
+        """
+        Conta os termos por década dos ensaios selecionados.
+
+        Args:
+            condicoes (tuple, optional): Chaves das condições. Se None, todas.
+            filtro (Filtro, optional): Recorte de anos e regiões.
+            ignorados (frozenset, optional): Termos desconsiderados.
+
+        Returns:
+            pd.DataFrame: Uma linha por década (índice `decada`) e uma coluna
+            por termo presente no recorte.
+        """
+        mascara = np.ones(len(self.ano), dtype=bool)
+        if condicoes is not None:
+            mascara &= np.isin(self.condicao, condicoes)
+        if filtro.ano_min is not None:
+            mascara &= self.ano >= filtro.ano_min
+        if filtro.ano_max is not None:
+            mascara &= self.ano <= filtro.ano_max
+        if filtro.regioes is not None:
+            mascara &= np.isin(self.regiao, filtro.regioes)
+        if self.grupo is not None:
+            mascara = uma_por_grupo(mascara, self.grupo, self.repetidas)
+        linhas = np.flatnonzero(mascara)
+        decadas, grupos = np.unique(self.ano[linhas] // 10 * 10, return_inverse=True)
+        agrupamento = sparse.csr_matrix(
+            (np.ones(len(linhas), dtype=np.int32), (grupos, linhas)),
+            shape=(len(decadas), len(self.ano))
+        )
+        contagens = (agrupamento @ self.matriz).toarray()
+        colunas = contagens.any(axis=0) & ~np.isin(self.termos, list(ignorados))
+        return pd.DataFrame(contagens[:, colunas], columns=self.termos[colunas],
+                            index=pd.Index(decadas, name='decada'))
+
+
+@lru_cache(maxsize=1)
+def matriz_termos(geracao: int = 0) -> MatrizTermos:
+    """
+    Matriz dos termos da base, sem os registros repetidos (ver
+    `MatrizTermos`).
+
+    Args:
+        geracao (int, optional): Geração dos dados. Usada apenas como
+            chave do cache: uma geração nova força a releitura.
+
+    Returns:
+        MatrizTermos: A matriz dos termos.
+    """
+    return MatrizTermos(ler_sem_duplicatas(['ano', 'titulo_limpo', 'condicao', 'regiao']))
+
+
+@lru_cache(maxsize=64)
+def termos_decadas(condicoes: tuple = None, filtro: Filtro = Filtro(),
+                   geracao: int = 0) -> pd.DataFrame:
+    """
+    Contagens dos termos por década de um recorte, sem os termos comuns a
+    todos os ensaios nem os que nomeiam as condições selecionadas.
+
+    Args:
+        condicoes (tuple, optional): Chaves das condições. Se None, todas.
+        filtro (Filtro, optional): Recorte de anos e regiões.
+        geracao (int, optional): Geração dos dados (ver `matriz_termos`).
+
+    Returns:
+        pd.DataFrame: Saída de `MatrizTermos.contar`.
+    """
+    ignorados = TERMOS_IGNORADOS.union(*(termos_ignorados(condicao)
+                                         for condicao in condicoes or ()))
+    return matriz_termos(geracao).contar(condicoes, filtro, ignorados)
+
+
+def _maiores(contagens: pd.Series, n_termos: int) -> pd.DataFrame:
+    # Empates em ordem alfabética, para que o resultado não dependa da
+    # ordem das colunas
+    maiores = contagens[contagens > 0].rename_axis('termo').reset_index(name='quantidade')
+    maiores = maiores.sort_values(['quantidade', 'termo'], ascending=[False, True])
+    return maiores.head(n_termos).reset_index(drop=True)
+
+
+@lru_cache(maxsize=64)
+def termos_frequentes(condicoes: tuple = None, filtro: Filtro = Filtro(), geracao: int = 0,
+                      n_termos: int = N_TERMOS_FREQUENTES) -> pd.DataFrame:
+    """
+    Termos mais frequentes nos títulos de um recorte (entrada de
+    `termos_frequentes` em `funcoes.py`).
+
+    Args:
+        condicoes (tuple, optional): Chaves das condições. Se None, todas.
+        filtro (Filtro, optional): Recorte de anos e regiões.
+        geracao (int, optional): Geração dos dados (ver `matriz_termos`).
+        n_termos (int, optional): Quantidade de termos.
+
+    Returns:
+        pd.DataFrame: Colunas termo e quantidade, em ordem decrescente.
+    """
+    return _maiores(termos_decadas(condicoes, filtro, geracao).sum(), n_termos)
+
+
+@lru_cache(maxsize=64)
+def termos_por_decada(condicoes: tuple = None, filtro: Filtro = Filtro(), geracao: int = 0,
+                      n_termos: int = N_TERMOS_DECADA) -> pd.DataFrame:
+    """
+    Termos mais frequentes de cada década de um recorte (entrada de
+    `termos_decada` em `funcoes.py`).
+
+    Args:
+        condicoes (tuple, optional): Chaves das condições. Se None, todas.
+        filtro (Filtro, optional): Recorte de anos e regiões.
+        geracao (int, optional): Geração dos dados (ver `matriz_termos`).
+        n_termos (int, optional): Quantidade de termos por década.
+
+    Returns:
+        pd.DataFrame: Colunas decada, posicao (1 para o mais frequente),
+        termo e quantidade.
+    """
+    contagens = termos_decadas(condicoes, filtro, geracao)
+    partes = []
+    for decada, linha in contagens.iterrows():
+        maiores = _maiores(linha, n_termos)
+        maiores.insert(0, 'posicao', np.arange(1, len(maiores) + 1))
+        maiores.insert(0, 'decada', decada)
+        partes.append(maiores)
+    if not partes:
+        return pd.DataFrame(columns=['decada', 'posicao', 'termo', 'quantidade'])
+    return pd.concat(partes, ignore_index=True)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from armazem_artigos import CAMINHO_BASE, CHAVE_REGISTRO, ArmazemArtigos, atualizar_indice
+from indice_busca import IndiceTfidf
+
+N_BASE = 300
+N_NOVOS = 60
+N_SUBSTITUIDOS = 12
+
+
+@pytest.fixture
+def armazem(tmp_path):
+    # Amostra da base real: títulos limpos com o vocabulário de verdade
+    registros = pd.read_feather(CAMINHO_BASE).iloc[:N_BASE + 2 * N_NOVOS]
+    assert not registros.duplicated(CHAVE_REGISTRO).any()
+    base = tmp_path / 'df_completo.feather'
+    registros.iloc[:N_BASE].reset_index(drop=True).to_feather(base)
+    return ArmazemArtigos(base, tmp_path / 'incrementos'), registros
+
+
+def _todos_os_titulos(armazem: ArmazemArtigos) -> list:
+    return list(armazem.ler(['titulo_limpo'], vigentes=False)['titulo_limpo'])
+
+
+def _iguais(indice: IndiceTfidf, reconstruido: IndiceTfidf, consultas: list):
+    # Os termos novos vão para o fim do vocabulário do índice incremental:
+    # as colunas são alinhadas pelo termo antes da comparação
+    termos = [termo.decode('utf-8') for termo in reconstruido.vocabulario.termos]
+    colunas = indice.vocabulario.colunas_termos(termos)
+    colunas = colunas[np.argsort(reconstruido.vocabulario.colunas)]
+    assert len(indice.vocabulario) == len(reconstruido.vocabulario) and (colunas >= 0).all()
+    for nome in ['contagens', 'matriz']:
+        diferenca = getattr(indice, nome)[:, colunas] - getattr(reconstruido, nome)
+        assert abs(diferenca).max() == 0.0
+    np.testing.assert_array_equal(indice.idf[colunas], reconstruido.idf)
+    # As similaridades só diferem pelo arredondamento da soma em float32,
+    # feita em outra ordem de colunas
+    titulos = consultas + termos[::50]
+    np.testing.assert_allclose(indice.matriz @ indice.vetorizar(titulos).T.toarray(),
+                               reconstruido.matriz @ reconstruido.vetorizar(titulos).T.toarray(),
+                               rtol=0, atol=1e-6)
+
+
+def test_acrescimos_iguais_a_reconstrucao(armazem, tmp_path):
+    armazem, registros = armazem
+    caminho = tmp_path / 'indice'
+    consultas = ['low back pain exercise', 'acupuncture neck', 'termo inexistente']
+
+    indice = atualizar_indice(armazem, caminho)
+    assert indice.n_documentos == N_BASE
+
+    # Primeiro lote: só registros novos
+    armazem.adicionar(registros.iloc[N_BASE:N_BASE + N_NOVOS])
+    indice = atualizar_indice(armazem, caminho)
+    assert indice.incrementos
+
+    # Segundo lote: registros novos e registros que substituem outros da base
+    # e do primeiro lote (mesma chave, nota atualizada)
+    substitutos = pd.concat([registros.iloc[:N_SUBSTITUIDOS // 2],
+                             registros.iloc[N_BASE:N_BASE + N_SUBSTITUIDOS // 2]])
+    substitutos = substitutos.assign(**{'escala pedro': 10.0})
+    armazem.adicionar(pd.concat([registros.iloc[N_BASE + N_NOVOS:], substitutos]))
+    indice = atualizar_indice(armazem, caminho)
+    n_linhas = N_BASE + 2 * N_NOVOS + N_SUBSTITUIDOS
+    assert indice.n_documentos == armazem.n_linhas() == n_linhas
+    assert indice.geracao == armazem.geracao == 2
+
+    reconstruido = IndiceTfidf.construir(_todos_os_titulos(armazem), 1, 1)
+    _iguais(indice, reconstruido, consultas)
+
+    # O índice salvo em disco (base + incrementos) é o mesmo
+    carregado = IndiceTfidf.carregar(caminho)
+    assert carregado.geracao == 2 and carregado.n_documentos == n_linhas
+    _iguais(carregado, reconstruido, consultas)
+    assert atualizar_indice(armazem, caminho).incrementos == carregado.incrementos
+
+    # Os substituídos continuam no índice, mas não são lidos
+    vigentes = armazem.ler()
+    assert len(vigentes) == n_linhas - N_SUBSTITUIDOS
+    assert not vigentes.duplicated(CHAVE_REGISTRO).any()
+    assert (vigentes.loc[vigentes.index >= N_BASE + 2 * N_NOVOS, 'escala pedro'] == 10.0).all()
+
+    # A compactação remove os substituídos e força a reconstrução do índice
+    assert armazem.compactar() == 3
+    assert armazem.n_linhas() == len(armazem.ler()) == n_linhas - N_SUBSTITUIDOS
+    indice = atualizar_indice(armazem, caminho)
+    assert indice.n_documentos == n_linhas - N_SUBSTITUIDOS
+    assert indice.geracao == 3 and not indice.incrementos
+    _iguais(indice, IndiceTfidf.construir(_todos_os_titulos(armazem), 1, 1), consultas)
@@ -0,0 +1,99 @@
+import pytest
+
+import cache_consultas
+from cache_consultas import CacheConsultas, ChaveConsulta
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(cache_consultas.time, 'monotonic', relogio)
+    return relogio
+
+
+def _chave(titulo: str) -> ChaveConsulta:
+    return ChaveConsulta(titulo, 'tfidf', 10)
+
+
+def _guardar(cache: CacheConsultas, titulo: str, geracao: int = 1):
+    # Como na busca: consulta, calcula e guarda
+    assert cache.obter(_chave(titulo), geracao) is None
+    cache.guardar(_chave(titulo), [(0, 1.0)], geracao)
+
+
+def test_descarta_o_usado_ha_mais_tempo(relogio):
+    cache = CacheConsultas(max_itens=2)
+    _guardar(cache, 'a')
+    _guardar(cache, 'b')
+    # Usar `a` o torna o mais recente: `b` é o descartado
+    assert cache.obter(_chave('a'), 1) == ((0, 1.0),)
+    _guardar(cache, 'c')
+
+    assert len(cache) == 2
+    assert cache.obter(_chave('b'), 1) is None
+    assert cache.obter(_chave('a'), 1) is not None
+    assert cache.obter(_chave('c'), 1) is not None
+    estatisticas = cache.estatisticas()
+    assert estatisticas['descartes'] == 1
+    assert (estatisticas['acertos'], estatisticas['falhas']) == (3, 4)
+
+
+def test_expira_apos_o_ttl(relogio):
+    cache = CacheConsultas(ttl_segundos=60)
+    _guardar(cache, 'a')
+    relogio.agora = 60
+    assert cache.obter(_chave('a'), 1) is not None
+    relogio.agora = 60.5
+    # Expirado em relação ao momento em que foi guardado, não ao último uso
+    assert cache.obter(_chave('a'), 1) is None
+    assert len(cache) == 0
+    assert cache.estatisticas()['expirados'] == 1
+
+
+def test_nova_geracao_esvazia_o_cache(relogio):
+    cache = CacheConsultas()
+    _guardar(cache, 'a')
+    _guardar(cache, 'b')
+
+    assert cache.obter(_chave('a'), 2) is None
+    assert len(cache) == 0
+    # Um cache já vazio não conta outra invalidação
+    assert cache.obter(_chave('a'), 3) is None
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['invalidacoes'], estatisticas['geracao']) == (1, 3)
+
+
+def test_resultado_de_outra_geracao_nao_e_guardado(relogio):
+    cache = CacheConsultas()
+    _guardar(cache, 'a', geracao=2)
+    # Busca iniciada na geração 1, terminada depois que outra sessão já
+    # consultou na geração 2: nem esvazia o cache nem é guardada
+    cache.guardar(_chave('b'), [(1, 0.5)], 1)
+    assert cache.geracao == 2 and len(cache) == 1
+    assert cache.obter(_chave('a'), 2) is not None
+    # Tampouco volta a valer se a geração 1 for consultada de novo
+    assert cache.obter(_chave('b'), 1) is None
+    assert cache.estatisticas()['invalidacoes'] == 1
+
+
+def test_normalizar_reutiliza_o_texto_processado():
+    cache = CacheConsultas(max_itens=1)
+    processados = []
+
+    def limpar(texto):
+        processados.append(texto)
+        return texto.upper()
+
+    assert cache.normalizar('  Neck   Pain ', limpar) == 'NECK PAIN'
+    assert cache.normalizar('neck pain', limpar) == 'NECK PAIN'
+    assert cache.normalizar('back pain', limpar) == 'BACK PAIN'
+    assert cache.normalizar('neck pain', limpar) == 'NECK PAIN'
+    assert processados == ['neck pain', 'back pain', 'neck pain']
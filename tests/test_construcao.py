@@ -0,0 +1,46 @@
+import json
+
+from construcao import Tarefa, construir
+
+
+def escrever(saida, texto: str):
+    saida.write_text(texto, encoding='utf-8')
+
+
+def falhar(saida):
+    raise ValueError('entrada inválida')
+
+
+def escrever_b(saida):
+    escrever(saida, 'b')
+
+
+def _tarefas(caminho, funcao_b=falhar) -> list:
+    # a -> e; b -> c -> d
+    return [
+        Tarefa('a', escrever, (caminho / 'a',), parametros={'saida': caminho / 'a', 'texto': 'a'}),
+        Tarefa('b', funcao_b, (caminho / 'b',), parametros={'saida': caminho / 'b'}),
+        Tarefa('c', escrever, (caminho / 'c',), parametros={'saida': caminho / 'c', 'texto': 'c'},
+               dependencias=('b',)),
+        Tarefa('d', escrever, (caminho / 'd',), parametros={'saida': caminho / 'd', 'texto': 'd'},
+               dependencias=('c',)),
+        Tarefa('e', escrever, (caminho / 'e',), parametros={'saida': caminho / 'e', 'texto': 'e'},
+               dependencias=('a',)),
+    ]
+
+
+def test_falha_pula_so_as_dependentes(tmp_path):
+    manifesto = tmp_path / 'construcao.json'
+    resultado = construir(_tarefas(tmp_path), processos=1, manifesto=manifesto)
+
+    assert sorted(resultado.executadas) == ['a', 'e']
+    assert resultado.falhas == {'b': 'ValueError: entrada inválida'}
+    assert resultado.puladas == ['c', 'd']
+    assert (tmp_path / 'e').exists() and not (tmp_path / 'c').exists()
+    # Só as tarefas concluídas têm a chave gravada
+    assert sorted(json.loads(manifesto.read_text(encoding='utf-8'))) == ['a', 'e']
+
+    # Corrigida a falha, só ela e as dependentes são refeitas
+    resultado = construir(_tarefas(tmp_path, escrever_b), processos=1, manifesto=manifesto)
+    assert resultado.executadas == ['b', 'c', 'd']
+    assert not resultado.falhas and not resultado.puladas
@@ -0,0 +1,170 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from deduplicacao import (
+    TAMANHO_SHINGLE, Duplicatas, assinaturas_minhash, jaccard, pares_candidatos, shingles
+)
+from indice_busca import normalizar_titulo
+
+BASE = [
+    'Acupuncture for chronic neck pain: a randomised controlled trial',
+    'Exercise therapy for chronic low back pain',
+    'Manual therapy and exercise for shoulder impingement syndrome',
+    'Balance training for the prevention of recurrent ankle sprains',
+    'Effects of a home exercise programme on knee osteoarthritis',
+    'Pilates versus general exercise for non-specific low back pain',
+]
+
+# Variações de cada título (pontuação, caixa, uma palavra trocada ou
+# acrescentada), mais títulos sem relação e um vazio
+TITULOS = BASE + [
+    'ACUPUNCTURE FOR CHRONIC NECK PAIN - A RANDOMISED CONTROLLED TRIAL',
+    'Acupuncture for chronic neck pain: a randomized controlled trial',
+    'Exercise therapy for chronic low-back pain.',
+    'Exercise therapy for subacute low back pain',
+    'Manual therapy and exercise for shoulder impingement syndrome [with consumer summary]',
+    'Balance training for prevention of recurrent ankle sprains',
+    'Effects of a home exercise program on knee osteoarthritis',
+    'Pilates versus general exercise for chronic non-specific low back pain',
+    'Hydrotherapy for fibromyalgia',
+    'Cervical traction for radiculopathy',
+    '',
+]
+
+
+def _jaccard_conjuntos(a: str, b: str) -> float:
+    # Referência independente: conjuntos de substrings de bytes do título
+    # normalizado, com os mesmos complementos de títulos curtos
+    def conjunto(titulo):
+        codificado = normalizar_titulo(titulo).encode('utf-8')
+        if not codificado:
+            return set()
+        codificado = codificado.ljust(TAMANHO_SHINGLE)
+        return {codificado[i:i + TAMANHO_SHINGLE]
+                for i in range(len(codificado) - TAMANHO_SHINGLE + 1)}
+
+    a, b = conjunto(a), conjunto(b)
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def _registros(linhas: list, posicoes: list = None) -> pd.DataFrame:
+    return pd.DataFrame(linhas, columns=['titulo', 'ano', 'condicao', 'escala pedro'],
+                        index=posicoes)
+
+
+def test_jaccard_igual_a_todos_os_pares():
+    valores, inicios = shingles(TITULOS)
+    todos = np.array(list(itertools.combinations(range(len(TITULOS)), 2)))
+    esperado = np.array([_jaccard_conjuntos(TITULOS[i], TITULOS[j]) for i, j in todos])
+    np.testing.assert_allclose(jaccard(valores, inicios, todos), esperado)
+
+
+def _componentes(n: int, pares) -> list:
+    rotulos = list(range(n))
+
+    def raiz(i):
+        while rotulos[i] != i:
+            i = rotulos[i]
+        return i
+
+    for i, j in pares:
+        rotulos[raiz(j)] = raiz(i)
+    grupos = {}
+    for i in range(n):
+        grupos.setdefault(raiz(i), []).append(i)
+    return sorted(grupos.values())
+
+
+def test_candidatos_confirmados_iguais_a_todos_os_pares():
+    limiar = 0.8
+    valores, inicios = shingles(TITULOS)
+    pares = pares_candidatos(assinaturas_minhash(valores, inicios))
+
+    assert (pares[:, 0] < pares[:, 1]).all()
+    assert len(np.unique(pares, axis=0)) == len(pares)
+    # O título vazio nunca é candidato
+    assert TITULOS.index('') not in pares
+
+    # Os grupos formados pelos candidatos confirmados pela similaridade
+    # exata são os mesmos da comparação de todos os pares
+    confirmados = pares[jaccard(valores, inicios, pares) >= limiar]
+    todos = [(i, j) for i, j in itertools.combinations(range(len(TITULOS)), 2)
+             if _jaccard_conjuntos(TITULOS[i], TITULOS[j]) >= limiar]
+    esperado = _componentes(len(TITULOS), todos)
+    assert _componentes(len(TITULOS), confirmados.tolist()) == esperado
+    # Acupuntura (3 títulos), dor lombar, equilíbrio e joelho
+    assert sorted(len(grupo) for grupo in esperado if len(grupo) > 1) == [2, 2, 2, 3]
+
+
+def test_grupos_do_mesmo_ano():
+    titulo = BASE[0]
+    registros = _registros([
+        (titulo, 2001, 'cervicalgia', 8.0),
+        # Jaccard 0,98 e 1,0 com o primeiro
+        (titulo.replace('trial', 'trials'), 2001, 'cervicalgia', 8.0),
+        (titulo.upper().replace(':', ' -'), 2001, 'cervicalgia', 8.0),
+        # Jaccard 0,84: abaixo do limiar padrão (0,9)
+        (titulo.replace('randomised', 'randomized'), 2001, 'cervicalgia', 8.0),
+        (titulo, 2009, 'cervicalgia', 6.0),
+        (BASE[1], 2001, 'lombalgia', 5.0),
+    ])
+    duplicatas = Duplicatas.construir(registros)
+
+    assert duplicatas.grupo[0] == duplicatas.grupo[1] == duplicatas.grupo[2]
+    assert duplicatas.grupo[3] != duplicatas.grupo[0]
+    # O mesmo título em outro ano é outro ensaio
+    assert duplicatas.grupo[4] != duplicatas.grupo[0]
+    assert len(set(duplicatas.grupo)) == 4
+    assert duplicatas.resumo()['maior_grupo'] == 3
+
+
+def test_canonico_prefere_registro_com_nota():
+    registros = _registros([
+        (BASE[2], 2015, 'dor_ombro', None),
+        (BASE[2] + '.', 2015, 'dor_ombro', 7.0),
+        (BASE[2], 2015, 'dor_ombro', 5.0),
+    ])
+    duplicatas = Duplicatas.construir(registros)
+
+    assert len(set(duplicatas.grupo)) == 1
+    assert duplicatas.canonico.tolist() == [False, True, False]
+
+    # Sem nota em nenhum, a primeira linha do grupo
+    sem_nota = registros.assign(**{'escala pedro': None})
+    assert Duplicatas.construir(sem_nota).canonico.tolist() == [True, False, False]
+
+
+def test_canonico_por_condicao():
+    registros = _registros([
+        (BASE[5], 2012, 'lombalgia', None),
+        (BASE[5], 2012, 'lombalgia', 6.0),
+        (BASE[5], 2012, 'cervicalgia', 6.0),
+        (BASE[5], 2012, 'cervicalgia', 6.0),
+        (BASE[3], 2012, 'entorse_tornozelo', 4.0),
+    ])
+    duplicatas = Duplicatas.construir(registros)
+
+    assert len(set(duplicatas.grupo[:4])) == 1
+    assert duplicatas.canonico.tolist() == [False, True, False, False, True]
+    # Um ensaio listado em duas condições conta uma vez em cada uma
+    assert duplicatas.canonico_condicao.tolist() == [False, True, True, False, True]
+    assert duplicatas.resumo()['repetidos_condicao'] == 2
+
+
+def test_posicoes_substituidas():
+    # Registros vigentes nas posições 0, 2 e 5 de uma base com 6 posições
+    registros = _registros([
+        (BASE[0], 2001, 'cervicalgia', 8.0),
+        (BASE[0], 2001, 'cervicalgia', 8.0),
+        (BASE[4], 2010, 'oa_joelho', 6.0),
+    ], posicoes=[0, 2, 5])
+    duplicatas = Duplicatas.construir(registros, n_documentos=6)
+
+    assert duplicatas.n_documentos == 6
+    assert duplicatas.grupo[[1, 3, 4]].tolist() == [-1, -1, -1]
+    assert duplicatas.grupo[0] == duplicatas.grupo[2] != duplicatas.grupo[5]
+    assert not duplicatas.canonico[[1, 3, 4]].any()
+    assert not duplicatas.canonico_condicao[[1, 3, 4]].any()
+    assert duplicatas.resumo()['registros'] == 3
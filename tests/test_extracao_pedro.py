@@ -0,0 +1,165 @@
+import csv
+import subprocess
+import sys
+import threading
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from cache_respostas import CacheRespostas, Checkpoint
+from extracao_pedro import ClientePedro
+
+RAIZ = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / 'fixtures' / 'pedro'
+
+PARAMETROS = {'abstract_with_title': 'acupuncture', 'perpage': 2}
+
+
+class _PaginasGravadas(SimpleHTTPRequestHandler):
+    """
+    Serve as páginas gravadas da PEDro: resultados por `page` e detalhes por
+    id. `substituicoes` troca o conteúdo de um arquivo (página alterada).
+    """
+
+    requisicoes = []
+    substituicoes = {}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.requisicoes.append(self.path)
+        if url.path == '/advanced-search/results':
+            pagina = parse_qs(url.query).get('page', ['1'])[0]
+            arquivo = FIXTURES / f'resultados_{pagina}.html'
+        elif url.path.startswith('/search-results/record-detail/'):
+            arquivo = FIXTURES / f'detalhe_{url.path.rsplit("/", 1)[-1]}.html'
+        else:
+            arquivo = None
+        if arquivo is not None and arquivo.name in self.substituicoes:
+            conteudo = self.substituicoes[arquivo.name]
+        elif arquivo is not None and arquivo.exists():
+            conteudo = arquivo.read_bytes()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    _PaginasGravadas.requisicoes = []
+    _PaginasGravadas.substituicoes = {}
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _PaginasGravadas)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _ler_csv(caminho: Path) -> dict:
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        return {registro['id']: registro for registro in csv.DictReader(arquivo)}
+
+
+def test_listar_artigos_segue_paginacao(servidor):
+    cliente = ClientePedro(servidor, trabalhadores=2, requisicoes_por_segundo=0)
+    artigos = cliente.listar_artigos(PARAMETROS)
+
+    assert [artigo.id for artigo in artigos] == ['31250', '28734', '45102']
+    assert artigos[0].titulo == 'Acupuncture for chronic neck pain: a randomised controlled trial'
+    assert artigos[2].url == f'{servidor}/search-results/record-detail/45102'
+    paginas = [caminho for caminho in _PaginasGravadas.requisicoes
+               if caminho.startswith('/advanced-search/results')]
+    assert len(paginas) == 2 and 'page=2' in paginas[1]
+
+
+def test_extrair_detalhes(servidor, tmp_path):
+    cliente = ClientePedro(servidor, trabalhadores=2, requisicoes_por_segundo=0)
+    saida = tmp_path / 'extracao.csv'
+    total = cliente.extrair(cliente.listar_artigos(PARAMETROS), saida, tamanho_lote=2)
+
+    assert total == 3
+    registros = _ler_csv(saida)
+    assert registros['31250']['revista'] == 'BMJ 2001 Jun 30;322(7302):1574-1578'
+    assert registros['31250']['tipo estudo'] == 'CLINICAL TRIAL'
+    assert registros['31250']['escala pedro'] == '8'
+    assert registros['31250']['ano'] == '2001'
+    # Nota fora de <td>, como no XPath alternativo do notebook
+    assert registros['28734']['escala pedro'] == '5'
+    assert registros['28734']['revista'] == 'Pain 2006 Nov;126(1-3):245-255'
+    # Revisões sistemáticas não têm nota
+    assert registros['45102']['tipo estudo'] == 'SYSTEMATIC REVIEW'
+    assert registros['45102']['escala pedro'] == ''
+
+
+def test_linha_de_comando(servidor, tmp_path):
+    saida = tmp_path / 'extracao.csv'
+    subprocess.run([sys.executable, str(RAIZ / 'extracao_pedro.py'), '--url-base', servidor,
+                    '--termo', 'acupuncture', '--por-pagina', '2', '--taxa', '0',
+                    '--saida', str(saida), '--cache', str(tmp_path / 'cache')],
+                   check=True, cwd=tmp_path, capture_output=True)
+
+    registros = _ler_csv(saida)
+    assert sorted(registros) == ['28734', '31250', '45102']
+    assert registros['31250']['escala pedro'] == '8'
+
+
+def test_atualizacao_periodica(servidor, tmp_path):
+    saida = tmp_path / 'extracao.csv'
+    checkpoint = Checkpoint(tmp_path / 'extracao.csv.concluidos')
+
+    def executar():
+        cache = CacheRespostas(tmp_path / 'cache', validade=0, validade_listagens=0)
+        cliente = ClientePedro(servidor, trabalhadores=2, requisicoes_por_segundo=0,
+                               cache=cache)
+        return cliente.extrair(cliente.listar_artigos(PARAMETROS), saida, 2, checkpoint)
+
+    assert executar() == 3
+    # Nada mudou: as páginas são revalidadas, mas nenhum registro é regravado
+    _PaginasGravadas.requisicoes = []
+    assert executar() == 0
+    assert sum('record-detail' in caminho for caminho in _PaginasGravadas.requisicoes) == 3
+
+    # Um artigo novo na listagem e uma nota corrigida em um já extraído
+    novo = (FIXTURES / 'resultados_2.html').read_text(encoding='utf-8').replace(
+        '</tbody>', '<tr><td><a class="left" href="/search-results/record-detail/51990">'
+                    'Acupuncture for patients with chronic neck pain (follow-up)</a></td></tr>'
+                    '</tbody>'
+    )
+    _PaginasGravadas.substituicoes = {
+        'resultados_2.html': novo.encode('utf-8'),
+        'detalhe_31250.html': (FIXTURES / 'detalhe_31250.html').read_bytes().replace(
+            b'8/10', b'9/10'),
+        'detalhe_51990.html': (FIXTURES / 'detalhe_28734.html').read_bytes(),
+    }
+    assert executar() == 2
+
+    with open(saida, newline='', encoding='utf-8') as arquivo:
+        ids = [registro['id'] for registro in csv.DictReader(arquivo)]
+    assert sorted(ids) == ['28734', '31250', '45102', '51990']
+    registros = _ler_csv(saida)
+    assert registros['31250']['escala pedro'] == '9'
+    assert registros['28734']['escala pedro'] == '5'
+
+
+def test_checkpoint_sem_validade_nao_requisita(servidor, tmp_path):
+    saida = tmp_path / 'extracao.csv'
+    checkpoint = Checkpoint(tmp_path / 'extracao.csv.concluidos')
+    cliente = ClientePedro(servidor, trabalhadores=2, requisicoes_por_segundo=0,
+                           cache=CacheRespostas(tmp_path / 'cache'))
+    artigos = cliente.listar_artigos(PARAMETROS)
+    assert cliente.extrair(artigos, saida, 2, checkpoint) == 3
+
+    _PaginasGravadas.requisicoes = []
+    assert cliente.extrair(artigos, saida, 2, checkpoint) == 0
+    assert _PaginasGravadas.requisicoes == []
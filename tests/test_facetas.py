@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacoes import Filtro, contagem_anual, qualidade_decada, resumo_decada
+from dados import CONDICOES
+from facetas import NOTA_MAX, IndiceFacetas, SelecaoFacetas, _medianas, indice_facetas
+
+
+def _iguais(obtido: pd.DataFrame, esperado: pd.DataFrame):
+    pd.testing.assert_frame_equal(obtido.reset_index(drop=True),
+                                  esperado.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize('condicao', list(CONDICOES) + [None])
+def test_resumo_igual_as_agregacoes(condicao):
+    selecao = SelecaoFacetas(condicoes=None if condicao is None else (condicao,))
+    resumo = indice_facetas().resumir(selecao)
+
+    _iguais(resumo.df1, contagem_anual(condicao))
+    _iguais(resumo.df3, qualidade_decada(condicao))
+    _iguais(resumo.df4, resumo_decada(condicao))
+
+
+@pytest.mark.parametrize('condicao, filtro', [
+    ('cervicalgia', Filtro(ano_min=2000)),
+    ('lombalgia', Filtro(ano_max=1995)),
+    ('oa_joelho', Filtro(ano_min=1990, ano_max=2009)),
+    (None, Filtro(regioes=('cervical', 'lombar'))),
+    (None, Filtro(ano_min=2005, regioes=('tornozelo',))),
+])
+def test_resumo_filtrado_igual_as_agregacoes(condicao, filtro):
+    selecao = SelecaoFacetas(condicoes=None if condicao is None else (condicao,),
+                             regioes=filtro.regioes, ano_min=filtro.ano_min,
+                             ano_max=filtro.ano_max)
+    resumo = indice_facetas().resumir(selecao)
+
+    _iguais(resumo.df3, qualidade_decada(condicao, filtro))
+    _iguais(resumo.df4, resumo_decada(condicao, filtro))
+
+
+def test_medianas_como_pandas():
+    gerador = np.random.default_rng(0)
+    contagens = gerador.integers(0, 4, (40, NOTA_MAX + 1))
+    contagens[::7] = 0
+    # Totais pares e ímpares, e décadas sem nenhuma nota
+    contagens[1] = [0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 1]
+    contagens[2] = [0, 0, 0, 0, 2, 0, 0, 0, 0, 0, 0]
+    totais = contagens.sum(axis=1)
+    assert (totais % 2 == 0).any() and (totais % 2 == 1).any() and (totais == 0).any()
+
+    esperado = [pd.Series(np.repeat(np.arange(NOTA_MAX + 1), linha), dtype=float).median()
+                for linha in contagens]
+    np.testing.assert_array_equal(_medianas(contagens), esperado)
+
+
+@pytest.fixture(scope='module')
+def sintetico():
+    gerador = np.random.default_rng(1)
+    n = 500
+    notas = gerador.integers(0, NOTA_MAX + 1, n).astype(float)
+    notas[gerador.random(n) < 0.1] = np.nan
+    anos = gerador.integers(1975, 2021, n)
+    ensaios = pd.DataFrame({
+        'condicao': gerador.choice(['lombalgia', 'cervicalgia'], n),
+        'regiao': gerador.choice(['coluna', 'pescoco'], n),
+        'tipo estudo': 'CLINICAL TRIAL',
+        'ano': anos,
+        'decada': anos // 10 * 10,
+        'escala pedro': notas,
+    })
+    return ensaios, IndiceFacetas(ensaios)
+
+
+@pytest.mark.parametrize('selecao', [
+    SelecaoFacetas(ano_min=1900, ano_max=2100),
+    SelecaoFacetas(ano_min=1900),
+    SelecaoFacetas(ano_max=1960),
+    SelecaoFacetas(ano_min=2050),
+    SelecaoFacetas(ano_min=2010, ano_max=2000),
+    SelecaoFacetas(ano_min=1990, ano_max=1990),
+    SelecaoFacetas(nota_min=-3, nota_max=25),
+    SelecaoFacetas(nota_min=NOTA_MAX + 1),
+    SelecaoFacetas(nota_max=-1),
+    SelecaoFacetas(nota_min=8, nota_max=4),
+    SelecaoFacetas(condicoes=('lombalgia',), ano_min=2000, nota_min=6, nota_max=6),
+])
+def test_intervalos_fora_dos_dados(sintetico, selecao):
+    ensaios, indice = sintetico
+    anos, notas = ensaios['ano'], ensaios['escala pedro']
+    esperado = np.ones(len(ensaios), dtype=bool)
+    if selecao.condicoes is not None:
+        esperado &= ensaios['condicao'].isin(selecao.condicoes).to_numpy()
+    if selecao.ano_min is not None:
+        esperado &= (anos >= selecao.ano_min).to_numpy()
+    if selecao.ano_max is not None:
+        esperado &= (anos <= selecao.ano_max).to_numpy()
+    # Filtrar a nota exclui os ensaios sem nota
+    if selecao.nota_min is not None:
+        esperado &= (notas >= selecao.nota_min).to_numpy()
+    if selecao.nota_max is not None:
+        esperado &= (notas <= selecao.nota_max).to_numpy()
+
+    np.testing.assert_array_equal(indice.mascara(selecao), esperado)
+    resumo = indice.resumir(selecao)
+    assert resumo.n_ensaios == esperado.sum()
+    assert resumo.df1['quantidade'].sum() == esperado.sum()
+    if not esperado.any():
+        assert resumo.df1.empty and resumo.df3.empty and resumo.df4.empty
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from indice_busca import FiltrosBusca, IndiceTfidf, MascarasBusca, buscar_similares, top_k
+
+TITULOS = [
+    'acupuncture chronic neck pain',
+    'acupuncture chronic neck pain',
+    'exercise chronic neck pain',
+    'exercise low back pain',
+    'manual therapy shoulder pain',
+]
+
+
+def _mascaras(posicoes: list) -> MascarasBusca:
+    # Só as `posicoes` têm metadados: as demais são registros substituídos
+    metadados = pd.DataFrame({
+        'titulo': [TITULOS[i] for i in posicoes],
+        'regiao': 'cervical',
+        'tipo estudo': 'CLINICAL TRIAL',
+        'ano': 2010,
+        'escala pedro': 7.0,
+    }, index=posicoes)
+    return MascarasBusca(metadados, n_documentos=len(TITULOS))
+
+
+def test_top_k_descarta_codigos_negativos():
+    similaridades = np.array([0.9, 0.8, 0.7, 0.6])
+    codigos = np.array([-1, 0, 0, 1])
+    assert [i for i, _ in top_k(similaridades, 2, codigos)] == [1, 3]
+
+
+def test_busca_sem_filtros_ignora_inativos():
+    indice = IndiceTfidf.construir(TITULOS, 1, 1)
+    mascaras = _mascaras([1, 2, 3, 4])
+
+    # Sem filtros, a matriz inteira é comparada, sem copiar as linhas ativas
+    assert mascaras.linhas(FiltrosBusca()) is None
+    resultado = buscar_similares(indice, 'acupuncture chronic neck pain', 3, mascaras)
+    assert [linha for linha, _ in resultado] == [1, 2, 3]
+    # Com filtros, as linhas selecionadas já excluem os inativos
+    resultado = buscar_similares(indice, 'acupuncture chronic neck pain', 3, mascaras,
+                                 FiltrosBusca(ano_min=2000))
+    assert [linha for linha, _ in resultado] == [1, 2, 3]
@@ -0,0 +1,90 @@
+import pytest
+
+spacy = pytest.importorskip('spacy')
+
+from spacy.lookups import Lookups
+
+from configuracoes import MAX_CONSULTAS_EM_CACHE
+from funcoes import limpar_titulo
+from lematizador import Lematizador
+
+# Títulos com os casos em que o tokenizador do spaCy foge da divisão por
+# espaços: contrações, casos especiais que as regras de afixos dividiriam,
+# URLs, hífens, abreviações e números
+TITULOS = [
+    'Acupuncture for chronic neck pain: a randomised controlled trial',
+    "Patients can't tolerate exercises, don't they? A pilot study",
+    "Women's health physiotherapy: it isn't what patients won't do",
+    'Low back pain (LBP): exercises versus rest',
+    'Manual therapy vs. exercise (e.g. Pilates):a 12-week follow-up',
+    'Trial protocol at https://www.pedro.org.au/trial?id=31250 and www.example.com/trials',
+    'Self-management of non-specific low-back pain in 3.5% of patients',
+    'Tai-chi/qigong for knee osteoarthritis [with consumer summary]',
+    'C-reactive protein after 10-year follow-up; a cohort—study',
+    "O'Brien's test (n=40) for shoulder impingement: reliability & validity",
+    'Effects of running... "barefoot" versus shod on ankle sprains!',
+    'ANKLE-SPRAIN RECURRENCE: 1-, 3- and 6-month outcomes',
+]
+
+# Tabela de lemas do modo `lookup` do lematizador do spaCy
+LEMAS = {
+    'patients': 'patient', 'exercises': 'exercise', 'trials': 'trial',
+    'outcomes': 'outcome', 'sprains': 'sprain', 'effects': 'effect',
+    'randomised': 'randomise', 'running': 'run', 'women': 'woman',
+    'tolerate': 'tolerate', 'ca': 'can', "n't": 'not', 'do': 'do',
+}
+
+
+@pytest.fixture(scope='module')
+def nlp():
+    # Pipeline sem modelo treinado: tokenizador e stop words do inglês e
+    # lemas por tabela, sem depender do en_core_web_lg
+    modelo = spacy.blank('en')
+    lookups = Lookups()
+    lookups.add_table('lemma_lookup', LEMAS)
+    modelo.add_pipe('lemmatizer', config={'mode': 'lookup'}).initialize(lookups=lookups)
+    return modelo
+
+
+@pytest.fixture(scope='module')
+def lematizador(nlp, tmp_path_factory):
+    # Passa pela gravação em JSON, como a tabela usada pelo webapp
+    caminho = tmp_path_factory.mktemp('lematizador') / 'lematizador.json'
+    Lematizador.construir(nlp, TITULOS, modelo='blank_en').salvar(caminho)
+    return Lematizador.carregar(caminho)
+
+
+@pytest.mark.parametrize('titulo', TITULOS)
+def test_tokens_iguais_ao_spacy(nlp, lematizador, titulo):
+    texto = titulo.lower()
+    assert lematizador.tokenizar(texto) == [token.text for token in nlp(texto)
+                                            if not token.is_space]
+
+
+@pytest.mark.parametrize('lemma', [True, False])
+@pytest.mark.parametrize('titulo', TITULOS)
+def test_titulo_limpo_igual_ao_spacy(nlp, lematizador, titulo, lemma):
+    assert lematizador.limpar(titulo, lemma) == limpar_titulo(nlp, titulo, lemma)
+    assert limpar_titulo(lematizador, titulo, lemma) == limpar_titulo(nlp, titulo, lemma)
+
+
+def test_desconhecidas_pelo_spacy(nlp):
+    # Tabela gerada só com a primeira metade dos títulos: os tokens da
+    # segunda metade fora dela são lematizados pelo spaCy
+    metade = len(TITULOS) // 2
+    lematizador = Lematizador.construir(nlp, TITULOS[:metade], modelo='blank_en')
+    lematizador.carregar_spacy = lambda: nlp
+    n_lemas = lematizador.n_lemas
+    for titulo in TITULOS[metade:]:
+        assert lematizador.limpar(titulo) == limpar_titulo(nlp, titulo)
+    desconhecidas = lematizador.desconhecidas
+    assert desconhecidas > 0
+
+    # Os lemas do spaCy ficam em um cache limitado, fora da tabela, e não
+    # são calculados de novo
+    assert lematizador.n_lemas == n_lemas
+    cache = lematizador._lema_spacy.cache_info()
+    assert cache.maxsize == MAX_CONSULTAS_EM_CACHE and cache.currsize == desconhecidas
+    for titulo in TITULOS[metade:]:
+        assert lematizador.limpar(titulo) == limpar_titulo(nlp, titulo)
+    assert lematizador.desconhecidas == desconhecidas
@@ -0,0 +1,91 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_busca import IndiceTfidf, MascarasBusca
+from vizinhos import GrafoVizinhos
+
+N_TITULOS = 1500
+K = 8
+
+
+def _corpus(n: int, semente: int = 0) -> list:
+    # Vocabulário pequeno, para que haja muitos empates parciais e títulos
+    # repetidos
+    gerador = np.random.default_rng(semente)
+    vocabulario = [f'termo{i}' for i in range(300)]
+    pesos = 1 / np.arange(1, len(vocabulario) + 1)
+    titulos = [' '.join(gerador.choice(vocabulario, gerador.integers(3, 9),
+                                       p=pesos / pesos.sum()))
+               for _ in range(n)]
+    # Repetições exatas de alguns títulos
+    for i in gerador.choice(n, n // 20, replace=False):
+        titulos[i] = titulos[(i * 7) % n]
+    return titulos
+
+
+@pytest.fixture(scope='module')
+def dados():
+    titulos = _corpus(N_TITULOS)
+    indice = IndiceTfidf.construir(titulos, 1, 1)
+    # Um em cada 25 documentos é um registro substituído (inativo)
+    posicoes = [i for i in range(N_TITULOS) if i % 25 != 3]
+    metadados = pd.DataFrame({
+        'titulo': [titulos[i] for i in posicoes], 'regiao': 'cervical',
+        'tipo estudo': 'CLINICAL TRIAL', 'ano': 2010, 'escala pedro': 7.0,
+    }, index=posicoes)
+    return indice, MascarasBusca(metadados, n_documentos=N_TITULOS)
+
+
+def _forca_bruta(indice: IndiceTfidf, mascaras: MascarasBusca, i: int,
+                 k: int) -> tuple:
+    # Todos os pares comparados: as k maiores similaridades entre os
+    # ativos de outro título, uma vez por título
+    similaridades = (indice.matriz @ indice.matriz[i].T).toarray().ravel()
+    codigos = mascaras.titulo_codigo
+    maiores, vistos = [], {codigos[i]}
+    for j in np.argsort(-similaridades, kind='stable'):
+        if mascaras.ativos[j] and codigos[j] not in vistos:
+            vistos.add(codigos[j])
+            maiores.append(float(similaridades[j]))
+            if len(maiores) == k:
+                break
+    return similaridades, maiores
+
+
+@pytest.mark.parametrize('memoria_bloco_mb', [1, 64])
+def test_vizinhos_iguais_a_forca_bruta(dados, memoria_bloco_mb):
+    indice, mascaras = dados
+    grafo = GrafoVizinhos.construir(indice, K, mascaras, memoria_bloco_mb)
+    codigos = mascaras.titulo_codigo
+
+    for i in range(N_TITULOS):
+        if not mascaras.ativos[i]:
+            assert grafo.consultar(i) == []
+            continue
+        similaridades, maiores = _forca_bruta(indice, mascaras, i, K)
+        obtido = grafo.consultar(i)
+        # Entre vizinhos empatados qualquer um pode ser o escolhido:
+        # compara-se a sequência das similaridades e a validade de cada um
+        np.testing.assert_allclose([s for _, s in obtido], maiores, rtol=1e-5, atol=1e-6)
+        posicoes = [j for j, _ in obtido]
+        np.testing.assert_allclose([s for _, s in obtido], similaridades[posicoes],
+                                   rtol=1e-5, atol=1e-6)
+        assert all(mascaras.ativos[j] for j in posicoes)
+        assert len({codigos[j] for j in posicoes} | {codigos[i]}) == len(posicoes) + 1
+
+
+def test_memoria_limitada_pelo_bloco(dados):
+    indice, mascaras = dados
+    saida = K * N_TITULOS * 8
+    tracemalloc.start()
+    try:
+        GrafoVizinhos.construir(indice, K, mascaras, memoria_bloco_mb=1)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # O bloco e os arrays por documento (máscara, posições dos títulos e a
+    # própria saída) cabem no limite, com folga para objetos pequenos
+    assert pico < 2 ** 20 + 8 * 4 * N_TITULOS + saida + 2 ** 18
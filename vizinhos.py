@@ -0,0 +1,266 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from pathlib import Path
+
+import numpy as np
+
+from configuracoes import MEMORIA_BLOCO_BUSCA_MB, VIZINHOS_POR_ARTIGO
+from indice_busca import IndiceTfidf, MascarasBusca, salvar_array, top_k
+
+CAMINHO_VIZINHOS = Path('data/vizinhos')
+
+
+class GrafoVizinhos:
+    """
+    Os k artigos mais similares (TF-IDF) a cada documento do índice,
+    calculados de uma vez na construção: `vizinhos[i]` são as posições
+    (int32) e `similaridades[i]` as similaridades (float32) dos vizinhos do
+    documento i, em ordem decrescente, completadas com -1 e 0 quando há
+    menos de k. Consultar os vizinhos de um artigo é só a leitura de uma
+    linha. Em disco, as duas matrizes são `.npy` abertos como memória
+    mapeada.
+    """
+
+    def __init__(self, vizinhos: np.ndarray, similaridades: np.ndarray,
+                 assinatura: str = '', geracao: int = 0, assinatura_mascaras: str = ''):
+        self.vizinhos = vizinhos
+        self.similaridades = similaridades
+        self.assinatura = assinatura
+        self.geracao = geracao
+        self.assinatura_mascaras = assinatura_mascaras
+
+    @property
+    def n_documentos(self) -> int:
+        return self.vizinhos.shape[0]
+
+    @property
+    def k(self) -> int:
+        return self.vizinhos.shape[1]
+
+    @classmethod
+    def construir(cls, indice: IndiceTfidf, k: int = VIZINHOS_POR_ARTIGO,
+                  mascaras: MascarasBusca = None,
+                  memoria_bloco_mb: int = MEMORIA_BLOCO_BUSCA_MB) -> 'GrafoVizinhos':
+        """
+        Calcula os vizinhos de todos os documentos por blocos de linhas da
+        matriz TF-IDF: cada bloco é multiplicado pelo corpus inteiro, de
+        forma que a matriz N x N de similaridades nunca existe de uma vez; o
+        tamanho do bloco é limitado por `memoria_bloco_mb`.
+
+        Args:
+            indice (IndiceTfidf): O índice TF-IDF.
+            k (int, optional): Vizinhos por documento.
+            mascaras (MascarasBusca, optional): Máscaras dos metadados. Com
+                elas, documentos inativos (registros substituídos) não são
+                vizinhos nem têm vizinhos, e títulos repetidos (inclusive o
+                do próprio documento) aparecem uma única vez.
+            memoria_bloco_mb (int, optional): Memória máxima (MB) de um
+                bloco: linhas densificadas, similaridades e seleção parcial.
+
+        Returns:
+            GrafoVizinhos: O grafo calculado.
+        """
+        matriz = indice.matriz
+        n = matriz.shape[0]
+        k = min(k, max(n - 1, 0))
+        vizinhos = np.full((n, k), -1, dtype=np.int32)
+        similaridades = np.zeros((n, k), dtype=np.float32)
+        ativos = mascaras.ativos if mascaras is not None else np.ones(n, dtype=bool)
+        codigos = mascaras.titulo_codigo if mascaras is not None else None
+        # Documentos inativos nunca são escolhidos (-inf ao comparar)
+        penalidade = np.where(ativos, 0, -np.inf).astype(np.float32)
+
+        if codigos is not None:
+            # Posições de cada título (ou grupo de repetidos), para excluir
+            # do bloco as repetições do próprio documento sem comparar
+            # todos os códigos
+            ordem = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[ordem], codigos, side='right')
+            inicios = np.searchsorted(codigos[ordem], codigos, side='left')
+
+        # Como em `buscar_similares_lote`: o bloco de linhas é densificado e
+        # multiplicado pela matriz esparsa do corpus. Memória por linha do
+        # bloco: a linha densificada, as similaridades e os índices (int64)
+        # da seleção parcial; a seleção é feita sobre o próprio bloco
+        item = matriz.dtype.itemsize
+        bytes_linha = item * (matriz.shape[1] + n) + 8 * n
+        tamanho_bloco = max(1, memoria_bloco_mb * 2 ** 20 // bytes_linha)
+        m = min(n, 2 * k + 1)
+        for inicio in range(0, n, tamanho_bloco):
+            linhas = np.arange(inicio, min(inicio + tamanho_bloco, n))
+            bloco = (matriz @ matriz[linhas].T.toarray(order='C')).T
+            bloco += penalidade
+            for posicao, i in enumerate(linhas):
+                # O título do próprio documento (e suas repetições) não volta
+                # como vizinho
+                if codigos is not None and codigos[i] >= 0:
+                    bloco[posicao, ordem[inicios[i]:limites[i]]] = -np.inf
+                else:
+                    bloco[posicao, i] = -np.inf
+            # Seleção parcial do bloco inteiro, sobre as similaridades com o
+            # sinal invertido; cada linha só volta a `top_k` se os repetidos
+            # deixarem menos de k candidatos
+            bloco *= -1
+            candidatos = np.argpartition(bloco, m - 1, axis=1)[:, :m] if k else None
+            for posicao, i in enumerate(linhas):
+                if not ativos[i] or not k:
+                    continue
+                resultado = top_k(-bloco[posicao, candidatos[posicao]], k,
+                                  codigos[candidatos[posicao]] if codigos is not None else None)
+                resultado = [(int(candidatos[posicao, j]), similaridade)
+                             for j, similaridade in resultado]
+                if len(resultado) < k and m < n:
+                    resultado = top_k(-bloco[posicao], k, codigos)
+                resultado = [(j, similaridade) for j, similaridade in resultado
+                             if similaridade > -np.inf]
+                vizinhos[i, :len(resultado)] = [j for j, _ in resultado]
+                similaridades[i, :len(resultado)] = [s for _, s in resultado]
+            # Libera o bloco antes do próximo produto
+            del bloco, candidatos
+        return cls(vizinhos, similaridades, indice.assinatura, indice.geracao,
+                   assinatura_mascaras(mascaras))
+
+    def consultar(self, linha: int, k: int = None) -> list:
+        """
+        Vizinhos de um documento, sem nenhum cálculo de similaridade.
+
+        Args:
+            linha (int): Posição do documento no índice.
+            k (int, optional): Quantidade de vizinhos. Se None, todos.
+
+        Returns:
+            list: Pares (linha no corpus, similaridade) em ordem decrescente,
+            como em `indice_busca.buscar_similares`.
+        """
+        vizinhos = self.vizinhos[linha, :k]
+        similaridades = self.similaridades[linha, :k]
+        validos = vizinhos >= 0
+        return [(int(j), float(s)) for j, s in zip(vizinhos[validos], similaridades[validos])]
+
+    def salvar(self, caminho: Path = CAMINHO_VIZINHOS):
+        """
+        Salva as matrizes (`vizinhos.npy` e `similaridades.npy`) e os
+        metadados em `meta.json`, por último, por substituição atômica dos
+        arquivos.
+
+        Args:
+            caminho (Path, optional): Diretório de destino.
+        """
+        caminho = Path(caminho)
+        caminho.mkdir(parents=True, exist_ok=True)
+        salvar_array(caminho / 'vizinhos.npy', np.asarray(self.vizinhos, dtype=np.int32))
+        salvar_array(caminho / 'similaridades.npy',
+                     np.asarray(self.similaridades, dtype=np.float32))
+        meta = {'assinatura': self.assinatura, 'geracao': self.geracao,
+                'n_documentos': self.n_documentos, 'k': self.k,
+                'mascaras': self.assinatura_mascaras}
+        temporario = caminho / f'meta.json.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(meta, arquivo)
+        os.replace(temporario, caminho / 'meta.json')
+
+    @classmethod
+    def carregar(cls, caminho: Path = CAMINHO_VIZINHOS) -> 'GrafoVizinhos':
+        """
+        Abre um grafo salvo com `salvar` como memória mapeada (somente
+        leitura).
+
+        Args:
+            caminho (Path, optional): Diretório do grafo.
+
+        Returns:
+            GrafoVizinhos: O grafo carregado.
+        """
+        caminho = Path(caminho)
+        with open(caminho / 'meta.json', encoding='utf-8') as arquivo:
+            meta = json.load(arquivo)
+        return cls(np.load(caminho / 'vizinhos.npy', mmap_mode='r'),
+                   np.load(caminho / 'similaridades.npy', mmap_mode='r'),
+                   meta['assinatura'], meta['geracao'], meta.get('mascaras', ''))
+
+
+def assinatura_mascaras(mascaras: MascarasBusca = None) -> str:
+    """
+    Identifica os documentos ativos e os códigos de repetidos usados na
+    construção do grafo, para que ele seja recalculado quando mudarem (ex.:
+    outro limiar de `deduplicacao`).
+
+    Args:
+        mascaras (MascarasBusca, optional): As máscaras dos metadados.
+
+    Returns:
+        str: Hash SHA-1 dos arrays, ou vazio sem máscaras.
+    """
+    if mascaras is None:
+        return ''
+    hash_ = hashlib.sha1(np.ascontiguousarray(mascaras.ativos, dtype=bool).tobytes())
+    hash_.update(np.ascontiguousarray(mascaras.titulo_codigo, dtype=np.int64).tobytes())
+    return hash_.hexdigest()
+
+
+def carregar_ou_construir(indice: IndiceTfidf, mascaras: MascarasBusca = None,
+                          k: int = VIZINHOS_POR_ARTIGO,
+                          caminho: Path = CAMINHO_VIZINHOS) -> GrafoVizinhos:
+    """
+    Abre o grafo salvo em disco, recalculando-o (e salvando) caso não
+    exista, tenha menos de k vizinhos por documento ou tenha sido gerado
+    para outro índice ou outras máscaras.
+
+    Args:
+        indice (IndiceTfidf): O índice TF-IDF atual.
+        mascaras (MascarasBusca, optional): Ver `GrafoVizinhos.construir`.
+        k (int, optional): Vizinhos por documento.
+        caminho (Path, optional): Diretório do grafo.
+
+    Returns:
+        GrafoVizinhos: O grafo pronto para consulta.
+    """
+    try:
+        grafo = GrafoVizinhos.carregar(caminho)
+    except (OSError, ValueError, KeyError):
+        grafo = None
+    if (grafo is not None and grafo.assinatura == indice.assinatura
+            and grafo.geracao == indice.geracao
+            and grafo.n_documentos == indice.n_documentos
+            and grafo.assinatura_mascaras == assinatura_mascaras(mascaras)
+            and grafo.k >= min(k, max(indice.n_documentos - 1, 0))):
+        return grafo
+
+    grafo = GrafoVizinhos.construir(indice, k, mascaras)
+    try:
+        grafo.salvar(caminho)
+        return GrafoVizinhos.carregar(caminho)
+    except OSError:
+        # Sem permissão de escrita: o grafo continua válido em memória.
+        return grafo
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Calcula os artigos similares de todos os artigos da base '
+                    '(grafo de vizinhos da busca).'
+    )
+    parser.add_argument('-k', type=int, default=VIZINHOS_POR_ARTIGO,
+                        help='Vizinhos por artigo')
+    parser.add_argument('--saida', type=Path, default=CAMINHO_VIZINHOS)
+    args = parser.parse_args()
+
+    from armazem_artigos import ArmazemArtigos, atualizar_indice
+    from deduplicacao import carregar_ou_construir as carregar_duplicatas
+    from indice_busca import COLUNAS_METADADOS
+
+    armazem = ArmazemArtigos()
+    indice = atualizar_indice(armazem)
+    mascaras = MascarasBusca(armazem.ler(COLUNAS_METADADOS), n_documentos=indice.n_documentos,
+                             duplicatas=carregar_duplicatas(armazem))
+    inicio = time.perf_counter()
+    grafo = GrafoVizinhos.construir(indice, args.k, mascaras)
+    duracao = time.perf_counter() - inicio
+    grafo.salvar(args.saida)
+    tamanho = (grafo.vizinhos.nbytes + grafo.similaridades.nbytes) / 2**20
+    print(f'{grafo.n_documentos} artigos x {grafo.k} vizinhos em {duracao:.1f}s '
+          f'({tamanho:.1f} MB) gravados em {args.saida}')
@@ -1,19 +1,112 @@
-import numpy as np
+import io
+
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import spacy
 import streamlit as st
 
+from aquecimento import Aquecimento
+from armazem_artigos import ArmazemArtigos, geracao_atual
+from artefatos_busca import carregar_ou_construir as carregar_artefatos_busca
+from cache_consultas import ChaveConsulta
+from configuracoes import (
+    ANN_MIN_DOCUMENTOS, AQUECIMENTO, DEPURACAO, MODELO_SPACY, PESO_DENSO_HIBRIDO
+)
+from agregacoes import QUALIDADE_ALTA, TIPOS_ESTUDO, Filtro
+from dados import CONDICOES, carregar_condicao
+from facetas import NOTA_MAX, SelecaoFacetas, indice_facetas
 from funcoes import (
-    graf_linha_tempo, histograma, bar_quali, 
-    linha_quali_quant, similaridade_cosseno
+    graf_linha_tempo, histograma, bar_quali, exibir_figura,
+    linha_quali_quant, carregar_modelo_spacy, carregar_processador, 
+    limpar_titulo, obter_cache_consultas, similaridade_cosseno_lote
+)
+from indice_busca import FiltrosBusca, buscar_similares
+from indice_denso import (
+    buscar_similares_denso, carregar_salvo as carregar_vetores_salvos, vetores_titulos,
+    carregar_ou_construir as carregar_indice_denso_ou_construir
 )
+from indice_ann import CAMINHO_ANN, carregar_ou_construir as carregar_ann_ou_construir
+from instrumentacao import etapa, finalizar_execucao, iniciar_execucao
+from lematizador import Lematizador
 from PIL import Image
-from plotly.subplots import make_subplots
+from termos import termos_frequentes, termos_por_decada
+from vizinhos import carregar_ou_construir as carregar_vizinhos_ou_construir
 
 pd.set_option('display.max_colwidth', None)
 
+# Tempos das etapas desta execução (painel de depuração e arquivo de
+# métricas; sem efeito quando desativados, ver instrumentacao.py)
+iniciar_execucao()
+
+# Os carregadores recebem a geração dos dados: quando novos artigos são
+# acrescentados (armazem_artigos.py), a próxima execução lê a nova geração
+# sem reiniciar o servidor, e a anterior sai do cache. Os objetos são
+# compartilhados entre as sessões e não devem ser modificados.
+# Índice, máscaras e metadados da busca abertos como memória mapeada: os
+# processos do servidor na mesma máquina compartilham uma única cópia
+@st.cache_resource(max_entries=1)
+def carregar_dados_busca(geracao):
+    with etapa('indice.tfidf'):
+        return carregar_artefatos_busca(ArmazemArtigos())
+
+def carregar_indice(geracao):
+    return carregar_dados_busca(geracao).indice
+
+def carregar_mascaras(geracao):
+    return carregar_dados_busca(geracao).mascaras
+
+@st.cache_resource(max_entries=1)
+def carregar_indice_denso(geracao):
+    if isinstance(carregar_processador(), Lematizador):
+        # Consultas processadas sem o spaCy: só os vetores já calculados
+        # (construcao.py) são usados, e o modelo só é carregado na primeira
+        # busca semântica
+        with etapa('indice.denso'):
+            return carregar_vetores_salvos(MODELO_SPACY, geracao,
+                                           carregar_indice(geracao).n_documentos)
+    nlp = carregar_modelo_spacy()
+    if nlp.vocab.vectors_length == 0:
+        # Modelo sem vetores de palavras (ex.: en_core_web_sm)
+        return None
+    with etapa('indice.denso'):
+        titulos = ArmazemArtigos().ler(['titulo_limpo'], vigentes=False)['titulo_limpo']
+        return carregar_indice_denso_ou_construir(nlp, list(titulos), MODELO_SPACY, geracao)
+
+# Artigos similares de cada artigo, calculados uma única vez (vizinhos.py)
+@st.cache_resource(max_entries=1)
+def carregar_vizinhos(geracao):
+    with etapa('indice.vizinhos'):
+        return carregar_vizinhos_ou_construir(carregar_indice(geracao),
+                                              carregar_mascaras(geracao))
+
+# Abaixo de ANN_MIN_DOCUMENTOS a busca exata já é rápida e não há índice
+# aproximado (None).
+@st.cache_resource(max_entries=2)
+def carregar_ann(geracao, tipo):
+    if tipo == 'tfidf':
+        vetores = carregar_indice(geracao).matriz
+    else:
+        indice_denso = carregar_indice_denso(geracao)
+        if indice_denso is None:
+            return None
+        vetores = indice_denso.vetores
+    if vetores.shape[0] < ANN_MIN_DOCUMENTOS:
+        return None
+    with etapa(f'indice.ann.{tipo}'):
+        return carregar_ann_ou_construir(vetores, CAMINHO_ANN / tipo, geracao)
+
+# Os mesmos carregadores da seção da busca, chamados em segundo plano uma
+# vez por processo (e por geração) depois da primeira página exibida: a
+# primeira busca encontra tudo em cache. O modelo spaCy só é carregado
+# aqui se as consultas forem processadas por ele (ver carregar_processador).
+@st.cache_resource(max_entries=1)
+def aquecer_busca(geracao):
+    return Aquecimento({
+        'processador': carregar_processador,
+        'indice.tfidf': lambda: carregar_dados_busca(geracao),
+        'indice.denso': lambda: carregar_indice_denso(geracao),
+        'indice.ann.tfidf': lambda: carregar_ann(geracao, 'tfidf'),
+        'indice.vizinhos': lambda: carregar_vizinhos(geracao),
+    }).iniciar()
+
 st.set_page_config(
     page_title="Análise Evidência Científica em Fisioterapia",
     layout="wide",
@@ -33,6 +126,299 @@ quali_metod = '''
             metodológica.
             '''
             
+TEXTOS_CONDICOES = {
+    'cervicalgia': {
+        'cabecalho': '__CERVICALGIA__',
+        'achados': '''
+         Apesar de publicações sobre cervicalgias serem feitas desde a década de 1960 (mais de 50 
+         anos) o número de  produções apresentou um salto significativo a partir da década de 2000 
+         com uma queda abrupta por volta de 2020, explicada pela pandemia de Covid.
+         
+         Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
+         contínuo por década, tendo maior pico a partir da década de 2020. Apesar de haver um 
+         aumento relevante do número de publicações com alta qualidade metodológica a maior parte 
+         dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
+                      
+         Visualizando os termos nos títulos das publicações pelo gráfico dos termos mais
+         frequentes é possível identificar os temas mais estudados para tratamento de
+         cervicalgias e com a animação por década podemos ver uma mudança no paradigma de
+         pesquisa com o passar das décadas, tendo terapias e recursos passivos, como acupuntura,
+         quiropraxia e terapia manual em maior número de publicações na década de 1990 passando
+         para abordagens baseadas em exercícios e treinamento a partir da década de 2000.
+         
+         As cervicalgias crônicas se mantiveram objeto de estudo por todo o período mas por volta 
+         da década de 2010 os estudos nas cervigalgias definidas como "não específicas" ganharam 
+         força e espaço na pesquisa.
+         
+         No total menos de 40% dos ensaios clínicos apresentaram alta qualidade metodológica, 
+         mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
+         condutas terapêuticas para tratamento de cervicalgias.            
+         ''',
+    },
+    'lombalgia': {
+        'cabecalho': '__LOMBALGIA__',
+        'achados': '''
+         As publicações abordando lombalgias existem há mais de 50 anos e apresentou aumento do 
+         número de produções a partir da década de 2000 com uma queda abrupta por volta de 2020, 
+         explicada pela pandemia de Covid.
+         
+         Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
+         contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
+         aumento relevante do número de publicações com alta qualidade metodológica a maior parte 
+         dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
+         
+         Visualizando os termos nos títulos das publicações pelo gráfico dos termos mais
+         frequentes é possível identificar os temas mais estudados para tratamento de lombalgias
+         e com a animação por década podemos ver uma mudança no paradigma de pesquisa com o
+         passar das décadas, tendo terapias e recursos passivos, como estimulação elétrica,
+         acupuntura, quiropraxia e terapia manual em maior número de publicações na década de
+         1980 juntamente as escolas de exercício e abordagens baseadas em exercícios a partir da
+         década de 1990. Na década de 2000 a acupuntura retorna ao cenário dividindo espaço com
+         abordagens baseadas em exercícios e treinamento e há o aparecimento das abordagens com
+         educação. Já na década de 2010 o tema estabilização e core se mostram presentes e a
+         partir daí o exercício parece ser o recurso mais abordado.
+         
+         As lombalgias crônicas se mantiveram objeto de estudo por todo o período e por volta da 
+         década de 2000 os estudos nas lombalgias agudas ganham força. As lombalgias definidas 
+         como "não específicas" foram foco de pesquisas também nesse período ganhando espaço a 
+         partir de 2010.
+         
+         No total menos de 30% dos ensaios clínicos apresentaram alta qualidade metodológica, 
+         mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
+         condutas terapêuticas para tratamento de lombalgias.           
+         ''',
+    },
+    'dor_ombro': {
+        'cabecalho': '__DOR EM OMBRO__',
+        'achados': '''
+         As publicações abordando dor em ombro são mais recentes, a partir de 1974, e apresentou 
+         aumento do número de produções a partir da década de 2000 com uma queda abrupta por volta 
+         de 2020, explicada pela pandemia de Covid.
+         
+         Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
+         contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
+         aumento relevante do número de publicações com alta qualidade metodológica a maior parte 
+         dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
+                      
+         Visualizando os termos nos títulos das publicações pelo gráfico dos termos mais
+         frequentes é possível identificar os temas mais estudados para tratamento de dores no
+         ombro e com a animação por década podemos ver uma mudança no paradigma de pesquisa com o
+         passar das décadas, tendo terapias e recursos passivos, como estimulação elétrica e
+         bloqueios em maior número de publicações no início da década de 1990 mudando para
+         exercício, estimulação e cirurgia na segunda metade da década. A acupuntura e exercício
+         são foco principal no início da década de 2000 e o exercício se mantém principal tema de
+         estudo desde então. A partir da década de 2010 há uma abordagem de patologias e
+         condições como sindrome de dor subacromial e do impacto.
+         
+         Dores em ombro com origem cervical parecem apresentar maior interesse de estudo até 
+         os anos 2000 e a partir daí o foco das pesquisas parece focar nos estudos de condições 
+         e definições mais pontuais na própria região e estruturas da articulação do ombro.             
+         
+         No total por volta de 35% dos ensaios clínicos apresentaram alta qualidade metodológica, 
+         mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
+         condutas terapêuticas para tratamento de dor no ombro. 
+         ''',
+    },
+    'oa_joelho': {
+        'cabecalho': '__OA JOELHO__',
+        'achados': '''
+         As publicações abordando OA de joelho existem há mais de 50 anos e apresentou aumento 
+         do número de produções a partir da década de 2000 com uma queda abrupta por volta de 2020, 
+         explicada pela pandemia de Covid.
+         
+         O número de ensaios clínicos apresentou aumento contínuo por década, tendo maior pico a 
+         partir da década de 2000 enquanto que a qualidade metodológica teve queda nas decadas 
+         1970/80 com posterior aumento. Apesar de haver um aumento relevante do número de 
+         publicações com alta qualidade metodológica a partir da década de 2000 a maior parte 
+         dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
+                      
+         Visualizando os termos nos títulos das publicações pelo gráfico dos termos mais
+         frequentes é possível identificar os temas mais estudados para tratamento de OA de
+         joelho e com a animação por década podemos ver uma mudança no paradigma de pesquisa com
+         o passar das décadas, tendo terapias e recursos passivos, como estimulação elétrica e a
+         artroplastia no início da década de 1990 mudando rapidamente na segunda metade da decada
+         para exercício que se manteve dali em diante. A acupuntura ganhou espaço no início dos
+         anos 2000 porém as abordagens focadas em fortalecimento e exercício foram o principal
+         tema de estudo.
+         
+         No total por volta de 35% dos ensaios clínicos apresentaram alta qualidade metodológica, 
+         mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
+         condutas terapêuticas para tratamento de OA de joelho.             
+         ''',
+    },
+    'dor_tornozelo': {
+        'cabecalho': '__DOR TORNOZELO__',
+        'achados': '''
+         As publicações abordando dor em tornozelo apresentou flutuação no número de trabalhos 
+         porém com tendência de aumento a partir da década de 1990 e posteior diminuição, 
+         principalmente por volta de 2020, explicada pela pandemia de Covid.
+         
+         Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
+         contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
+         aumento relevante do número de publicações com alta qualidade metodológica a partir da 
+         década de 2000 a maior parte dos ensaios clínicos ainda apresentaram baixa qualidade 
+         metodológica.
+                      
+         Visualizando os termos nos títulos das publicações pelo gráfico dos termos mais
+         frequentes é possível identificar os temas mais estudados para tratamento de entorse de
+         tornozelo e com a animação por década podemos ver uma mudança no paradigma de pesquisa
+         com o passar das décadas, lesões ligamentares agudas e tratamento com bandagens como
+         foco de pesquisa no início da decada de 1990 e na segunda metade da década o interesse
+         em fraturas esteve presente. Já no início da década de 2000 patologias crônicas e
+         condições relacionadas ao tendão de aquiles juntamente com abordagens com exercícios e
+         acupuntura ganham espaço e após esse período os entorses são foco de estudo. A partir da
+         década de 2010 os estudos investigando a fasciite plantar e abordagens com exercício e
+         funcionalidade são o foco de estudo.
+         
+         No total por volta de 30% dos ensaios clínicos apresentaram alta qualidade metodológica, 
+         mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
+         condutas terapêuticas para tratamento de dores no tornozelo. 
+         ''',
+    },
+    'entorse_tornozelo': {
+        'cabecalho': '__ENTORSE TORNOZELO__',
+        'achados': '''
+         As publicações abordando entorse de tornozelo apresentam menor número e demonstram 
+         flutuação no número de trabalhos a partir da década de 2000 com pico de produção na 
+         segunda metade de 2000 e posteior diminuição e flutuação, principalmente por volta 
+         de 2020, explicada pela pandemia de Covid.
+         
+         Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
+         contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
+         aumento relevante do número de publicações com alta qualidade metodológica a partir da 
+         década de 2000 a maior parte dos ensaios clínicos ainda apresentaram baixa qualidade 
+         metodológica.
+                      
+         Visualizando os termos nos títulos das publicações pelo gráfico dos termos mais
+         frequentes é possível identificar os temas mais estudados para tratamento de entorse de
+         tornozelo e com a animação por década podemos ver uma mudança no paradigma de pesquisa
+         com o passar das décadas, tendo terapias e recursos passivos, bandagens e imobilizações
+         em maior número de publicações no início da década de 1990, e a acupuntura aparecendo na
+         segunda metade da década tendo grande visibilidade até a primeira metade da década de
+         2000. A partir daí as dores agudas e foco na abordagem ativa com exercícios de
+         equilíbrio e fortalecimento começam a aparecer e as condições de instabilidade crônicas
+         também foram interesse de pesquisa.
+         
+         No total menos de 25% dos ensaios clínicos apresentaram alta qualidade metodológica, 
+         mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
+         condutas terapêuticas para tratamento de entorse no tornozelo. 
+         ''',
+    },
+}
+
+def pagina_condicao(condicao):
+    geracao = geracao_atual()
+    with etapa('condicao.dados'):
+        dados = carregar_condicao(condicao, geracao=geracao)
+    nome = CONDICOES[condicao]
+    textos = TEXTOS_CONDICOES[condicao]
+    st.header(textos['cabecalho'])
+    st.subheader('Quantidade de estudos')
+    col1, col2, col3 = st.columns([1,5,1])
+    with col2:
+        graf_linha_tempo(df1=dados.df1, nome=nome)
+    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
+    st.write(quali_metod)
+    col1, col2, col3 = st.columns([1,5,1])
+    with col2:
+        histograma(df2=dados.df2, nome=nome)
+        bar_quali(df3=dados.df3, nome=nome)
+    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
+    col1, col2, col3 = st.columns([1,5,1])
+    with col2:
+        linha_quali_quant(df4=dados.df4, df1=dados.df1, nome=nome)
+    st.header('Temas e termos mais frequentes nos títulos')
+    # Contados a cada mudança do período a partir da matriz de termos dos
+    # títulos (ver termos.py), no lugar da nuvem de palavras e do vídeo
+    ano_inicial, ano_final = int(dados.df2['ano'].min()), int(dados.df2['ano'].max())
+    anos = st.slider('Período dos ensaios clínicos', ano_inicial, ano_final,
+                     (ano_inicial, ano_final), key=f'anos_termos_{condicao}')
+    filtro = Filtro(ano_min=anos[0] if anos[0] > ano_inicial else None,
+                    ano_max=anos[1] if anos[1] < ano_final else None)
+    st.subheader(f'Ensaios Clínicos ({anos[0]}-{anos[1]})')
+    with etapa('condicao.termos'):
+        frequentes = termos_frequentes((condicao,), filtro, geracao)
+        por_decada = termos_por_decada((condicao,), filtro, geracao)
+    col1, col2, col3 = st.columns([1,5,1])
+    with col2:
+        exibir_figura('termos_frequentes', frequentes, nome=nome)
+    st.header('Temas e termos de interesse de pesquisa')
+    col1, col2, col3 = st.columns([1,5,1])
+    with col2:
+        exibir_figura('termos_decada', por_decada, nome=nome)
+    st.header('Principais Achados')
+    st.write(textos['achados'])
+
+def pagina_exploracao():
+    geracao = geracao_atual()
+    with etapa('facetas.indice'):
+        indice = indice_facetas(geracao)
+    
+    # Os filtros ficam na barra lateral; cada mudança combina os bitmaps
+    # pré-calculados das facetas (ver facetas.py)
+    with st.sidebar:
+        st.subheader('Filtros')
+        condicoes = st.multiselect('Condição', list(CONDICOES), format_func=CONDICOES.get)
+        regioes = st.multiselect('Região do corpo', list(indice.valores['regiao']))
+        tipos = st.multiselect('Tipo de estudo', TIPOS_ESTUDO)
+        anos = st.slider('Ano de publicação', indice.ano_inicial, indice.ano_final,
+                         (indice.ano_inicial, indice.ano_final))
+        notas = st.slider('Nota na Escala PEDro', 0, NOTA_MAX, (0, NOTA_MAX))
+    
+    filtrar_notas = notas != (0, NOTA_MAX)
+    selecao = SelecaoFacetas(
+        condicoes=tuple(condicoes) or None, regioes=tuple(regioes) or None,
+        tipos_estudo=tuple(tipos) or None,
+        ano_min=anos[0] if anos[0] > indice.ano_inicial else None,
+        ano_max=anos[1] if anos[1] < indice.ano_final else None,
+        nota_min=notas[0] if filtrar_notas else None,
+        nota_max=notas[1] if filtrar_notas else None,
+    )
+    with etapa('facetas.resumo'):
+        resumo = indice.resumir(selecao)
+    
+    st.header('Explorar a Base')
+    st.write('''
+            Escolha na barra lateral as condições, regiões do corpo, tipos de estudo, o período de 
+            publicação e as notas na Escala PEDro de interesse. Os gráficos abaixo são recalculados 
+            para a combinação escolhida. Revisões sistemáticas e diretrizes não recebem nota na 
+            Escala PEDro e não são contadas quando as notas são filtradas.
+            ''')
+    if resumo.df1.empty:
+        st.warning('Nenhum estudo encontrado com os filtros escolhidos')
+        return
+    
+    altas = resumo.df3.loc[resumo.df3['qualidade'] == QUALIDADE_ALTA, 'quantidade'].sum()
+    col1, col2, col3 = st.columns([1, 1, 1])
+    col1.metric('Estudos', int(resumo.df1['quantidade'].sum()))
+    col2.metric('Ensaios clínicos', resumo.n_ensaios)
+    col3.metric('Ensaios de alta qualidade', 
+                f'{altas / resumo.n_ensaios:.0%}' if resumo.n_ensaios else '-')
+    
+    nome = 'Seleção'
+    st.subheader('Quantidade de estudos')
+    col1, col2, col3 = st.columns([1,5,1])
+    with col2:
+        graf_linha_tempo(df1=resumo.df1, nome=nome)
+    if resumo.n_ensaios:
+        st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
+        col1, col2, col3 = st.columns([1,5,1])
+        with col2:
+            exibir_figura('histograma_contagem', resumo.df2, nome=nome)
+            bar_quali(df3=resumo.df3, nome=nome)
+            linha_quali_quant(df4=resumo.df4, df1=resumo.df1, nome=nome)
+        
+        # Os termos respeitam as condições, regiões e o período escolhidos
+        filtro = Filtro(selecao.ano_min, selecao.ano_max, selecao.regioes)
+        with etapa('exploracao.termos'):
+            frequentes = termos_frequentes(selecao.condicoes, filtro, geracao)
+            por_decada = termos_por_decada(selecao.condicoes, filtro, geracao)
+        st.subheader('Termos mais frequentes nos títulos')
+        col1, col2, col3 = st.columns([1,5,1])
+        with col2:
+            exibir_figura('termos_frequentes', frequentes, nome=nome)
+            exibir_figura('termos_decada', por_decada, nome=nome)
+
 titulo = "<div align='center'><h1><b>Ciência e Fisioterapia Ortopédica</b></h1></div>"    
 st.write(titulo, unsafe_allow_html=True)
 st.write(
@@ -77,374 +463,28 @@ st.write('''
 
 st.subheader("SEÇÕES")
 
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
-    "__Cervicalgia__", "__Lombalgia__", "__Dor em Ombro__", 
-    "__Osteoartrose de Joelho__", "__Dor em Tornozelo__", 
-    "__Entorse de Tornozelo__", "__Resultados e Conclusão__", 
-    "__Encontrando Artigos Similares__"
-])
+secoes = {
+    "Cervicalgia": 'cervicalgia', "Lombalgia": 'lombalgia', 
+    "Dor em Ombro": 'dor_ombro', "Osteoartrose de Joelho": 'oa_joelho', 
+    "Dor em Tornozelo": 'dor_tornozelo', 
+    "Entorse de Tornozelo": 'entorse_tornozelo', 
+    "Explorar a Base": 'explorar',
+    "Resultados e Conclusão": 'resultados', 
+    "Encontrando Artigos Similares": 'busca',
+}
+# As seções são escolhidas com um seletor (e não com st.tabs, que executa o
+# conteúdo de todas as abas) para que apenas os dados da seção exibida sejam
+# carregados.
+secao = secoes[st.radio("SEÇÕES", list(secoes), horizontal=True, 
+                        label_visibility='collapsed')]
 
-with tab1:
-    cervicalgia_df1 = pd.read_feather('data/cervicalgia_df1.feather')
-    cervicalgia_df2 = pd.read_feather('data/cervicalgia_df2.feather')
-    cervicalgia_df3 = pd.read_feather('data/cervicalgia_df3.feather')
-    cervicalgia_df4 = pd.read_feather('data/cervicalgia_df4.feather')
-    cervicalgia_im01 = Image.open('data/cervicalgia_im01.png')
-    cervicalgia_vd = open('data/cervicalgia_vd.mp4', 'rb')
-    st.header('__CERVICALGIA__')
-    st.subheader('Quantidade de estudos')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        graf_linha_tempo(df1=cervicalgia_df1, nome='Cervicalgia')
-    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
-    st.write(quali_metod)
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:    
-        histograma(df2=cervicalgia_df2, nome='Cervicalgia')
-        bar_quali(df3=cervicalgia_df3, nome='Cervicalgia')
-    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        linha_quali_quant(df4=cervicalgia_df4, df1=cervicalgia_df1, 
-                          nome='Cervicalgia')
-    st.header('Temas e termos mais frequentes nos títulos')
-    st.subheader(f'Ensaios Clínicos ({cervicalgia_df1["ano"].min()}-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.image(cervicalgia_im01)
-    st.text("")
-    st.header('Temas e termos de interesse de pesquisa')
-    st.subheader('Ensaios Clínicos (1990-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.video(cervicalgia_vd)
-    st.header('Principais Achados')
-    st.write('''
-             Apesar de publicações sobre cervicalgias serem feitas desde a década de 1960 (mais de 50 
-             anos) o número de  produções apresentou um salto significativo a partir da década de 2000 
-             com uma queda abrupta por volta de 2020, explicada pela pandemia de Covid.
-             
-             Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
-             contínuo por década, tendo maior pico a partir da década de 2020. Apesar de haver um 
-             aumento relevante do número de publicações com alta qualidade metodológica a maior parte 
-             dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
-                          
-             Visualizando os termos nos títulos das publicações pela nuvem de palavras é possível 
-             identificar os temas mais estudados para tratamento de cervicalgias e com o vídeo 
-             podemos ver uma mudança no paradigma de pesquisa com o passar das décadas, tendo 
-             terapias e recursos passivos, como acupuntura, quiropraxia e terapia manual em maior 
-             número de publicações na década de 1990 passando para abordagens baseadas em exercícios 
-             e treinamento a partir da década de 2000.
-             
-             As cervicalgias crônicas se mantiveram objeto de estudo por todo o período mas por volta 
-             da década de 2010 os estudos nas cervigalgias definidas como "não específicas" ganharam 
-             força e espaço na pesquisa.
-             
-             No total menos de 40% dos ensaios clínicos apresentaram alta qualidade metodológica, 
-             mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
-             condutas terapêuticas para tratamento de cervicalgias.            
-             ''')
+if secao in CONDICOES:
+    pagina_condicao(secao)
 
-with tab2:
-    lombalgia_df1 = pd.read_feather('data/lombalgia_df1.feather')
-    lombalgia_df2 = pd.read_feather('data/lombalgia_df2.feather')
-    lombalgia_df3 = pd.read_feather('data/lombalgia_df3.feather')
-    lombalgia_df4 = pd.read_feather('data/lombalgia_df4.feather')
-    lombalgia_im01 = Image.open('data/lombalgia_im01.png')
-    lombalgia_vd = open('data/lombalgia_vd.mp4', 'rb')
-    st.header('__LOMBALGIA__')
-    st.subheader('Quantidade de estudos')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        graf_linha_tempo(df1=lombalgia_df1, nome='Lombalgia')
-    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
-    st.write(quali_metod)
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        histograma(df2=lombalgia_df2, nome='Lombalgia')
-        bar_quali(df3=lombalgia_df3, nome='Lombalgia')
-    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        linha_quali_quant(df4=lombalgia_df4, df1=lombalgia_df1, 
-                          nome='Lombalgia')
-    st.header('Temas e termos mais frequentes nos títulos')
-    st.subheader(f'Ensaios Clínicos ({lombalgia_df1["ano"].min()}-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.image(lombalgia_im01)
-    st.text("")
-    st.header('Temas e termos de interesse de pesquisa')
-    st.subheader('Ensaios Clínicos (1980-2022)')
-    col1, col2, col3 = st.columns([1,5,1])
-    col2.video(lombalgia_vd)
-    st.header('Principais Achados')
-    st.write('''
-             As publicações abordando lombalgias existem há mais de 50 anos e apresentou aumento do 
-             número de produções a partir da década de 2000 com uma queda abrupta por volta de 2020, 
-             explicada pela pandemia de Covid.
-             
-             Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
-             contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
-             aumento relevante do número de publicações com alta qualidade metodológica a maior parte 
-             dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
-             
-             Visualizando os termos nos títulos das publicações pela nuvem de palavras é possível 
-             identificar os temas mais estudados para tratamento de lombalgias e com o vídeo podemos 
-             ver uma mudança no paradigma de pesquisa com o passar das décadas, tendo terapias e 
-             recursos passivos, como estimulação elétrica, acupuntura, quiropraxia e terapia manual 
-             em maior número de publicações na década de 1980 juntamente as escolas de exercício e 
-             abordagens baseadas em exercícios a partir da década de 1990. Na década de 2000 a 
-             acupuntura retorna ao cenário dividindo espaço com abordagens baseadas em exercícios 
-             e treinamento e há o aparecimento das abordagens com educação. Já na década de 2010 o 
-             tema estabilização e core se mostram presentes e a partir daí o exercício parece ser 
-             o recurso mais abordado.  
-             
-             As lombalgias crônicas se mantiveram objeto de estudo por todo o período e por volta da 
-             década de 2000 os estudos nas lombalgias agudas ganham força. As lombalgias definidas 
-             como "não específicas" foram foco de pesquisas também nesse período ganhando espaço a 
-             partir de 2010.
-             
-             No total menos de 30% dos ensaios clínicos apresentaram alta qualidade metodológica, 
-             mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
-             condutas terapêuticas para tratamento de lombalgias.           
-             ''')
-
-with tab3:
-    dor_ombro_df1 = pd.read_feather('data/dor_ombro_df1.feather')
-    dor_ombro_df2 = pd.read_feather('data/dor_ombro_df2.feather')
-    dor_ombro_df3 = pd.read_feather('data/dor_ombro_df3.feather')
-    dor_ombro_df4 = pd.read_feather('data/dor_ombro_df4.feather')
-    dor_ombro_im01 = Image.open('data/dor_ombro_im01.png')
-    dor_ombro_vd = open('data/dor_ombro_vd.mp4', 'rb')
-    st.header('__DOR EM OMBRO__')
-    st.subheader('Quantidade de estudos')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        graf_linha_tempo(df1=dor_ombro_df1, nome='Dor Ombro')
-    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
-    st.write(quali_metod)
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        histograma(df2=dor_ombro_df2, nome='Dor Ombro')
-        bar_quali(df3=dor_ombro_df3, nome='Dor Ombro')
-    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        linha_quali_quant(df4=dor_ombro_df4, df1=dor_ombro_df1, 
-                          nome='Dor Ombro')
-    st.header('Temas e termos mais frequentes nos títulos')
-    st.subheader(f'Ensaios Clínicos ({dor_ombro_df1["ano"].min()}-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.image(dor_ombro_im01)
-    st.text("")
-    st.header('Temas e termos de interesse de pesquisa')
-    st.subheader('Ensaios Clínicos (1990-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.video(dor_ombro_vd)
-    st.header('Principais Achados')
-    st.write('''
-             As publicações abordando dor em ombro são mais recentes, a partir de 1974, e apresentou 
-             aumento do número de produções a partir da década de 2000 com uma queda abrupta por volta 
-             de 2020, explicada pela pandemia de Covid.
-             
-             Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
-             contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
-             aumento relevante do número de publicações com alta qualidade metodológica a maior parte 
-             dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
-                          
-             Visualizando os termos nos títulos das publicações pela nuvem de palavras é possível 
-             identificar os temas mais estudados para tratamento de dores no ombro e com o vídeo 
-             podemos ver uma mudança no paradigma de pesquisa com o passar das décadas, tendo terapias 
-             e recursos passivos, como estimulação elétrica e bloqueios em maior número de publicações 
-             no início da década de 1990 mudando para exercício, estimulação e cirurgia na segunda 
-             metade da década. A acupuntura e exercício são foco principal no início da década de 
-             2000 e o exercício se mantém principal tema de estudo desde então. A partir da década 
-             de 2010 há uma abordagem de patologias e condições como sindrome de dor subacromial e 
-             do impacto.
-             
-             Dores em ombro com origem cervical parecem apresentar maior interesse de estudo até 
-             os anos 2000 e a partir daí o foco das pesquisas parece focar nos estudos de condições 
-             e definições mais pontuais na própria região e estruturas da articulação do ombro.             
-             
-             No total por volta de 35% dos ensaios clínicos apresentaram alta qualidade metodológica, 
-             mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
-             condutas terapêuticas para tratamento de dor no ombro. 
-             ''')
-    
-with tab4:
-    oa_joelho_df1 = pd.read_feather('data/oa_joelho_df1.feather')
-    oa_joelho_df2 = pd.read_feather('data/oa_joelho_df2.feather')
-    oa_joelho_df3 = pd.read_feather('data/oa_joelho_df3.feather')
-    oa_joelho_df4 = pd.read_feather('data/oa_joelho_df4.feather')
-    oa_joelho_im01 = Image.open('data/oa_joelho_im01.png')
-    oa_joelho_vd = open('data/oa_joelho_vd.mp4', 'rb')
-    st.header('__OA JOELHO__')
-    st.subheader('Quantidade de estudos')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:    
-        graf_linha_tempo(df1=oa_joelho_df1, nome='OA Joelho')
-    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
-    st.write(quali_metod)
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        histograma(df2=oa_joelho_df2, nome='OA Joelho')
-        bar_quali(df3=oa_joelho_df3, nome='OA Joelho')
-    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        linha_quali_quant(df4=oa_joelho_df4, df1=oa_joelho_df1, 
-                          nome='OA Joelho')
-    st.header('Temas e termos mais frequentes nos títulos')
-    st.subheader(f'Ensaios Clínicos ({oa_joelho_df1["ano"].min()}-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.image(oa_joelho_im01)
-    st.text("")
-    st.header('Temas e termos de interesse de pesquisa')
-    st.subheader('Ensaios Clínicos (1990-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.video(oa_joelho_vd)
-    st.header('Principais Achados')
-    st.write('''
-             As publicações abordando OA de joelho existem há mais de 50 anos e apresentou aumento 
-             do número de produções a partir da década de 2000 com uma queda abrupta por volta de 2020, 
-             explicada pela pandemia de Covid.
-             
-             O número de ensaios clínicos apresentou aumento contínuo por década, tendo maior pico a 
-             partir da década de 2000 enquanto que a qualidade metodológica teve queda nas decadas 
-             1970/80 com posterior aumento. Apesar de haver um aumento relevante do número de 
-             publicações com alta qualidade metodológica a partir da década de 2000 a maior parte 
-             dos ensaios clínicos ainda apresentaram baixa qualidade metodológica.
-                          
-             Visualizando os termos nos títulos das publicações pela nuvem de palavras é possível 
-             identificar os temas mais estudados para tratamento de OA de joelho e com o vídeo podemos 
-             ver uma mudança no paradigma de pesquisa com o passar das décadas, tendo terapias e 
-             recursos passivos, como estimulação elétrica e a artroplastia no início da década de 
-             1990 mudando rapidamente na segunda metade da decada para exercício que se manteve dali 
-             em diante. A acupuntura ganhou espaço no início dos anos 2000 porém as abordagens focadas 
-             em fortalecimento e exercício foram o principal tema de estudo.
-             
-             No total por volta de 35% dos ensaios clínicos apresentaram alta qualidade metodológica, 
-             mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
-             condutas terapêuticas para tratamento de OA de joelho.             
-             ''')
+elif secao == 'explorar':
+    pagina_exploracao()
 
-with tab5:   
-    dor_tornozelo_df1 = pd.read_feather('data/dor_tornozelo_df1.feather')
-    dor_tornozelo_df2 = pd.read_feather('data/dor_tornozelo_df2.feather')
-    dor_tornozelo_df3 = pd.read_feather('data/dor_tornozelo_df3.feather')
-    dor_tornozelo_df4 = pd.read_feather('data/dor_tornozelo_df4.feather')
-    dor_tornozelo_im01 = Image.open('data/dor_tornozelo_im01.png')
-    dor_tornozelo_vd = open('data/dor_tornozelo_vd.mp4', 'rb')
-    st.header('__DOR TORNOZELO__')
-    st.subheader('Quantidade de estudos')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        graf_linha_tempo(df1=dor_tornozelo_df1, nome='Dor Tornozelo')
-    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
-    st.write(quali_metod)
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        histograma(df2=dor_tornozelo_df2, nome='Dor Tornozelo')
-        bar_quali(df3=dor_tornozelo_df3, nome='Dor Tornozelo')
-    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        linha_quali_quant(df4=dor_tornozelo_df4, df1=dor_tornozelo_df1, 
-                          nome='Dor Tornozelo')
-    st.header('Temas e termos mais frequentes nos títulos')
-    st.subheader(f'Ensaios Clínicos ({dor_tornozelo_df1["ano"].min()}-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.image(dor_tornozelo_im01)
-    st.text("")
-    st.header('Temas e termos de interesse de pesquisa')
-    st.subheader('Ensaios Clínicos (1990-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.video(dor_tornozelo_vd)
-    st.header('Principais Achados')
-    st.write('''
-             As publicações abordando dor em tornozelo apresentou flutuação no número de trabalhos 
-             porém com tendência de aumento a partir da década de 1990 e posteior diminuição, 
-             principalmente por volta de 2020, explicada pela pandemia de Covid.
-             
-             Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
-             contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
-             aumento relevante do número de publicações com alta qualidade metodológica a partir da 
-             década de 2000 a maior parte dos ensaios clínicos ainda apresentaram baixa qualidade 
-             metodológica.
-                          
-             Visualizando os termos nos títulos das publicações pela nuvem de palavras é possível 
-             identificar os temas mais estudados para tratamento de entorse de tornozelo e com o 
-             vídeo podemos ver uma mudança no paradigma de pesquisa com o passar das décadas, 
-             lesões ligamentares agudas e tratamento com bandagens como foco de pesquisa no início 
-             da decada de 1990 e na segunda metade da década o interesse em fraturas esteve presente. 
-             Já no início da década de 2000 patologias crônicas e condições relacionadas ao tendão de 
-             aquiles juntamente com abordagens com exercícios e acupuntura ganham espaço e após esse 
-             período os entorses são foco de estudo. A partir da década de 2010 os estudos investigando 
-             a fasciite plantar e abordagens com exercício e funcionalidade são o foco de estudo.
-             
-             No total por volta de 30% dos ensaios clínicos apresentaram alta qualidade metodológica, 
-             mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
-             condutas terapêuticas para tratamento de dores no tornozelo. 
-             ''')
-    
-with tab6:   
-    entorse_tornozelo_df1 = pd.read_feather('data/entorse_tornozelo_df1.feather')
-    entorse_tornozelo_df2 = pd.read_feather('data/entorse_tornozelo_df2.feather')
-    entorse_tornozelo_df3 = pd.read_feather('data/entorse_tornozelo_df3.feather')
-    entorse_tornozelo_df4 = pd.read_feather('data/entorse_tornozelo_df4.feather')
-    entorse_tornozelo_im01 = Image.open('data/entorse_tornozelo_im01.png')
-    entorse_tornozelo_vd = open('data/entorse_tornozelo_vd.mp4', 'rb')
-    st.header('__ENTORSE TORNOZELO__')
-    st.subheader('Quantidade de estudos')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        graf_linha_tempo(df1=entorse_tornozelo_df1, nome='Entorse Tornozelo')
-    st.subheader('Qualidade Metodológica dos Ensaios Clínicos')
-    st.write(quali_metod)
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        histograma(df2=entorse_tornozelo_df2, nome='Entorse Tornozelo')
-        bar_quali(df3=entorse_tornozelo_df3, nome='Entorse Tornozelo')
-    st.subheader('Qualidade vs Quantidade (Ensaios Clínicos)')
-    col1, col2, col3 = st.columns([1,5,1])
-    with col2:
-        linha_quali_quant(df4=entorse_tornozelo_df4, df1=entorse_tornozelo_df1, 
-                          nome='Entorse Tornozelo')
-    st.header('Temas e termos mais frequentes nos títulos')
-    st.subheader(f'Ensaios Clínicos ({entorse_tornozelo_df1["ano"].min()}-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.image(entorse_tornozelo_im01)
-    st.text("")
-    st.header('Temas e termos de interesse de pesquisa')
-    st.subheader('Ensaios Clínicos (1990-2022)')
-    col1, col2, col3 = st.columns([1,4,1])
-    col2.video(entorse_tornozelo_vd)
-    st.header('Principais Achados')
-    st.write('''
-             As publicações abordando entorse de tornozelo apresentam menor número e demonstram 
-             flutuação no número de trabalhos a partir da década de 2000 com pico de produção na 
-             segunda metade de 2000 e posteior diminuição e flutuação, principalmente por volta 
-             de 2020, explicada pela pandemia de Covid.
-             
-             Tanto a qualidade metodológica quanto o número de ensaios clínicos apresentou aumento 
-             contínuo por década, tendo maior pico a partir da década de 2000. Apesar de haver um 
-             aumento relevante do número de publicações com alta qualidade metodológica a partir da 
-             década de 2000 a maior parte dos ensaios clínicos ainda apresentaram baixa qualidade 
-             metodológica.
-                          
-             Visualizando os termos nos títulos das publicações pela nuvem de palavras é possível 
-             identificar os temas mais estudados para tratamento de entorse de tornozelo e com o 
-             vídeo podemos ver uma mudança no paradigma de pesquisa com o passar das décadas, tendo 
-             terapias e recursos passivos, bandagens e imobilizações em maior número de publicações 
-             no início da década de 1990, e a acupuntura aparecendo na segunda metade da década tendo 
-             grande visibilidade até a primeira metade da década de 2000. A partir daí as dores agudas 
-             e foco na abordagem ativa com exercícios de equilíbrio e fortalecimento começam a aparecer 
-             e as condições de instabilidade crônicas também foram interesse de pesquisa.
-             
-             No total menos de 25% dos ensaios clínicos apresentaram alta qualidade metodológica, 
-             mostrando que a maior parte das evidências produzidas não são adequadas para fundamentar 
-             condutas terapêuticas para tratamento de entorse no tornozelo. 
-             ''')
-    
-with tab7:
+elif secao == 'resultados':
     st.header('Resultados')
     st.write('''
             As produções científicas apresentam uma grande variação em relação ao número e qualidade de 
@@ -472,10 +512,13 @@ with tab7:
             resultados eficazes e seguros para seus pacientes.
             ''')
     
-with tab8:
-    nlp = spacy.load('en_core_web_lg')
-    df = pd.read_feather('data/df_completo.feather')
-    titulos_limpos = list(df['titulo_limpo'])
+elif secao == 'busca':
+    geracao = geracao_atual()
+    processador = carregar_processador()
+    metadados = carregar_dados_busca(geracao).metadados
+    indice = carregar_indice(geracao)
+    mascaras = carregar_mascaras(geracao)
+    indice_denso = carregar_indice_denso(geracao)
     
     st.header('Encontrando Artigos Similares')
     st.write('''
@@ -504,7 +547,7 @@ with tab8:
     
     st.subheader('Busca')
     col1, col2, col3, col4, col5 = st.columns([1.5, 0.1, 0.5, 0.1, 0.2])
-    input_titulo = col1.text_input('Insira o título ou termos', key="")
+    input_titulo = col1.text_input('Insira o título ou termos', key="busca_titulo")
     
     quantidade = col3.slider('Quantidade de Artigos Similares', 1, 20, 5)
     
@@ -514,28 +557,134 @@ with tab8:
         input_titulo = ""
         quantidade = 5
     
+    modos = ['Termos (TF-IDF)']
+    if indice_denso is not None:
+        modos += ['Semântica (vetores de palavras)', 'Híbrida']
+    modo = st.radio('Modo de busca', modos, horizontal=True)
+    
+    with st.expander('Filtros'):
+        col1, col2 = st.columns([1, 1])
+        regioes = col1.multiselect('Região do corpo', sorted(mascaras.regiao))
+        tipos = col2.multiselect('Tipo de estudo', sorted(mascaras.tipo_estudo))
+        anos_ativos = mascaras.ano[mascaras.ativos]
+        ano_inicial, ano_final = int(anos_ativos.min()), int(anos_ativos.max())
+        anos = col1.slider('Ano de publicação', ano_inicial, ano_final, 
+                           (ano_inicial, ano_final))
+        escala_min = col2.slider('Nota mínima na Escala PEDro', 0, 10, 0)
+    
+    filtros = FiltrosBusca(
+        regioes=tuple(regioes) or None, tipos_estudo=tuple(tipos) or None,
+        ano_min=anos[0] if anos[0] > ano_inicial else None,
+        ano_max=anos[1] if anos[1] < ano_final else None,
+        escala_min=escala_min or None,
+    )
+    
     st.subheader('Resultados')
     if input_titulo == "":
         st.warning("Preencha o campo de busca")
     
     else:
-        similaridade = similaridade_cosseno(modelo_spacy=nlp, titulo=str(input_titulo),
-                                            titulos=titulos_limpos, min_ngram=1,
-                                            max_ngram=1,lemma=True)
+        # Buscas repetidas (mesma consulta normalizada, quantidade e filtros)
+        # vêm do cache compartilhado entre as sessões
+        cache_consultas = obter_cache_consultas()
+        with etapa('busca.limpar_titulo'):
+            titulo_limpo = cache_consultas.normalizar(
+                str(input_titulo), lambda texto: limpar_titulo(processador, texto, lemma=True))
+        chave = ChaveConsulta(titulo_limpo, modo, quantidade, filtros)
+        resultado = cache_consultas.obter(chave, geracao)
+        if resultado is None:
+            with etapa('busca.similares'):
+                if modo == modos[0]:
+                    resultado = buscar_similares(indice, titulo_limpo, quantidade, 
+                                                 mascaras=mascaras, filtros=filtros,
+                                                 ann=carregar_ann(geracao, 'tfidf'))
+                else:
+                    hibrida = modo == 'Híbrida'
+                    resultado = buscar_similares_denso(
+                        indice_denso,
+                        vetores_titulos(carregar_modelo_spacy(), [titulo_limpo])[0], quantidade,
+                        mascaras=mascaras, filtros=filtros,
+                        indice_tfidf=indice if hibrida else None,
+                        titulo_limpo=titulo_limpo if hibrida else None,
+                        peso_denso=PESO_DENSO_HIBRIDO if hibrida else 1.0,
+                        ann=carregar_ann(geracao, 'denso')
+                    )
+            cache_consultas.guardar(chave, resultado, geracao)
         
-        df['similaridade'] = similaridade
-        cols = ['titulo', 'regiao', 'escala pedro', 'tipo estudo', 'similaridade']
+        cols = ['titulo', 'regiao', 'escala pedro']
+        linhas = [linha for linha, similaridade in resultado]
+        df_final = metadados.linhas(linhas, cols).sort_values(
+            by=cols[2], ascending=False, kind='stable')
+        linhas = list(df_final.index)
+        df_final = df_final.reset_index(drop=True)
         
-        df_similaridade_1 = df.sort_values(
-            by=cols[4], 
-            ascending=False
-        )[cols].head(quantidade).reset_index(drop=True)
+        df_final['escala pedro'] = df_final['escala pedro'].fillna(0)
         
-        df_final = df_similaridade_1.sort_values(
-            by=cols[2], ascending=False)[cols[:3]].reset_index(drop=True)
+        with etapa('st.table'):
+            st.table(df_final)
         
-        df_final.drop_duplicates(inplace=True)
-        df_final['escala pedro'] = df_final['escala pedro'].fillna(0)
-        df_final['escala pedro'] = df_final['escala pedro'].astype(int)
+        if linhas:
+            # Leitura do grafo pré-calculado: nenhuma similaridade é
+            # calculada ao escolher um artigo
+            titulos = df_final['titulo'].tolist()
+            posicao = st.selectbox('Artigos similares a', range(len(linhas)), 
+                                   format_func=lambda posicao: titulos[posicao])
+            with etapa('busca.vizinhos'):
+                similares = carregar_vizinhos(geracao).consultar(linhas[posicao], quantidade)
+                df_similares = metadados.linhas([j for j, _ in similares], cols).reset_index(drop=True)
+                df_similares['escala pedro'] = df_similares['escala pedro'].fillna(0)
+                df_similares['similaridade'] = [round(s, 3) for _, s in similares]
+            st.table(df_similares)
+    
+    st.subheader('Busca em lote')
+    st.write('''
+            Para buscar os artigos similares a uma lista de títulos (ex.: as referências de uma 
+            revisão sistemática), envie um arquivo .txt com um título por linha ou um .csv com a 
+            coluna `titulo`. A quantidade de artigos e os filtros acima também valem para a busca 
+            em lote, que utiliza o modo de termos (TF-IDF).
+            ''')
+    arquivo = st.file_uploader('Lista de títulos', type=['txt', 'csv'])
+    
+    if arquivo is not None:
+        if arquivo.name.endswith('.csv'):
+            tabela = pd.read_csv(arquivo)
+            coluna = 'titulo' if 'titulo' in tabela else tabela.columns[0]
+            titulos = tabela[coluna].dropna().astype(str).tolist()
+        else:
+            titulos = arquivo.getvalue().decode('utf-8').splitlines()
+        titulos = [titulo.strip() for titulo in titulos if titulo.strip()]
+        
+        with etapa('busca_lote'):
+            df_lote = similaridade_cosseno_lote(processador, titulos, indice, metadados, quantidade,
+                                                mascaras=mascaras, filtros=filtros)
+        df_lote['escala pedro'] = df_lote['escala pedro'].fillna(0)
+        
+        st.write(f'{len(titulos)} títulos buscados')
+        st.dataframe(df_lote)
         
-        st.table(df_final)
+        saida_feather = io.BytesIO()
+        df_lote.to_feather(saida_feather)
+        col1, col2 = st.columns([1, 1])
+        col1.download_button('Baixar CSV', df_lote.to_csv(index=False).encode('utf-8'),
+                             file_name='artigos_similares.csv', mime='text/csv')
+        col2.download_button('Baixar Feather', saida_feather.getvalue(),
+                             file_name='artigos_similares.feather',
+                             mime='application/octet-stream')
+
+if AQUECIMENTO:
+    aquecimento = aquecer_busca(geracao_atual())
+
+execucao = finalizar_execucao()
+if DEPURACAO and execucao is not None:
+    with st.sidebar:
+        st.subheader('Depuração')
+        st.write(f'Execução: {execucao.duracao_ms:.0f} ms')
+        if execucao.pico_memoria_mb is not None:
+            st.write(f'Pico de memória: {execucao.pico_memoria_mb:.0f} MB '
+                     f'(início: {execucao.rss_inicial_mb or 0:.0f} MB)')
+        st.dataframe(pd.DataFrame(execucao.etapas, columns=['etapa', 'ms']))
+        st.write('Cache das buscas')
+        st.write(obter_cache_consultas().estatisticas())
+        if AQUECIMENTO:
+            st.write('Aquecimento da busca' + ('' if aquecimento.concluido else ' (em andamento)'))
+            st.write({'duracoes_ms': aquecimento.duracoes_ms, 'erros': aquecimento.erros})